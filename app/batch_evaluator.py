@@ -0,0 +1,177 @@
+import asyncio
+import re
+from concurrent.futures import ThreadPoolExecutor
+from config import (EVAL_PRECHECK_NGRAM, EVAL_PRECHECK_SENTENCE_SUPPORT, EVAL_PRECHECK_PASS_SUPPORT,
+                    EVAL_PRECHECK_FAIL_SUPPORT, EVAL_MAX_IN_FLIGHT, EVAL_REQUESTS_PER_MINUTE)
+from app.embedding_batcher import RETRYABLE_ERRORS, _retry_delay
+from app.evaluator import evaluate_summary
+from app.kpis import CITATION_PATTERN
+from app.summarizer import citation_label
+from app.tracing import span, record
+
+WORD_RE = re.compile(r"\w+")
+# Sentence ends (citations right after the period stay with their sentence) and line breaks.
+SENTENCE_BOUNDARY_RE = re.compile(r"(?<=[.!?])\s+(?!\[)|(?<=\])\s+(?=[A-Z])|\n+")
+# Verdicts of the pre-check that skip the LLM rubric by default.
+SKIP_VERDICTS = ("fail", "pass")
+
+
+def _ngrams(text, n):
+    tokens = WORD_RE.findall(CITATION_PATTERN.sub(" ", text).lower())
+    return {tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1)}
+
+
+def precheck_summary(summary, documents, ngram=EVAL_PRECHECK_NGRAM, sentence_support=EVAL_PRECHECK_SENTENCE_SUPPORT,
+                     pass_support=EVAL_PRECHECK_PASS_SUPPORT, fail_support=EVAL_PRECHECK_FAIL_SUPPORT,
+                     min_citation_precision=0.5):
+    """
+    Checks a summary against the documents it was generated from, locally:
+    - each [PMID...]/[PMC...] citation must be the label of one of the documents;
+    - each sentence is scored by the share of its word n-grams found in the documents it cites (in all documents
+      when it cites none) and counts as supported from sentence_support on.
+
+    The verdict is "fail" when the summary cites nothing, less than min_citation_precision of its citations are
+    valid or less than fail_support of its sentences are supported; "pass" when every citation is valid and at
+    least pass_support of the sentences are supported; "uncertain" otherwise, and always without documents.
+    """
+    sources = {}
+    for i, doc in enumerate(documents, 1):
+        text = f"{doc.metadata.get('title', '')}\n{doc.page_content}"
+        sources.setdefault(citation_label(doc, i), set()).update(_ngrams(text, ngram))
+    all_sources = set().union(*sources.values())
+
+    citations = CITATION_PATTERN.findall(summary)
+    valid = sum(citation in sources for citation in citations)
+    scores = []
+    for sentence in SENTENCE_BOUNDARY_RE.split(summary):
+        sentence_ngrams = _ngrams(sentence, ngram)
+        if not sentence_ngrams:
+            continue
+        cited = [sources[citation] for citation in CITATION_PATTERN.findall(sentence) if citation in sources]
+        support = sentence_ngrams & (set().union(*cited) if cited else all_sources)
+        scores.append(len(support) / len(sentence_ngrams))
+    supported = sum(score >= sentence_support for score in scores)
+    supported_ratio = supported / len(scores) if scores else 0.0
+
+    if not documents:
+        verdict = "uncertain"
+    elif not citations or valid / len(citations) < min_citation_precision or supported_ratio < fail_support:
+        verdict = "fail"
+    elif valid == len(citations) and supported_ratio >= pass_support:
+        verdict = "pass"
+    else:
+        verdict = "uncertain"
+    return {
+        "verdict": verdict,
+        "citations": len(citations),
+        "valid_citations": valid,
+        "unknown_citations": sorted({citation for citation in citations if citation not in sources}),
+        "sentences": len(scores),
+        "supported_sentences": supported,
+        "mean_support": round(sum(scores) / len(scores), 4) if scores else 0.0,
+    }
+
+
+class RateLimiter:
+    """
+    Spaces out the starts of requests made from one event loop to at most requests_per_minute (None or 0: no
+    limit).
+    """
+
+    def __init__(self, requests_per_minute=None):
+        self.interval = 60 / requests_per_minute if requests_per_minute else 0.0
+        self.next_start = 0.0
+
+    async def wait(self):
+        if not self.interval:
+            return
+        now = asyncio.get_running_loop().time()
+        start = max(now, self.next_start)
+        self.next_start = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+async def _evaluate(item, semaphore, limiter, skip_verdicts, max_retries):
+    precheck = precheck_summary(item["summary"], item.get("documents") or [])
+    result = {"request_id": item["request_id"], "precheck": precheck, "evaluation_report": None,
+              "evaluated_by": "precheck"}
+    if precheck["verdict"] in skip_verdicts:
+        record(evaluations_skipped=1)
+        return result
+
+    async with semaphore:
+        for attempt in range(max_retries + 1):
+            await limiter.wait()
+            try:
+                result["evaluation_report"] = await asyncio.to_thread(
+                    evaluate_summary, item["role"], item["question"], item["summary"]
+                )
+                break
+            except RETRYABLE_ERRORS as error:
+                if attempt == max_retries:
+                    return {"request_id": item["request_id"], "error": f"{type(error).__name__}: {error}"}
+                record(evaluation_retries=1)
+                await asyncio.sleep(_retry_delay(error, attempt, 0.5, 30.0))
+            except Exception as e:
+                return {"request_id": item["request_id"], "error": f"{type(e).__name__}: {e}"}
+    result["evaluated_by"] = "llm"
+    return result
+
+
+async def evaluate_batch(records, on_result=None, max_in_flight=EVAL_MAX_IN_FLIGHT,
+                         requests_per_minute=EVAL_REQUESTS_PER_MINUTE, skip_verdicts=SKIP_VERDICTS, max_retries=6):
+    """
+    Evaluates many summaries concurrently. Each record has request_id, role, question, summary and the documents
+    (LangChain Documents) the summary was generated from. Every summary is pre-checked locally (precheck_summary);
+    those whose verdict is in skip_verdicts are reported with the pre-check only, the others are sent to the LLM
+    rubric, at most max_in_flight at a time and requests_per_minute overall, retrying rate-limit and transient
+    errors with backoff.
+
+    Returns the results in completion order, also passing each to on_result(result) as soon as it is ready.
+    """
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=max(4, max_in_flight)))
+    semaphore = asyncio.Semaphore(max_in_flight)
+    limiter = RateLimiter(requests_per_minute)
+    results = []
+    # Tasks copy the context when they are created, so their spans nest under this one.
+    with span("evaluator.evaluate_batch") as batch_span:
+        tasks = [asyncio.create_task(_evaluate(item, semaphore, limiter, skip_verdicts, max_retries))
+                 for item in records]
+        for task in asyncio.as_completed(tasks):
+            result = await task
+            if on_result is not None:
+                on_result(result)
+            results.append(result)
+        batch_span.add(summaries=len(records))
+    return results
+
+
+def summarize_evaluations(results, wall_seconds):
+    """
+    Counts of a batch evaluation: pre-check verdicts, LLM evaluations made and saved by the pre-check, failures,
+    throughput, and the mean LLM faithfulness score per verdict (to calibrate the pre-check thresholds on a run
+    with skipping disabled).
+    """
+    succeeded = [result for result in results if "error" not in result]
+    verdicts, faithfulness = {}, {}
+    for result in succeeded:
+        verdict = result["precheck"]["verdict"]
+        verdicts[verdict] = verdicts.get(verdict, 0) + 1
+        report = result["evaluation_report"]
+        if isinstance(report, dict) and isinstance(report.get("faithfulness_to_source"), dict):
+            faithfulness.setdefault(verdict, []).append(report["faithfulness_to_source"]["score"])
+    llm_evaluations = sum(result["evaluated_by"] == "llm" for result in succeeded)
+    return {
+        "evaluated": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "verdicts": dict(sorted(verdicts.items())),
+        "llm_evaluations": llm_evaluations,
+        "llm_calls_saved": len(succeeded) - llm_evaluations,
+        "wall_seconds": round(wall_seconds, 2),
+        "evaluations_per_sec": round(len(succeeded) / wall_seconds, 2) if wall_seconds else None,
+        "mean_llm_faithfulness_by_verdict": {verdict: round(sum(scores) / len(scores), 2)
+                                             for verdict, scores in sorted(faithfulness.items())},
+    }
+
@@ -0,0 +1,168 @@
+import re
+from array import array
+from collections import Counter
+import numpy as np
+
+TOKEN_RE = re.compile(r"\w+")
+# Very common words only slow scoring down (long posting lists) without changing the ranking much.
+STOP_WORDS = frozenset("""
+a an and are as at be been but by for from has have in into is it its of on or that the their this to was were
+which with what how does do can
+""".split())
+# Reciprocal-rank fusion constant from Cormack et al. (2009).
+RRF_K = 60
+
+
+def tokenize(text):
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOP_WORDS]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a fixed list of texts, stored as CSR postings in NumPy arrays.
+
+    The length-normalized term-frequency weight of every posting is computed at build time, so scoring a query is
+    one vectorized update of a score array per query term.
+    """
+
+    def __init__(self, vocab, indptr, doc_ids, weights, idf, num_docs):
+        self.vocab = vocab
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.idf = idf
+        self.num_docs = num_docs
+
+    @classmethod
+    def from_texts(cls, texts, k1=1.5, b=0.75):
+        vocab = {}
+        term_ids, doc_ids, term_freqs = array("i"), array("i"), array("i")
+        doc_lengths = array("f")
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths.append(len(tokens))
+            counts = Counter(tokens)
+            term_ids.extend(vocab.setdefault(token, len(vocab)) for token in counts)
+            term_freqs.extend(counts.values())
+            doc_ids.extend(array("i", [doc_id]) * len(counts))
+        doc_lengths = np.array(doc_lengths, dtype=np.float32)
+        num_docs = len(doc_lengths)
+
+        term_ids = np.frombuffer(term_ids, dtype=np.int32)
+        doc_ids = np.frombuffer(doc_ids, dtype=np.int32)
+        term_freqs = np.frombuffer(term_freqs, dtype=np.int32).astype(np.float32)
+
+        order = np.argsort(term_ids, kind="stable")
+        document_freqs = np.bincount(term_ids, minlength=len(vocab))
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(document_freqs, out=indptr[1:])
+
+        average_length = float(doc_lengths.mean()) if doc_lengths.any() else 1.0
+        norms = k1 * (1 - b + b * doc_lengths[doc_ids] / average_length)
+        weights = (term_freqs * (k1 + 1) / (term_freqs + norms)).astype(np.float32)
+        idf = np.log(1 + (num_docs - document_freqs + 0.5) / (document_freqs + 0.5)).astype(np.float32)
+        return cls(vocab, indptr, doc_ids[order], weights[order], idf, num_docs)
+
+    def scores(self, query_text):
+        """
+        Returns the BM25 score of every document for the query.
+        """
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        for token in set(tokenize(query_text)):
+            term_id = self.vocab.get(token)
+            if term_id is None:
+                continue
+            begin, end = self.indptr[term_id], self.indptr[term_id + 1]
+            # Doc ids are unique within a posting list, so fancy-index accumulation is safe.
+            scores[self.doc_ids[begin:end]] += self.idf[term_id] * self.weights[begin:end]
+        return scores
+
+    def search(self, query_text, n=300, ids=None):
+        """
+        Returns [(doc_id, score)] for the n best-scoring documents that share at least one term with the query,
+        optionally restricted to the given doc ids.
+        """
+        scores = self.scores(query_text)
+        if ids is not None:
+            allowed = np.zeros(self.num_docs, dtype=bool)
+            allowed[ids] = True
+            scores[~allowed] = 0
+        matching = np.flatnonzero(scores > 0)
+        if len(matching) > n:
+            matching = matching[np.argpartition(-scores[matching], n - 1)[:n]]
+        top = matching[np.lexsort((matching, -scores[matching]))]
+        return [(int(doc_id), float(scores[doc_id])) for doc_id in top]
+
+    def save(self, path):
+        np.savez(path, vocab=np.array(list(self.vocab), dtype=str), indptr=self.indptr, doc_ids=self.doc_ids,
+                 weights=self.weights, idf=self.idf, num_docs=self.num_docs)
+
+    @classmethod
+    def load(cls, path):
+        arrays = np.load(path)
+        vocab = {token: term_id for term_id, token in enumerate(arrays["vocab"].tolist())}
+        return cls(vocab, arrays["indptr"], arrays["doc_ids"], arrays["weights"], arrays["idf"],
+                   int(arrays["num_docs"]))
+
+
+def reciprocal_rank_fusion(rankings, limit=None, k=RRF_K):
+    """
+    Fuses ranked lists of ids into one: each id scores sum(1 / (k + rank)) over the lists it appears in.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            fused[item] = fused.get(item, 0.0) + 1.0 / (k + rank)
+    ranked = sorted(fused, key=lambda item: -fused[item])
+    return ranked[:limit] if limit is not None else ranked
+
+
+def vector_rank(query_text, texts, embedding_model, k=7):
+    """
+    Embeds the texts and the query and returns the positions of the k texts nearest to the query (L2, as FAISS).
+    """
+    if not len(texts):
+        return []
+    vectors = np.asarray(embedding_model.embed_documents(list(texts)), dtype=np.float32)
+    query = np.asarray(embedding_model.embed_query(query_text), dtype=np.float32)
+    distances = ((vectors - query) ** 2).sum(axis=1)
+    return np.argsort(distances, kind="stable")[:k].tolist()
+
+
+def hybrid_rank(query_text, texts, embedding_model, k=7, candidates=300, bm25=None, ids=None):
+    """
+    Two-stage retrieval over a sequence of texts: BM25 picks up to `candidates` texts, only those (and the query)
+    are embedded, and the lexical and vector rankings of the candidates are fused with RRF. Returns the positions
+    of the k best texts.
+
+    bm25 is a BM25Index over the same texts, to reuse one across queries (see ChunkStore.bm25); it is built here
+    when not given. ids restricts the ranking to the texts at those positions.
+
+    When there are no more texts than candidates, every text is a candidate. When BM25 matches fewer than
+    `candidates` texts, the candidates are padded with the first other texts, so that k results are returned
+    whenever there are k texts while at most `candidates` texts are embedded.
+    """
+    ids = np.arange(len(texts)) if ids is None else np.asarray(ids, dtype=np.int64)
+    if not len(ids):
+        return []
+    bm25 = bm25 if bm25 is not None else BM25Index.from_texts(texts)
+    lexical = [doc_id for doc_id, _ in bm25.search(query_text, n=candidates,
+                                                   ids=None if len(ids) == len(texts) else ids)]
+    if len(ids) <= candidates:
+        candidate_ids = ids.tolist()
+    else:
+        padding = ids[~np.isin(ids, lexical)][:candidates - len(lexical)] if len(lexical) < candidates else []
+        candidate_ids = lexical + [int(doc_id) for doc_id in padding]
+
+    order = vector_rank(query_text, [texts[i] for i in candidate_ids], embedding_model, k=len(candidate_ids))
+    semantic = [candidate_ids[i] for i in order]
+    return reciprocal_rank_fusion([lexical, semantic], limit=k)
+
+
+def hybrid_search(query_text, documents, embedding_model, k=7, candidates=300):
+    """
+    hybrid_rank over LangChain Documents, returning the k best documents.
+    """
+    ranked = hybrid_rank(query_text, [doc.page_content for doc in documents], embedding_model, k=k,
+                         candidates=candidates)
+    return [documents[i] for i in ranked]
@@ -0,0 +1,173 @@
+from array import array
+import numpy as np
+from langchain.schema import Document
+from app.bm25 import BM25Index
+
+SOURCES = ["PubMed", "PMC"]
+# Section of a chunk; PubMed documents have none (and no chunk_id in their metadata).
+SECTIONS = [None, "abstract", "body"]
+NO_YEAR = -1
+
+
+def chunk_metadata(source, external_id, title, year, section=None, chunk_id=None):
+    """
+    Metadata of one chunk: the fields prepare_pubmed_documents / prepare_pmc_documents produce, plus
+    publication_year (None when unknown), which Documents did not carry before the ChunkStore.
+    """
+    if source == "PubMed":
+        return {"source": source, "pmid": external_id, "title": title, "publication_year": year}
+    return {"source": source, "pmcid": external_id, "title": title, "chunk_id": chunk_id, "section": section,
+            "publication_year": year}
+
+
+class ChunkTexts:
+    """
+    Read-only sequence of chunk texts for a list of chunk ids, decoded from the store's buffer on access.
+    """
+
+    def __init__(self, store, ids):
+        self.store = store
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, position):
+        return self.store.text(self.ids[position])
+
+    def __iter__(self):
+        return (self.store.text(chunk_id) for chunk_id in self.ids)
+
+
+class ChunkStore:
+    """
+    Column-oriented store of prepared chunks.
+
+    All chunk texts live in one UTF-8 buffer addressed by offset arrays, and article fields (source, id, title,
+    year) are kept once per article in an interned table referenced by integer ids, so a chunk costs a few bytes of
+    columns plus its text. LangChain Documents are only created for the chunks that are returned.
+    """
+
+    def __init__(self, buffer, offsets, chunk_articles, chunk_sections, chunk_ids, article_sources,
+                 article_external_ids, article_titles, article_years):
+        self.buffer = buffer
+        self.offsets = offsets
+        self.chunk_articles = chunk_articles
+        self.chunk_sections = chunk_sections
+        self.chunk_ids = chunk_ids
+        self.article_sources = article_sources
+        self.article_external_ids = article_external_ids
+        self.article_titles = article_titles
+        self.article_years = article_years
+        self._bm25 = None
+
+    @classmethod
+    def from_articles(cls, articles):
+        """
+        Builds a store from (source, external_id, title, year, chunks) tuples, where chunks is a list of
+        (section, chunk_id, text), as produced by iter_pubmed_chunks / iter_pmc_chunks.
+        """
+        buffer = bytearray()
+        offsets = array("q", [0])
+        chunk_articles, chunk_sections, chunk_ids = array("i"), array("b"), array("i")
+        article_sources, article_years = array("b"), array("h")
+        article_external_ids, article_titles = [], []
+
+        for source, external_id, title, year, chunks in articles:
+            article_id = len(article_external_ids)
+            article_sources.append(SOURCES.index(source))
+            article_external_ids.append(external_id)
+            article_titles.append(title)
+            article_years.append(NO_YEAR if year is None else year)
+            for section, chunk_id, text in chunks:
+                buffer += text.encode("utf-8")
+                offsets.append(len(buffer))
+                chunk_articles.append(article_id)
+                chunk_sections.append(SECTIONS.index(section))
+                chunk_ids.append(-1 if chunk_id is None else chunk_id)
+
+        return cls(buffer, np.array(offsets, dtype=np.int64), np.array(chunk_articles, dtype=np.int32),
+                   np.array(chunk_sections, dtype=np.int8), np.array(chunk_ids, dtype=np.int32),
+                   np.array(article_sources, dtype=np.int8), article_external_ids, article_titles,
+                   np.array(article_years, dtype=np.int16))
+
+    @classmethod
+    def from_documents(cls, documents):
+        """
+        Builds a store from LangChain Documents with prepare_*_documents metadata, one article per document.
+        """
+        def articles():
+            for doc in documents:
+                metadata = doc.metadata
+                source = metadata.get("source")
+                external_id = metadata.get("pmid") if source == "PubMed" else metadata.get("pmcid")
+                yield (source, external_id, metadata.get("title", ""), metadata.get("publication_year"),
+                       [(metadata.get("section"), metadata.get("chunk_id"), doc.page_content)])
+
+        return cls.from_articles(articles())
+
+    def __len__(self):
+        return len(self.chunk_articles)
+
+    def text(self, chunk_id):
+        return self.buffer[self.offsets[chunk_id]:self.offsets[chunk_id + 1]].decode("utf-8")
+
+    def texts(self, ids=None):
+        """
+        Returns a lazily decoded sequence of the texts of the given chunks (all chunks by default).
+        """
+        return ChunkTexts(self, range(len(self)) if ids is None else ids)
+
+    def metadata(self, chunk_id):
+        article_id = self.chunk_articles[chunk_id]
+        year = int(self.article_years[article_id])
+        return chunk_metadata(
+            SOURCES[self.article_sources[article_id]], self.article_external_ids[article_id],
+            self.article_titles[article_id], None if year == NO_YEAR else year,
+            section=SECTIONS[self.chunk_sections[chunk_id]], chunk_id=int(self.chunk_ids[chunk_id])
+        )
+
+    def documents(self, ids):
+        return [Document(page_content=self.text(chunk_id), metadata=self.metadata(chunk_id)) for chunk_id in ids]
+
+    def sources(self):
+        """
+        Per-chunk source codes (indexes into SOURCES).
+        """
+        return self.article_sources[self.chunk_articles]
+
+    def years(self):
+        """
+        Per-chunk publication years, NO_YEAR where unknown.
+        """
+        return self.article_years[self.chunk_articles]
+
+    def article_keys(self):
+        """
+        Per-chunk article keys ("PubMed:<pmid>" / "PMC:<pmcid>"), as used by the corpus vector index.
+        """
+        keys = [f"{SOURCES[source]}:{external_id}"
+                for source, external_id in zip(self.article_sources.tolist(), self.article_external_ids)]
+        return [keys[article_id] for article_id in self.chunk_articles.tolist()]
+
+    def select(self, sources=None, min_year=None, max_year=None):
+        """
+        Returns the ids of chunks matching the source and publication-year restrictions.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if sources is not None:
+            mask &= np.isin(self.sources(), [SOURCES.index(source) for source in sources])
+        years = self.years()
+        if min_year is not None:
+            mask &= (years >= min_year) & (years != NO_YEAR)
+        if max_year is not None:
+            mask &= (years <= max_year) & (years != NO_YEAR)
+        return np.flatnonzero(mask)
+
+    def bm25(self):
+        """
+        BM25 index over all chunk texts, built on first use and reused by every later search of this store.
+        """
+        if self._bm25 is None:
+            self._bm25 = BM25Index.from_texts(self.texts())
+        return self._bm25
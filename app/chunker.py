@@ -0,0 +1,209 @@
+import re
+import time
+from collections import OrderedDict
+import numpy as np
+import tiktoken
+from config import EMBEDDING_MODEL, CHUNK_DEDUP_MAX_CHUNKS
+
+# Sentence ends: terminal punctuation (plus closing quotes/brackets) before whitespace and an upper-case letter,
+# digit or opening bracket; blank lines always end a sentence. The whitespace goes with the next sentence.
+SENTENCE_END_RE = re.compile(r"[.!?][\"')\]]*(?=\s+[A-Z0-9\[(])|\n(?=[ \t]*\n)")
+
+# MinHash signature = BANDS * ROWS values; LSH flags chunks sharing all ROWS values of any band as candidates.
+BANDS = 16
+ROWS = 4
+SHINGLE_TOKENS = 8
+_rng = np.random.default_rng(0)
+_SHINGLE_MULTIPLIERS = _rng.integers(1, 2 ** 63, size=SHINGLE_TOKENS, dtype=np.uint64) | np.uint64(1)
+_PERM_A = _rng.integers(1, 2 ** 63, size=(BANDS * ROWS, 1), dtype=np.uint64) | np.uint64(1)
+_PERM_B = _rng.integers(0, 2 ** 63, size=(BANDS * ROWS, 1), dtype=np.uint64)
+
+_encoding = None
+
+
+def get_encoding():
+    """
+    The tiktoken encoding of the embedding model, loaded once per process.
+    """
+    global _encoding
+    if _encoding is None:
+        _encoding = tiktoken.encoding_for_model(EMBEDDING_MODEL)
+    return _encoding
+
+
+def split_sentences(text):
+    """
+    Returns the (start, end) spans of the sentences of text; the spans cover the whole text.
+    """
+    spans, start = [], 0
+    for match in SENTENCE_END_RE.finditer(text):
+        spans.append((start, match.end()))
+        start = match.end()
+    if start < len(text):
+        spans.append((start, len(text)))
+    return spans
+
+
+def minhash_signature(tokens):
+    """
+    MinHash signature (BANDS * ROWS uint32 values) of the set of SHINGLE_TOKENS-token shingles of a chunk.
+    """
+    tokens = np.asarray(tokens, dtype=np.uint64)
+    if len(tokens) < SHINGLE_TOKENS:
+        tokens = np.concatenate([tokens, np.zeros(SHINGLE_TOKENS - len(tokens), dtype=np.uint64)])
+    count = len(tokens) - SHINGLE_TOKENS + 1
+    # uint64 arithmetic wraps around, which is what multiply-shift hashing relies on.
+    with np.errstate(over="ignore"):
+        shingles = np.zeros(count, dtype=np.uint64)
+        for offset, multiplier in enumerate(_SHINGLE_MULTIPLIERS):
+            shingles ^= tokens[offset:offset + count] * multiplier
+        hashes = (_PERM_A * shingles + _PERM_B) >> np.uint64(32)
+    return hashes.min(axis=1).astype(np.uint32)
+
+
+class NearDuplicateFilter:
+    """
+    Streaming near-duplicate detector: MinHash signatures bucketed by LSH bands. A chunk is a duplicate when a
+    remembered chunk shares a band with it and their estimated Jaccard similarity reaches the threshold.
+
+    Duplicates are looked for across the whole stream (boilerplate repeats across articles, not within one), but
+    only the max_chunks most recently kept or matched chunks are remembered (about 1.7 KB each), so memory stays
+    bounded however large the corpus. Recurring boilerplate keeps matching and stays remembered; a chunk whose
+    last near-copy was evicted is kept again.
+    """
+
+    def __init__(self, threshold=0.8, max_chunks=50_000):
+        self.threshold = threshold
+        self.max_chunks = max_chunks
+        self.tables = [{} for _ in range(BANDS)]
+        # Remembered chunk id -> (signature, band keys), least recently used first.
+        self.kept = OrderedDict()
+        self.next_id = 0
+        self.evictions = 0
+
+    def is_duplicate(self, tokens):
+        """
+        Checks a chunk against the remembered chunks, remembering it if it is not a duplicate.
+        """
+        signature = minhash_signature(tokens)
+        keys = [signature[band * ROWS:(band + 1) * ROWS].tobytes() for band in range(BANDS)]
+        checked = set()
+        for table, key in zip(self.tables, keys):
+            kept = table.get(key)
+            if kept is None or kept in checked:
+                continue
+            checked.add(kept)
+            if np.mean(self.kept[kept][0] == signature) >= self.threshold:
+                self.kept.move_to_end(kept)
+                return True
+
+        kept, self.next_id = self.next_id, self.next_id + 1
+        self.kept[kept] = (signature, keys)
+        for table, key in zip(self.tables, keys):
+            table.setdefault(key, kept)
+        if len(self.kept) > self.max_chunks:
+            evicted, (_, evicted_keys) = self.kept.popitem(last=False)
+            for table, key in zip(self.tables, evicted_keys):
+                if table.get(key) == evicted:
+                    del table[key]
+            self.evictions += 1
+        return False
+
+
+class TokenChunker:
+    """
+    Splits texts into chunks of at most chunk_tokens tokens (tiktoken, the embedding model's encoding) at sentence
+    boundaries, carrying up to overlap_tokens of trailing sentences into the next chunk. Sentences longer than the
+    budget are split by tokens.
+
+    Texts are tokenized in batches (one encode_ordinary_batch call per batch), and with a NearDuplicateFilter
+    chunks that nearly repeat an earlier chunk (license text, boilerplate methods, figure legends) are dropped.
+    The filter is shared by every text the chunker sees and remembers the dedup_max_chunks most recently used
+    chunks. Running counts are kept in self.stats.
+    """
+
+    def __init__(self, chunk_tokens=256, overlap_tokens=32, dedup_threshold=0.8, encoding=None,
+                 dedup_max_chunks=CHUNK_DEDUP_MAX_CHUNKS):
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.encoding = encoding or get_encoding()
+        self.dedup = NearDuplicateFilter(dedup_threshold, dedup_max_chunks) if dedup_threshold else None
+        self.stats = {"texts": 0, "chunks": 0, "duplicates": 0, "tokens": 0, "seconds": 0.0}
+
+    def _pack(self, text, spans, sentence_tokens):
+        """
+        Yields (text, tokens) chunks from a text's sentences and their token lists.
+        """
+        current, current_tokens = [], 0
+        for (start, end), tokens in zip(spans, sentence_tokens):
+            if len(tokens) > self.chunk_tokens:
+                if current:
+                    yield current
+                    current, current_tokens = [], 0
+                for begin in range(0, len(tokens), self.chunk_tokens):
+                    window = tokens[begin:begin + self.chunk_tokens]
+                    yield [(self.encoding.decode(window), window)]
+                continue
+
+            if current and current_tokens + len(tokens) > self.chunk_tokens:
+                yield current
+                overlap, overlap_tokens = [], 0
+                for sentence in reversed(current):
+                    if overlap_tokens + len(sentence[1]) > self.overlap_tokens:
+                        break
+                    overlap.insert(0, sentence)
+                    overlap_tokens += len(sentence[1])
+                while overlap and overlap_tokens + len(tokens) > self.chunk_tokens:
+                    overlap_tokens -= len(overlap.pop(0)[1])
+                current, current_tokens = overlap, overlap_tokens
+            current.append((text[start:end], tokens))
+            current_tokens += len(tokens)
+        if current:
+            yield current
+
+    def chunk_texts(self, texts):
+        """
+        Returns, for each text, its list of (chunk_id, chunk_text) pairs. Chunk ids are positions within the text,
+        so ids of dropped duplicates leave gaps and adjacent ids are always adjacent in the text.
+        """
+        start_time = time.perf_counter()
+        spans = [split_sentences(text) for text in texts]
+        sentences = [text[start:end] for text, text_spans in zip(texts, spans) for start, end in text_spans]
+        encoded = iter(self.encoding.encode_ordinary_batch(sentences))
+
+        results = []
+        for text, text_spans in zip(texts, spans):
+            sentence_tokens = [next(encoded) for _ in text_spans]
+            chunks = []
+            for chunk_id, sentences_in_chunk in enumerate(self._pack(text, text_spans, sentence_tokens)):
+                chunk_text = "".join(sentence for sentence, _ in sentences_in_chunk).strip()
+                if not chunk_text:
+                    continue
+                tokens = [token for _, sentence_tokens in sentences_in_chunk for token in sentence_tokens]
+                if self.dedup is not None and self.dedup.is_duplicate(tokens):
+                    self.stats["duplicates"] += 1
+                    continue
+                chunks.append((chunk_id, chunk_text))
+                self.stats["chunks"] += 1
+                self.stats["tokens"] += len(tokens)
+            results.append(chunks)
+
+        self.stats["texts"] += len(texts)
+        self.stats["seconds"] += time.perf_counter() - start_time
+        return results
+
+    def summary(self):
+        """
+        Chunk counts, duplicate ratio and throughput so far.
+        """
+        stats = self.stats
+        produced = stats["chunks"] + stats["duplicates"]
+        return {
+            "texts": stats["texts"],
+            "chunks": stats["chunks"],
+            "duplicates": stats["duplicates"],
+            "duplicate_ratio": round(stats["duplicates"] / produced, 4) if produced else 0.0,
+            "dedup_evictions": self.dedup.evictions if self.dedup is not None else 0,
+            "tokens": stats["tokens"],
+            "chunks_per_sec": round(produced / stats["seconds"], 1) if stats["seconds"] else None,
+        }
@@ -0,0 +1,174 @@
+import numpy as np
+import tiktoken
+from langchain_core.documents import Document
+from app.summarizer import format_context
+from app.tracing import traced, record
+
+PROMPT_MODEL = "gpt-4"
+# A chunk is only truncated into the remaining budget if at least this many of its tokens fit.
+MIN_SNIPPET_TOKENS = 48
+MAX_OVERLAP_CHARS = 2000
+OVERLAP_PROBE_CHARS = 32
+
+_encoding = None
+
+
+def get_prompt_encoding():
+    """
+    Returns the tiktoken encoding of the summarization model (loaded once per process).
+    """
+    global _encoding
+    if _encoding is None:
+        _encoding = tiktoken.encoding_for_model(PROMPT_MODEL)
+    return _encoding
+
+
+def context_tokens(documents, encoding=None):
+    """
+    Exact number of tokens of the documents' "Scientific Articles" prompt section.
+    """
+    return len((encoding or get_prompt_encoding()).encode_ordinary(format_context(documents)))
+
+
+def mmr_order(query_vector, vectors, mmr_lambda=0.5):
+    """
+    Orders candidates by maximal marginal relevance: each step picks the candidate maximizing
+    mmr_lambda * sim(query, candidate) - (1 - mmr_lambda) * max sim(candidate, already picked), cosine similarity.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if not len(vectors):
+        return []
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+    query = np.asarray(query_vector, dtype=np.float32)
+    query = query / (np.linalg.norm(query) or 1.0)
+
+    relevance = vectors @ query
+    redundancy = np.full(len(vectors), -np.inf, dtype=np.float32)
+    remaining = np.ones(len(vectors), dtype=bool)
+    order = []
+    for _ in range(len(vectors)):
+        scores = mmr_lambda * relevance - (1 - mmr_lambda) * np.maximum(redundancy, 0.0)
+        scores[~remaining] = -np.inf
+        best = int(np.argmax(scores))
+        order.append(best)
+        remaining[best] = False
+        redundancy = np.maximum(redundancy, vectors @ vectors[best])
+    return order
+
+
+def _join_overlapping(first, second):
+    """
+    Concatenates consecutive chunks, dropping the text `second` repeats from the end of `first` (chunk overlap).
+    """
+    tail = first[-MAX_OVERLAP_CHARS:]
+    probe = second[:OVERLAP_PROBE_CHARS]
+    start = tail.find(probe) if probe else -1
+    while start != -1:
+        if second.startswith(tail[start:]):
+            return first + second[len(tail) - start:]
+        start = tail.find(probe, start + 1)
+    return f"{first} {second}"
+
+
+def merge_adjacent_chunks(documents):
+    """
+    Merges body chunks of the same PMC article with consecutive chunk ids into one document (chunk ids keep gaps
+    where near-duplicates were dropped, so only truly adjacent chunks merge). A merged document takes the place of
+    its first member in the list and lists its members in metadata["chunk_ids"].
+    """
+    def key(doc):
+        metadata = doc.metadata
+        if metadata.get("source") != "PMC" or metadata.get("section") != "body" or metadata.get("chunk_id") is None:
+            return None
+        return metadata["pmcid"]
+
+    groups = {}
+    for doc in documents:
+        if key(doc) is not None:
+            groups.setdefault(key(doc), []).append(doc)
+
+    merged = {}
+    for pmcid, docs in groups.items():
+        docs = sorted(docs, key=lambda doc: doc.metadata["chunk_id"])
+        runs = [[docs[0]]]
+        for doc in docs[1:]:
+            if doc.metadata["chunk_id"] == runs[-1][-1].metadata["chunk_id"] + 1:
+                runs[-1].append(doc)
+            else:
+                runs.append([doc])
+        for run in runs:
+            text = run[0].page_content
+            for doc in run[1:]:
+                text = _join_overlapping(text, doc.page_content)
+            merged_doc = Document(page_content=text, metadata=dict(
+                run[0].metadata, chunk_ids=[doc.metadata["chunk_id"] for doc in run]
+            )) if len(run) > 1 else run[0]
+            for doc in run:
+                merged[id(doc)] = merged_doc
+
+    result, seen = [], set()
+    for doc in documents:
+        doc = merged.get(id(doc), doc)
+        if id(doc) not in seen:
+            seen.add(id(doc))
+            result.append(doc)
+    return result
+
+
+def _truncate(doc, budget_tokens, packed, encoding):
+    """
+    The longest token prefix of doc that still fits the budget next to the packed documents, or None if fewer than
+    MIN_SNIPPET_TOKENS tokens fit.
+    """
+    tokens = encoding.encode_ordinary(doc.page_content)
+    low, high = 0, len(tokens)
+    while low < high:
+        middle = (low + high + 1) // 2
+        candidate = Document(page_content=encoding.decode(tokens[:middle]), metadata=doc.metadata)
+        if context_tokens(merge_adjacent_chunks(packed + [candidate]), encoding) <= budget_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    if low < MIN_SNIPPET_TOKENS:
+        return None
+    return Document(page_content=encoding.decode(tokens[:low]), metadata=dict(doc.metadata, truncated=True))
+
+
+def pack_context(documents, vectors, query_vector, budget_tokens, mmr_lambda=0.5, encoding=None):
+    """
+    Selects candidate documents in MMR order while their formatted context, with adjacent PMC chunks merged, fits
+    budget_tokens (measured exactly with tiktoken). Candidates that do not fit whole are skipped, or truncated at a
+    token boundary into the remaining budget when at least MIN_SNIPPET_TOKENS of them fit, which fills the budget.
+    Returns the packed (merged) documents in selection order.
+    """
+    encoding = encoding or get_prompt_encoding()
+    packed, used = [], 0
+    for i in mmr_order(query_vector, vectors, mmr_lambda):
+        trial = packed + [documents[i]]
+        trial_used = context_tokens(merge_adjacent_chunks(trial), encoding)
+        if trial_used <= budget_tokens:
+            packed, used = trial, trial_used
+            if used == budget_tokens:
+                break
+        elif budget_tokens - used >= MIN_SNIPPET_TOKENS:
+            truncated = _truncate(documents[i], budget_tokens, packed, encoding)
+            if truncated is not None:
+                packed.append(truncated)
+                break
+    return merge_adjacent_chunks(packed)
+
+
+@traced("context_packer.pack_documents")
+def pack_documents(query_text, documents, embedding_model, budget_tokens, mmr_lambda=0.5, encoding=None):
+    """
+    pack_context with the vectors of the query and candidates taken from the embedding model; with the embedding
+    cache these were already computed at retrieval and are served from disk.
+    """
+    if not documents:
+        return []
+    vectors = embedding_model.embed_documents([doc.page_content for doc in documents])
+    query_vector = embedding_model.embed_query(query_text)
+    packed = pack_context(documents, vectors, query_vector, budget_tokens, mmr_lambda=mmr_lambda, encoding=encoding)
+    record(candidates=len(documents), packed=len(packed))
+    return packed
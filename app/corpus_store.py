@@ -0,0 +1,265 @@
+import json
+import os
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS source_files (
+    path TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    num_articles INTEGER NOT NULL,
+    ingested_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pubmed_articles (
+    id INTEGER PRIMARY KEY,
+    file_path TEXT NOT NULL,
+    pmid TEXT,
+    title TEXT,
+    abstract TEXT,
+    mesh_terms TEXT,
+    publication_year INTEGER
+);
+CREATE TABLE IF NOT EXISTS pmc_articles (
+    id INTEGER PRIMARY KEY,
+    file_path TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    pmcid TEXT,
+    title TEXT,
+    abstract TEXT,
+    keywords TEXT,
+    publication_year INTEGER,
+    body TEXT
+);
+CREATE TABLE IF NOT EXISTS pubmed_revisions (
+    pmid TEXT PRIMARY KEY,
+    file_path TEXT NOT NULL,
+    deleted INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_pubmed_file ON pubmed_articles (file_path);
+CREATE INDEX IF NOT EXISTS idx_pubmed_pmid ON pubmed_articles (pmid);
+CREATE INDEX IF NOT EXISTS idx_pmc_file ON pmc_articles (file_path);
+CREATE INDEX IF NOT EXISTS idx_pmc_folder ON pmc_articles (folder, id);
+CREATE INDEX IF NOT EXISTS idx_pmc_pmcid ON pmc_articles (pmcid);
+"""
+
+
+def _dump_list(values):
+    return json.dumps(values) if values is not None else None
+
+
+def _load_list(text):
+    return json.loads(text) if text is not None else None
+
+
+class CorpusStore:
+    """
+    SQLite-backed store of parsed PubMed and PMC articles.
+
+    Each source XML file is recorded with its mtime and size, so an ingest run only re-parses files that changed and
+    the query path reads articles with indexed SELECTs instead of parsing XML.
+
+    PubMed update files are applied on top of the baseline by PMID (see apply_pubmed_update). Every PMID they touch
+    is recorded in pubmed_revisions, deleted ones as tombstones, so re-ingesting a baseline file never brings back
+    an outdated or deleted record.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        # Shared across threads by the async pipeline (read-only there), e.g. for lazy PMC body lookups.
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def file_states(self):
+        """
+        Returns {path: (kind, mtime, size)} for every ingested source file.
+        """
+        rows = self.conn.execute("SELECT path, kind, mtime, size FROM source_files")
+        return {path: (kind, mtime, size) for path, kind, mtime, size in rows}
+
+    def version(self):
+        """
+        Returns a counter that changes whenever the stored corpus changes, for use as a cache key.
+        """
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return int(row[0]) if row else 0
+
+    def _bump_version(self):
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('version', ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (str(self.version() + 1),)
+        )
+
+    def _delete_file_rows(self, path):
+        self.conn.execute("DELETE FROM pubmed_articles WHERE file_path = ?", (path,))
+        self.conn.execute("DELETE FROM pmc_articles WHERE file_path = ?", (path,))
+        self.conn.execute("DELETE FROM source_files WHERE path = ?", (path,))
+
+    def replace_file(self, path, kind, mtime, size, articles):
+        """
+        Replaces all articles previously ingested from a source file with freshly parsed ones.
+        """
+        num_articles = len(articles)
+        with self.conn:
+            self._delete_file_rows(path)
+            if kind == "pubmed":
+                self.conn.executemany(
+                    "INSERT INTO pubmed_articles (file_path, pmid, title, abstract, mesh_terms, publication_year) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (path, a.get("pmid"), a.get("title"), a.get("abstract"), _dump_list(a.get("mesh_terms")),
+                         a.get("publication_year"))
+                        for a in articles
+                    ]
+                )
+                # Records revised or deleted by an update file supersede the baseline copy.
+                superseded = self.conn.execute(
+                    "DELETE FROM pubmed_articles WHERE file_path = ? AND pmid IN (SELECT pmid FROM pubmed_revisions)",
+                    (path,)
+                ).rowcount
+                num_articles -= superseded
+            else:
+                # Articles of an archive count as one folder for per-folder limits.
+                folder = path if kind == "pmc_archive" else os.path.dirname(path)
+                self.conn.executemany(
+                    "INSERT INTO pmc_articles "
+                    "(file_path, folder, pmcid, title, abstract, keywords, publication_year, body) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (path, folder, a.get("pmcid"), a.get("title"), a.get("abstract"),
+                         _dump_list(a.get("keywords")), a.get("publication_year"), a.get("body"))
+                        for a in articles
+                    ]
+                )
+            self.conn.execute(
+                "INSERT INTO source_files (path, kind, mtime, size, num_articles, ingested_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (path, kind, mtime, size, num_articles, time.time())
+            )
+            self._bump_version()
+
+    def apply_pubmed_update(self, path, mtime, size, update):
+        """
+        Applies a parsed PubMed update file (see parse_pubmed_update_file): each revised article replaces the stored
+        record of its PMID, whichever file it came from, and dropped or deleted PMIDs are removed. Update files must
+        be applied in the order NCBI numbers them.
+        """
+        articles = update["articles"]
+        revised = [a.get("pmid") for a in articles] + update["dropped"]
+        with self.conn:
+            self._delete_file_rows(path)
+            self.conn.executemany("DELETE FROM pubmed_articles WHERE pmid = ?",
+                                  [(pmid,) for pmid in revised + update["deleted"]])
+            self.conn.executemany(
+                "INSERT INTO pubmed_articles (file_path, pmid, title, abstract, mesh_terms, publication_year) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (path, a.get("pmid"), a.get("title"), a.get("abstract"), _dump_list(a.get("mesh_terms")),
+                     a.get("publication_year"))
+                    for a in articles
+                ]
+            )
+            self.conn.executemany(
+                "INSERT INTO pubmed_revisions (pmid, file_path, deleted) VALUES (?, ?, ?) "
+                "ON CONFLICT(pmid) DO UPDATE SET file_path = excluded.file_path, deleted = excluded.deleted",
+                [(pmid, path, 0) for pmid in revised] + [(pmid, path, 1) for pmid in update["deleted"]]
+            )
+            self.conn.execute(
+                "INSERT INTO source_files (path, kind, mtime, size, num_articles, ingested_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (path, "pubmed_update", mtime, size, len(articles), time.time())
+            )
+            self._bump_version()
+
+    def remove_files(self, paths):
+        """
+        Removes source files (and their articles) that no longer exist on disk.
+        """
+        if not paths:
+            return
+        with self.conn:
+            for path in paths:
+                self._delete_file_rows(path)
+            self._bump_version()
+
+    def load_pubmed_articles(self):
+        """
+        Returns all stored PubMed articles as dicts with the same fields as parse_pubmed_file_filtered.
+        """
+        rows = self.conn.execute(
+            "SELECT pmid, title, abstract, mesh_terms, publication_year FROM pubmed_articles ORDER BY id"
+        )
+        return [
+            {
+                "pmid": pmid,
+                "title": title,
+                "abstract": abstract,
+                "mesh_terms": _load_list(mesh_terms),
+                "publication_year": year,
+            }
+            for pmid, title, abstract, mesh_terms, year in rows
+        ]
+
+    def load_pmc_articles(self, include_body=True, limit=None, lazy_body=False):
+        """
+        Returns stored PMC articles as dicts with the same fields as parse_pmc_file_filtered.
+        A limit applies per PMC folder, matching parse_folder_pmc. With lazy_body=True bodies are not read; articles
+        that have one get a "body_ref" pointing at their row instead (see load_pmc_body).
+        """
+        if not include_body:
+            body_column = "NULL"
+        elif lazy_body:
+            body_column = "body IS NOT NULL"
+        else:
+            body_column = "body"
+        if limit is None:
+            query = (f"SELECT id, pmcid, title, abstract, keywords, publication_year, {body_column} "
+                     f"FROM pmc_articles ORDER BY id")
+            params = ()
+        else:
+            query = (f"SELECT id, pmcid, title, abstract, keywords, publication_year, {body_column} FROM ("
+                     f"SELECT *, ROW_NUMBER() OVER (PARTITION BY folder ORDER BY id) AS rank FROM pmc_articles"
+                     f") WHERE rank <= ? ORDER BY id")
+            params = (limit,)
+
+        articles = []
+        for row_id, pmcid, title, abstract, keywords, year, body in self.conn.execute(query, params):
+            article = {
+                "pmcid": pmcid,
+                "title": title,
+                "abstract": abstract,
+                "publication_year": year,
+                "keywords": _load_list(keywords),
+            }
+            if lazy_body:
+                if body:
+                    article["body_ref"] = {"db": self.db_path, "row": row_id}
+            elif body is not None:
+                article["body"] = body
+            articles.append(article)
+        return articles
+
+    def load_pmc_body(self, row_id):
+        """
+        Reads the body text of a single stored PMC article.
+        """
+        row = self.conn.execute("SELECT body FROM pmc_articles WHERE id = ?", (row_id,)).fetchone()
+        return row[0] if row else None
@@ -1,11 +1,99 @@
 import re
 import os
 import glob
+import gzip
+import io
+import tarfile
 import xml.etree.ElementTree as ET
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from functools import partial
+from itertools import chain, islice
 from langchain.schema import Document
 from langchain_openai import OpenAIEmbeddings
-from config import OPENAI_API_KEY
+from config import OPENAI_API_KEY, CORPUS_DB_PATH, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS, CHUNK_DEDUP_THRESHOLD
+from app.parallel import parallel_parse, print_worker_stats
+from app.corpus_store import CorpusStore
+from app.topic_index import TopicIndex
+from app.chunk_store import ChunkStore, chunk_metadata
+from app.chunker import TokenChunker
+from app.tracing import traced, record
+
+PMC_ARCHIVE_SUFFIXES = (".tar.gz", ".tgz")
+# Daily PubMed update files live in this subfolder of the data directory (see download_and_unzip_pubmed.py).
+UPDATES_SUBDIR = "updatefiles"
+
+
+def open_xml_source(path):
+    """
+    Opens an XML file for binary reading, decompressing it on the fly when it ends in .gz.
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def is_pmc_archive(path):
+    return path.endswith(PMC_ARCHIVE_SUFFIXES)
+
+
+def extract_pubmed_article(pubmed_article):
+    """
+    Extracts metadata from a single <PubmedArticle> element, returning None for non-research articles or articles
+    without an abstract.
+    """
+    article_data = {}
+
+    pub_types = [
+        pt.text.strip().lower()
+        for pt in pubmed_article.findall(".//PublicationTypeList/PublicationType")
+        if pt.text
+    ]
+    if any(pt in ["letter", "comment"] for pt in pub_types):
+        return None
+
+    abstract_elems = pubmed_article.findall(".//Abstract/AbstractText")
+    if not abstract_elems:
+        return None
+
+    pmid_elem = pubmed_article.find(".//PMID")
+    article_data["pmid"] = pmid_elem.text if pmid_elem is not None else None
+
+    title_elem = pubmed_article.find(".//ArticleTitle")
+    article_data["title"] = title_elem.text if title_elem is not None else None
+
+    abstract_parts = []
+    for elem in abstract_elems:
+        label = elem.attrib.get("Label")
+        text = elem.text or ""
+        if label:
+            abstract_parts.append(f"{label}: {text}")
+        else:
+            abstract_parts.append(text)
+    article_data["abstract"] = " ".join(abstract_parts)
+
+    mesh_terms = [
+        mesh.text
+        for mesh in pubmed_article.findall(".//MeshHeadingList/MeshHeading/DescriptorName")
+        if mesh.text
+    ]
+    article_data["mesh_terms"] = mesh_terms if mesh_terms else None
+
+    pub_date_elem = pubmed_article.find(".//PubDate")
+    year = None
+    if pub_date_elem is not None:
+        year_elem = pub_date_elem.find("Year")
+        medline_date = pub_date_elem.find("MedlineDate")
+
+        if year_elem is not None and year_elem.text and year_elem.text.isdigit():
+            year = int(year_elem.text)
+        elif medline_date is not None and medline_date.text:
+            match = re.search(r"\d{4}", medline_date.text)
+            if match:
+                year = int(match.group())
+
+    article_data["publication_year"] = year
+
+    return article_data
+
 
 def parse_pubmed_file_filtered(xml_path):
     """
@@ -14,67 +102,97 @@ def parse_pubmed_file_filtered(xml_path):
     """
     articles = []
 
-    tree = ET.parse(xml_path)
-    root = tree.getroot()
+    with open_xml_source(xml_path) as f:
+        root = ET.parse(f).getroot()
 
     for pubmed_article in root.findall(".//PubmedArticle"):
-        article_data = {}
+        article_data = extract_pubmed_article(pubmed_article)
+        if article_data is not None:
+            articles.append(article_data)
 
-        pub_types = [
-            pt.text.strip().lower()
-            for pt in pubmed_article.findall(".//PublicationTypeList/PublicationType")
-            if pt.text
-        ]
-        if any(pt in ["letter", "comment"] for pt in pub_types):
-            continue
+    return articles
 
-        abstract_elems = pubmed_article.findall(".//Abstract/AbstractText")
-        if not abstract_elems:
-            continue
 
-        pmid_elem = pubmed_article.find(".//PMID")
-        article_data["pmid"] = pmid_elem.text if pmid_elem is not None else None
-
-        title_elem = pubmed_article.find(".//ArticleTitle")
-        article_data["title"] = title_elem.text if title_elem is not None else None
-
-        abstract_parts = []
-        for elem in abstract_elems:
-            label = elem.attrib.get("Label")
-            text = elem.text or ""
-            if label:
-                abstract_parts.append(f"{label}: {text}")
-            else:
-                abstract_parts.append(text)
-        article_data["abstract"] = " ".join(abstract_parts)
-
-        mesh_terms = [
-            mesh.text
-            for mesh in pubmed_article.findall(".//MeshHeadingList/MeshHeading/DescriptorName")
-            if mesh.text
-        ]
-        article_data["mesh_terms"] = mesh_terms if mesh_terms else None
+def iter_pubmed_articles(xml_path):
+    """
+    Streams a PubMed XML file (plain or .xml.gz, decompressed as it is read) with iterparse, yielding one article
+    dict per <PubmedArticle> with the same fields as parse_pubmed_file_filtered. Processed elements are cleared so
+    memory stays flat regardless of file size.
+    """
+    with open_xml_source(xml_path) as f:
+        context = ET.iterparse(f, events=("start", "end"))
+        _, root = next(context)
 
-        pub_date_elem = pubmed_article.find(".//PubDate")
-        year = None
-        if pub_date_elem is not None:
-            year_elem = pub_date_elem.find("Year")
-            medline_date = pub_date_elem.find("MedlineDate")
+        for event, elem in context:
+            if event != "end" or elem.tag != "PubmedArticle":
+                continue
 
-            if year_elem is not None and year_elem.text and year_elem.text.isdigit():
-                year = int(year_elem.text)
-            elif medline_date is not None and medline_date.text:
-                match = re.search(r"\d{4}", medline_date.text)
-                if match:
-                    year = int(match.group())
+            article_data = extract_pubmed_article(elem)
+            # Dropping finished articles from the root keeps the partially built tree at a single article.
+            root.clear()
+            if article_data is not None:
+                yield article_data
 
-        article_data["publication_year"] = year
 
-        articles.append(article_data)
+def iter_pubmed_update(xml_path):
+    """
+    Streams a PubMed update file (plain or .xml.gz), yielding in file order ("revised", pmid, article) per
+    <PubmedArticle>, with article None when the new version no longer passes the research-article filter, and
+    ("deleted", pmid, None) per PMID of a <DeleteCitation> block.
+    """
+    with open_xml_source(xml_path) as f:
+        context = ET.iterparse(f, events=("start", "end"))
+        _, root = next(context)
+
+        for event, elem in context:
+            if event != "end":
+                continue
+            if elem.tag == "PubmedArticle":
+                pmid = elem.findtext("MedlineCitation/PMID")
+                article_data = extract_pubmed_article(elem)
+                root.clear()
+                yield "revised", pmid, article_data
+            elif elem.tag == "DeleteCitation":
+                pmids = [pmid_elem.text for pmid_elem in elem.findall("PMID")]
+                root.clear()
+                for pmid in pmids:
+                    yield "deleted", pmid, None
+
+
+def parse_pubmed_update_file(xml_path):
+    """
+    Parses a PubMed update file into its net changes (the last occurrence of a PMID wins): {"articles": revised
+    articles, "dropped": PMIDs whose revision no longer passes the filter, "deleted": deleted PMIDs}.
+    """
+    changes = {}
+    for action, pmid, article_data in iter_pubmed_update(xml_path):
+        changes.pop(pmid, None)
+        changes[pmid] = (action, article_data)
+    return {
+        "articles": [article_data for _, article_data in changes.values() if article_data is not None],
+        "dropped": [pmid for pmid, (action, article_data) in changes.items()
+                    if action == "revised" and article_data is None],
+        "deleted": [pmid for pmid, (action, _) in changes.items() if action == "deleted"],
+    }
+
+
+def merge_pubmed_update(changes, update):
+    """
+    Adds the changes of a parsed update file to {pmid: article}, with None for PMIDs that were dropped or deleted.
+    """
+    changes.update((pmid, None) for pmid in update["dropped"] + update["deleted"])
+    changes.update((article["pmid"], article) for article in update["articles"])
+    return changes
+
 
-    return articles
+def parse_pubmed_file_streaming(xml_path):
+    """
+    Parses a PubMed XML file with the streaming parser and returns the articles as a list (picklable for worker pools).
+    """
+    return list(iter_pubmed_articles(xml_path))
 
 
+@traced("data_loader.filter_pubmed_articles_by_topics")
 def filter_pubmed_articles_by_topics(articles, topics, verbose=False):
     """
     Filters PubMed articles by matching given topics in the title, abstract, or MeSH terms.
@@ -90,22 +208,112 @@ def filter_pubmed_articles_by_topics(articles, topics, verbose=False):
     if verbose:
         print(f"{len(filtered)} out of {len(articles)} PubMed articles matched topic filter")
 
+    record(articles=len(articles), matched=len(filtered))
     return filtered
 
 
 
-def parse_pmc_file_filtered(xml_path, include_body=False):
+BODY_START_RE = re.compile(rb"<body[\s>]")
+# Namespaces PMC articles use inside <body>; declared on the wrapper so a body fragment parses on its own.
+BODY_FRAGMENT_WRAPPER = (
+    b'<body-fragment xmlns:xlink="http://www.w3.org/1999/xlink" '
+    b'xmlns:mml="http://www.w3.org/1998/Math/MathML" '
+    b'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+    b'xmlns:ali="http://www.niso.org/schemas/ali/1.0/">'
+)
+
+
+def locate_pmc_body(xml_path, data):
     """
-    Parses a single PMC XML article and extracts metadata, optionally including the full article body.
+    Finds the byte range of the first <body> element in a PMC XML file, returning a body reference for load_pmc_body.
     """
-    articles = []
+    match = BODY_START_RE.search(data)
+    if match is None:
+        return None
+    end = data.find(b"</body>", match.start())
+    if end == -1:
+        return None
+    return {"path": xml_path, "offset": match.start(), "length": end + len(b"</body>") - match.start()}
+
 
+def parse_pmc_file_filtered(xml_path, include_body=False, lazy_body=False):
+    """
+    Parses a single PMC XML article and extracts metadata, optionally including the full article body.
+    With lazy_body=True the body is not extracted (nor its element tree kept while parsing); a "body_ref" (file path
+    and byte range) is recorded instead, for bodies with text, and the text is read later with load_pmc_body.
+    """
+    data = None
+    body_has_text = None
     try:
-        tree = ET.parse(xml_path)
-        root = tree.getroot()
+        if lazy_body:
+            with open(xml_path, "rb") as f:
+                data = f.read()
+            root, body_has_text = _parse_without_body(data)
+        else:
+            tree = ET.parse(xml_path)
+            root = tree.getroot()
     except ET.ParseError:
         return []
 
+    return extract_pmc_article(root, include_body=include_body, lazy_body=lazy_body, xml_path=xml_path, data=data,
+                               body_has_text=body_has_text)
+
+
+def _parse_without_body(data):
+    """
+    Parses a PMC XML document without keeping the subtree of its first <body>: each child of the body is checked
+    for text and dropped as soon as it (and its tail) has been read, so at most one section is in memory at a time.
+    Returns (root, whether the body has any text); the body element itself stays in the tree, empty.
+    """
+    body = None
+    done = False
+    depth = 0
+    pending = None
+    has_text = False
+    events = ET.iterparse(io.BytesIO(data), events=("start", "end"))
+    for event, elem in events:
+        if done:
+            continue
+        if body is None:
+            if event == "start" and elem.tag == "body":
+                body = elem
+            continue
+        if event == "start":
+            depth += 1
+            if depth == 1 and pending is not None:
+                # The tail of the previous child is complete once its next sibling starts.
+                has_text = has_text or _has_text(pending)
+                body.remove(pending)
+                pending = None
+        elif elem is body:
+            if pending is not None:
+                has_text = has_text or _has_text(pending)
+            has_text = has_text or bool((body.text or "").strip())
+            body.clear()
+            done = True
+        else:
+            depth -= 1
+            if depth == 0:
+                pending = elem
+    return events.root, has_text
+
+
+def _has_text(elem):
+    """
+    Whether an element's text, its descendants' text or its tail contains anything but whitespace.
+    """
+    return any(text.strip() for text in elem.itertext()) or bool((elem.tail or "").strip())
+
+
+def extract_pmc_article(root, include_body=False, lazy_body=False, xml_path=None, data=None, body_has_text=None):
+    """
+    Extracts the article of a parsed PMC XML document, as a list of zero or one article dicts (see
+    parse_pmc_file_filtered). lazy_body needs the path and raw bytes of the file the document was read from, and
+    body_has_text (see _parse_without_body) when the body was dropped while parsing; articles whose body has no
+    text get no body_ref.
+    """
+    articles = []
+
     if root.tag == "article":
         article = root
     else:
@@ -151,7 +359,13 @@ def parse_pmc_file_filtered(xml_path, include_body=False):
 
     if include_body:
         body_elem = article.find(".//body")
-        if body_elem is not None:
+        if body_elem is not None and lazy_body:
+            if body_has_text is None:
+                body_has_text = any(text.strip() for text in body_elem.itertext())
+            if body_has_text:
+                body_ref = locate_pmc_body(xml_path, data) if root.tag == "article" else None
+                article_data["body_ref"] = body_ref or {"path": xml_path, "offset": None, "length": None}
+        elif body_elem is not None:
             body_text = " ".join(body_elem.itertext()).strip()
             if body_text:
                 article_data["body"] = body_text
@@ -160,21 +374,73 @@ def parse_pmc_file_filtered(xml_path, include_body=False):
     return articles
 
 
-def parse_folder_pmc(folder_path, include_body=False, limit=None):
+def load_pmc_body(body_ref):
+    """
+    Materializes the body text of a PMC article parsed with lazy_body=True, from its XML file or the corpus store.
+    """
+    if "row" in body_ref:
+        store = _body_stores.get(body_ref["db"])
+        if store is None:
+            store = _body_stores[body_ref["db"]] = CorpusStore(body_ref["db"])
+        return store.load_pmc_body(body_ref["row"]) or ""
+
+    body_elem = None
+    if body_ref["offset"] is not None:
+        with open(body_ref["path"], "rb") as f:
+            f.seek(body_ref["offset"])
+            fragment = f.read(body_ref["length"])
+        try:
+            body_elem = ET.fromstring(BODY_FRAGMENT_WRAPPER + fragment + b"</body-fragment>")[0]
+        except ET.ParseError:
+            body_elem = None
+
+    if body_elem is None:
+        # Fragments that do not parse on their own (e.g. undeclared namespaces) fall back to a full parse.
+        body_elem = ET.parse(body_ref["path"]).getroot().find(".//body")
+        if body_elem is None:
+            return ""
+
+    return " ".join(body_elem.itertext()).strip()
+
+
+_body_stores = {}
+
+
+@traced("data_loader.parse_folder_pmc")
+def parse_folder_pmc(folder_path, include_body=False, limit=None, workers=None, chunksize=16, ordered=True,
+                     stats=None, lazy_body=False):
     """
     Parses PMC XML files from a folder, aggregating articles into a list.
     Optionally limits the number of files processed.
+
+    With workers > 1 the files are parsed in a process pool. Files are submitted in windows, so a limit still stops
+    the work early; with ordered=True the selected files are the same as in the sequential run, with ordered=False
+    the first `limit` files to finish are kept instead.
     """
     all_articles = []
     count = 0
 
-    for filename in os.listdir(folder_path):
-        if not filename.endswith(".xml"):
-            continue
+    file_paths = [
+        os.path.join(folder_path, filename)
+        for filename in os.listdir(folder_path)
+        if filename.endswith(".xml")
+    ]
 
-        file_path = os.path.join(folder_path, filename)
-        articles = parse_pmc_file_filtered(file_path, include_body=include_body)
+    if workers is not None and workers > 1:
+        parsed = parallel_parse(
+            partial(parse_pmc_file_filtered, include_body=include_body, lazy_body=lazy_body),
+            file_paths,
+            workers=workers,
+            chunksize=chunksize,
+            ordered=ordered,
+            window=workers * chunksize * 4 if limit is not None else None,
+            stats=stats,
+        )
+    else:
+        parsed = ((file_path, parse_pmc_file_filtered(file_path, include_body=include_body, lazy_body=lazy_body))
+                  for file_path in file_paths)
 
+    for _, articles in parsed:
         if articles:
             all_articles.extend(articles)
             count += 1
@@ -182,12 +448,72 @@ def parse_folder_pmc(folder_path, include_body=False, limit=None):
             if limit is not None and count >= limit:
                 break
 
+    # Closing the generator shuts the worker pool down when the limit stopped iteration early.
+    parsed.close()
+
+    record(files=count, articles=len(all_articles))
     return all_articles
 
 
+def iter_pmc_archive(archive_path, include_body=False):
+    """
+    Streams the PMC XML members of a .tar.gz archive (e.g. an OA bulk package) without extracting it, yielding
+    (member path, articles) per member as parse_pmc_file_filtered would for the extracted file. The archive is
+    decompressed sequentially and only one member is held in memory at a time. Bodies are always kept in the
+    article, since a member cannot be re-read cheaply later.
+    """
+    with tarfile.open(archive_path, "r|gz") as tar:
+        for member in tar:
+            if not member.isfile() or not member.name.endswith(".xml"):
+                continue
+            data = tar.extractfile(member).read()
+            try:
+                root = ET.fromstring(data)
+            except ET.ParseError:
+                continue
+            yield f"{archive_path}/{member.name}", extract_pmc_article(root, include_body=include_body)
+
+
+def parse_pmc_archive(archive_path, include_body=False, limit=None):
+    """
+    Parses the PMC articles of a .tar.gz archive into a list, stopping after `limit` articles (picklable for worker
+    pools).
+    """
+    articles = []
+    members = iter_pmc_archive(archive_path, include_body=include_body)
+    for _, member_articles in members:
+        articles.extend(member_articles)
+        if limit is not None and len(articles) >= limit:
+            break
+    members.close()
+    return articles
+
+
+@traced("data_loader.parse_pmc_archives")
+def parse_pmc_archives(archive_paths, include_body=False, limit=None, workers=None, ordered=True, stats=None):
+    """
+    Parses PMC .tar.gz archives without extracting them, sequentially or, with workers > 1, one archive per task in
+    a process pool. A limit applies per archive, as it does per folder in parse_folder_pmc.
+    """
+    parse_fn = partial(parse_pmc_archive, include_body=include_body, limit=limit)
+    if workers is not None and workers > 1:
+        parsed = parallel_parse(parse_fn, archive_paths, workers=workers, chunksize=1, ordered=ordered, stats=stats)
+    else:
+        parsed = ((archive_path, parse_fn(archive_path)) for archive_path in archive_paths)
+
+    articles = []
+    for _, archive_articles in parsed:
+        articles.extend(archive_articles)
+    record(files=len(archive_paths), articles=len(articles))
+    return articles
+
+
+@traced("data_loader.filter_pmc_articles_by_topics")
 def filter_pmc_articles_by_topics(articles, topics, include_body_in_filter=True, verbose=False):
     """
     Filters PMC articles by matching topics across multiple fields, optionally including the article body.
+    Bodies of lazily parsed articles are loaded one at a time, only when the other fields do not already match,
+    and are not kept.
     """
     filtered = []
     topics_lower = [t.lower() for t in topics]
@@ -206,106 +532,349 @@ def filter_pmc_articles_by_topics(articles, topics, include_body_in_filter=True,
 
         if any(topic in combined_text for topic in topics_lower):
             filtered.append(article)
+        elif include_body_in_filter and article.get("body_ref") is not None and not article.get("body"):
+            fields[-1] = load_pmc_body(article["body_ref"])
+            combined_text = " ".join(fields).lower()
+            if any(topic in combined_text for topic in topics_lower):
+                filtered.append(article)
 
     if verbose:
         print(f"{len(filtered)} out of {len(articles)} articles matched topic filter "
               f"(include_body_in_filter={include_body_in_filter})")
 
+    record(articles=len(articles), matched=len(filtered))
     return filtered
 
 
-def prepare_pubmed_documents(articles):
+def iter_pubmed_chunks(articles):
     """
-    Converts a list of parsed PubMed articles into LangChain Document objects with metadata.
+    Yields (source, pmid, title, year, chunks) per PubMed article; each article is a single title + abstract chunk.
     """
-    docs = []
     for article in articles:
         content = f"{article.get('title', '')}\n{article.get('abstract', '')}"
-        metadata = {
-            "source": "PubMed",
-            "pmid": article.get("pmid", "unknown"),
-            "title": article.get("title", "")
-        }
-        docs.append(Document(page_content=content.strip(), metadata=metadata))
-    return docs
+        yield ("PubMed", article.get("pmid", "unknown"), article.get("title", ""), article.get("publication_year"),
+               [(None, None, content.strip())])
+
+
+def iter_pmc_chunks(articles, chunker=None, batch_size=256):
+    """
+    Yields (source, pmcid, title, year, chunks) per PMC article: the abstract as one chunk and the body split into
+    token-budgeted chunks by a TokenChunker, which also drops near-duplicate body chunks.
+    Bodies are chunked in batches of batch_size articles; lazily parsed bodies are materialized one batch at a time.
+    """
+    chunker = chunker or TokenChunker(CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS, CHUNK_DEDUP_THRESHOLD)
+    articles = iter(articles)
+    while True:
+        batch = list(islice(articles, batch_size))
+        if not batch:
+            return
+
+        bodies = []
+        for article in batch:
+            body = article.get("body", "").strip()
+            if not body and article.get("body_ref") is not None:
+                body = load_pmc_body(article["body_ref"]).strip()
+            bodies.append(body)
+
+        for article, body_chunks in zip(batch, chunker.chunk_texts(bodies)):
+            abstract = article.get("abstract", "").strip()
+            chunks = [("abstract", -1, abstract)] if abstract else []
+            chunks.extend(("body", chunk_id, text) for chunk_id, text in body_chunks)
+            yield ("PMC", article.get("pmcid", "unknown"), article.get("title", ""), article.get("publication_year"),
+                   chunks)
+
+
+def _chunks_to_documents(articles):
+    return [
+        Document(page_content=text, metadata=chunk_metadata(source, external_id, title, year, section, chunk_id))
+        for source, external_id, title, year, chunks in articles
+        for section, chunk_id, text in chunks
+    ]
 
 
+def prepare_pubmed_documents(articles):
+    """
+    Converts a list of parsed PubMed articles into LangChain Document objects with metadata.
+    """
+    return _chunks_to_documents(iter_pubmed_chunks(articles))
 
-def prepare_pmc_documents(articles, chunk_size=1000, chunk_overlap=200):
+
+def prepare_pmc_documents(articles, chunker=None):
     """
     Converts PMC articles into chunked Document objects for downstream embedding and retrieval, splitting full texts if present.
+    Lazily parsed bodies are materialized here, only for the articles being chunked.
+    Pass a TokenChunker to change the token budget or to read its statistics afterwards.
     """
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap
-    )
+    return _chunks_to_documents(iter_pmc_chunks(articles, chunker=chunker))
 
-    docs = []
 
-    for article in articles:
-        pmcid = article.get("pmcid", "unknown")
-        title = article.get("title", "")
-        abstract = article.get("abstract", "").strip()
-        body = article.get("body", "").strip()
-
-        if abstract:
-            docs.append(Document(
-                page_content=abstract,
-                metadata={
-                    "source": "PMC",
-                    "pmcid": pmcid,
-                    "title": title,
-                    "chunk_id": -1,
-                    "section": "abstract"
-                }
-            ))
-
-        if body:
-            chunks = splitter.split_text(body)
-            for i, chunk in enumerate(chunks):
-                docs.append(Document(
-                    page_content=chunk.strip(),
-                    metadata={
-                        "source": "PMC",
-                        "pmcid": pmcid,
-                        "title": title,
-                        "chunk_id": i,
-                        "section": "body"
-                    }
-                ))
-
-    return docs
-
-
-def load_and_prepare_documents(topics, include_body=True, pmc_limit=None):
+@traced("data_loader.prepare_chunk_store")
+def prepare_chunk_store(articles_pubmed, articles_pmc, chunker=None):
     """
-    Loads and filters PubMed and PMC articles based on given topics, returning them as LangChain Documents.
+    Chunks PubMed and PMC articles like prepare_*_documents, into a compact ChunkStore instead of Documents.
+    """
+    store = ChunkStore.from_articles(chain(
+        iter_pubmed_chunks(articles_pubmed),
+        iter_pmc_chunks(articles_pmc, chunker=chunker)
+    ))
+    record(articles=len(articles_pubmed) + len(articles_pmc), chunks=len(store))
+    return store
+
+
+@traced("data_loader.parse_pubmed_files")
+def parse_pubmed_files(file_paths, workers=None, chunksize=1, ordered=True, stats=None):
+    """
+    Parses PubMed XML files sequentially or, with workers > 1, in a process pool.
+    """
+    if workers is not None and workers > 1:
+        articles = []
+        for _, file_articles in parallel_parse(parse_pubmed_file_streaming, file_paths, workers=workers,
+                                               chunksize=chunksize, ordered=ordered, stats=stats):
+            articles.extend(file_articles)
+    else:
+        articles = []
+        for file_path in file_paths:
+            articles.extend(iter_pubmed_articles(file_path))
+    record(files=len(file_paths), articles=len(articles))
+    return articles
+
+
+def find_pubmed_files(folder):
+    """
+    Lists the pubmed*.xml files in a folder, and the pubmed*.xml.gz files that were not extracted, sorted by name.
+    """
+    pubmed_files = glob.glob(os.path.join(folder, "pubmed*.xml"))
+    pubmed_files += [path for path in glob.glob(os.path.join(folder, "pubmed*.xml.gz"))
+                     if path[:-3] not in pubmed_files]
+    return sorted(pubmed_files)
+
+
+def find_source_files(data_dir="data"):
+    """
+    Lists the PubMed baseline files (pubmed*.xml, or pubmed*.xml.gz when not extracted), the PMC folders and the PMC
+    .tar.gz archives in the data directory, returning (pubmed_files, pmc_dirs, pmc_archives).
+    """
+    pubmed_files = find_pubmed_files(data_dir)
+    pmc_dirs = [os.path.join(data_dir, d) for d in os.listdir(data_dir)
+                if d.lower().startswith("pmc") and os.path.isdir(os.path.join(data_dir, d))]
+    pmc_archives = sorted(os.path.join(data_dir, name) for name in os.listdir(data_dir) if is_pmc_archive(name))
+    return pubmed_files, pmc_dirs, pmc_archives
+
+
+def ingest_corpus(store, data_dir="data", workers=None, verbose=False):
     """
-    pubmed_files = glob.glob("data/pubmed*.xml")
-    parsed_articles_pubmed = []
-    for file_path in pubmed_files:
-        parsed_articles_pubmed.extend(parse_pubmed_file_filtered(file_path))
-    filtered_articles_pubmed = filter_pubmed_articles_by_topics(parsed_articles_pubmed, topics)
+    Brings a CorpusStore up to date with the XML files in the data directory.
+
+    Only files whose mtime or size changed since the last ingest (or that are new) are parsed; files that disappeared
+    are removed from the store. PMC bodies are always stored so queries can run with or without them. Compressed
+    sources (pubmed*.xml.gz, PMC .tar.gz archives) are read as streams, without extracting them to disk.
+    """
+    pubmed_files, pmc_dirs, pmc_archives = find_source_files(data_dir)
+    current = {path: "pubmed" for path in pubmed_files}
+    for folder_path in pmc_dirs:
+        for filename in os.listdir(folder_path):
+            if filename.endswith(".xml"):
+                current[os.path.join(folder_path, filename)] = "pmc"
+    current.update((path, "pmc_archive") for path in pmc_archives)
+
+    known = store.file_states()
+    changed = {"pubmed": [], "pmc": [], "pmc_archive": []}
+    for path, kind in current.items():
+        stat = os.stat(path)
+        state = known.get(path)
+        if state is None or state[1] != stat.st_mtime or state[2] != stat.st_size:
+            changed[kind].append(path)
+
+    # Applied update files stay applied (see ingest_pubmed_updates), even once they are deleted from disk.
+    removed = [path for path, (kind, _, _) in known.items() if path not in current and kind != "pubmed_update"]
+    store.remove_files(removed)
+
+    stats = {}
+    parse_fns = {
+        "pubmed": parse_pubmed_file_streaming,
+        "pmc": partial(parse_pmc_file_filtered, include_body=True),
+        "pmc_archive": partial(parse_pmc_archive, include_body=True),
+    }
+    for kind, paths in changed.items():
+        if workers is not None and workers > 1:
+            parsed = parallel_parse(parse_fns[kind], paths, workers=workers, chunksize=16 if kind == "pmc" else 1,
+                                    ordered=True, stats=stats)
+        else:
+            parsed = ((path, parse_fns[kind](path)) for path in paths)
+
+        for path, articles in parsed:
+            stat = os.stat(path)
+            store.replace_file(path, kind, stat.st_mtime, stat.st_size, articles)
+
+    if verbose:
+        print(f"Ingested {len(changed['pubmed'])} PubMed files, {len(changed['pmc'])} PMC files and "
+              f"{len(changed['pmc_archive'])} PMC archives "
+              f"({len(current) - sum(map(len, changed.values()))} unchanged, {len(removed)} removed)")
+        if stats:
+            print_worker_stats(stats)
+
+    return {"pubmed": len(changed["pubmed"]), "pmc": len(changed["pmc"]),
+            "pmc_archives": len(changed["pmc_archive"]), "removed": len(removed)}
 
-    pmc_dirs = [os.path.join("data", d) for d in os.listdir("data")
-                if d.lower().startswith("pmc") and os.path.isdir(os.path.join("data", d))]
 
-    if not pubmed_files and not pmc_dirs:
+@traced("data_loader.ingest_pubmed_updates")
+def ingest_pubmed_updates(store, updates_dir=os.path.join("data", UPDATES_SUBDIR), workers=None, verbose=False):
+    """
+    Applies the PubMed update files in updates_dir that are new or changed since the last run to a CorpusStore, in
+    file-name order (which is NCBI's publication order), instead of re-parsing the baseline.
+
+    Returns the net changes as {pmid: article}, with None for PMIDs that were deleted or whose revision no longer
+    passes the filter; update_corpus_vector_index applies the same changes to the vector index.
+    """
+    known = store.file_states()
+    pending = []
+    for path in find_pubmed_files(updates_dir):
+        stat = os.stat(path)
+        state = known.get(path)
+        if state is None or state[1] != stat.st_mtime or state[2] != stat.st_size:
+            pending.append(path)
+
+    stats = {}
+    if workers is not None and workers > 1:
+        parsed = parallel_parse(parse_pubmed_update_file, pending, workers=workers, chunksize=1, ordered=True,
+                                stats=stats)
+    else:
+        parsed = ((path, parse_pubmed_update_file(path)) for path in pending)
+
+    changes = {}
+    for path, update in parsed:
+        stat = os.stat(path)
+        store.apply_pubmed_update(path, stat.st_mtime, stat.st_size, update)
+        merge_pubmed_update(changes, update)
+
+    revised = sum(article is not None for article in changes.values())
+    if verbose:
+        print(f"Applied {len(pending)} PubMed update files: {revised} revised, {len(changes) - revised} removed")
+        if stats:
+            print_worker_stats(stats)
+
+    record(files=len(pending), revised=revised, removed=len(changes) - revised)
+    return changes
+
+
+@traced("data_loader.load_corpus")
+def load_corpus(include_body=True, pmc_limit=None, workers=None, ordered=True, store_path=CORPUS_DB_PATH,
+                lazy_body=False, verbose=False):
+    """
+    Loads all PubMed and PMC articles, returning (pubmed_articles, pmc_articles).
+
+    If a corpus store exists at store_path the articles are read from it; otherwise the XML files in 'data/' are
+    parsed (in a process pool when workers > 1), compressed ones straight from their archives. With lazy_body=True,
+    PMC articles from XML files carry a "body_ref" instead of their body text (see load_pmc_body).
+    """
+    if store_path and os.path.exists(store_path):
+        with CorpusStore(store_path) as store:
+            articles_pubmed = store.load_pubmed_articles()
+            articles_pmc = store.load_pmc_articles(include_body=include_body, limit=pmc_limit, lazy_body=lazy_body)
+        record(pubmed_articles=len(articles_pubmed), pmc_articles=len(articles_pmc))
+        return articles_pubmed, articles_pmc
+
+    stats = {}
+
+    pubmed_files, pmc_dirs, pmc_archives = find_source_files("data")
+    if not pubmed_files and not pmc_dirs and not pmc_archives:
         raise FileNotFoundError("No data files found in 'data/'. Please run the download script.")
 
+    articles_pubmed = parse_pubmed_files(pubmed_files, workers=workers, ordered=ordered, stats=stats)
+
     articles_pmc = []
     for folder_path in pmc_dirs:
-        articles_pmc.extend(parse_folder_pmc(folder_path, include_body=include_body, limit=pmc_limit))
-    filtered_articles_pmc = filter_pmc_articles_by_topics(articles_pmc, topics, include_body_in_filter=include_body)
+        articles_pmc.extend(parse_folder_pmc(folder_path, include_body=include_body, limit=pmc_limit,
+                                             workers=workers, ordered=ordered, stats=stats,
+                                             lazy_body=lazy_body))
+    articles_pmc.extend(parse_pmc_archives(pmc_archives, include_body=include_body, limit=pmc_limit, workers=workers,
+                                           ordered=ordered, stats=stats))
 
-    pubmed_docs = prepare_pubmed_documents(filtered_articles_pubmed)
-    pmc_docs = prepare_pmc_documents(filtered_articles_pmc)
-    return pubmed_docs + pmc_docs
+    if verbose and stats:
+        print_worker_stats(stats)
 
+    record(pubmed_articles=len(articles_pubmed), pmc_articles=len(articles_pmc))
+    return articles_pubmed, articles_pmc
 
 
+def load_indexed_corpus(include_body=True, pmc_limit=None, workers=None, ordered=True, store_path=CORPUS_DB_PATH,
+                        lazy_body=False, verbose=False):
+    """
+    Loads the corpus once and builds topic indexes over it, for processes that answer many questions.
+    The returned dict can be passed to load_and_prepare_documents(corpus=...) to skip loading and brute-force filtering.
+    """
+    articles_pubmed, articles_pmc = load_corpus(include_body=include_body, pmc_limit=pmc_limit, workers=workers,
+                                                ordered=ordered, store_path=store_path, lazy_body=lazy_body,
+                                                verbose=verbose)
+    return index_corpus(articles_pubmed, articles_pmc, include_body=include_body)
 
 
+@traced("data_loader.index_corpus")
+def index_corpus(articles_pubmed, articles_pmc, include_body=True):
+    """
+    Builds the topic indexes over already loaded articles, returning the corpus dict of load_indexed_corpus.
+    Lazily parsed PMC bodies are read once here, one at a time, so that the index matches bodies like
+    filter_pmc_articles_by_topics: building costs a pass over every body, though none is kept in memory.
+    """
+    return {
+        "pubmed": articles_pubmed,
+        "pmc": articles_pmc,
+        "pubmed_index": TopicIndex.from_pubmed_articles(articles_pubmed),
+        "pmc_index": TopicIndex.from_pmc_articles(articles_pmc, body_loader=load_pmc_body),
+        "include_body": include_body,
+    }
+
+
+@traced("data_loader.filter_corpus_by_topics")
+def filter_corpus_by_topics(corpus, topics):
+    """
+    Filters a corpus from load_indexed_corpus by topics, returning (pubmed_articles, pmc_articles).
+    """
+    filtered_articles_pubmed = corpus["pubmed_index"].filter(corpus["pubmed"], topics)
+    filtered_articles_pmc = corpus["pmc_index"].filter(corpus["pmc"], topics, include_body=corpus["include_body"])
+    record(matched=len(filtered_articles_pubmed) + len(filtered_articles_pmc))
+    return filtered_articles_pubmed, filtered_articles_pmc
 
 
+@traced("data_loader.load_filtered_articles")
+def load_filtered_articles(topics, include_body=True, pmc_limit=None, workers=None, ordered=True,
+                           store_path=CORPUS_DB_PATH, corpus=None, articles=None, lazy_body=False, verbose=False):
+    """
+    Loads PubMed and PMC articles and filters them by topics, returning (pubmed_articles, pmc_articles).
+    Articles come from a preloaded corpus (see load_indexed_corpus) when given, filtered through its topic indexes;
+    else from articles, (pubmed_articles, pmc_articles) already returned by load_corpus; else from the corpus store
+    when one exists, otherwise from parsing the XML files. Without a corpus they are filtered by brute force. With
+    lazy_body=True only the bodies of matching PMC articles are kept in memory.
+    """
+    if corpus is not None:
+        filtered_articles_pubmed, filtered_articles_pmc = filter_corpus_by_topics(corpus, topics)
+    else:
+        if articles is None:
+            articles = load_corpus(include_body=include_body, pmc_limit=pmc_limit, workers=workers, ordered=ordered,
+                                   store_path=store_path, lazy_body=lazy_body, verbose=verbose)
+        articles_pubmed, articles_pmc = articles
+
+        filtered_articles_pubmed = filter_pubmed_articles_by_topics(articles_pubmed, topics)
+        filtered_articles_pmc = filter_pmc_articles_by_topics(articles_pmc, topics,
+                                                              include_body_in_filter=include_body)
+
+    if verbose:
+        print(f"{len(filtered_articles_pubmed)} PubMed and {len(filtered_articles_pmc)} PMC articles matched topics")
 
+    return filtered_articles_pubmed, filtered_articles_pmc
+
+
+def load_and_prepare_documents(topics, include_body=True, pmc_limit=None, workers=None, ordered=True,
+                               store_path=CORPUS_DB_PATH, corpus=None, lazy_body=False, verbose=False):
+    """
+    Loads and filters PubMed and PMC articles based on given topics, returning them as LangChain Documents.
+    See load_filtered_articles for where the articles come from.
+    """
+    filtered_articles_pubmed, filtered_articles_pmc = load_filtered_articles(
+        topics, include_body=include_body, pmc_limit=pmc_limit, workers=workers, ordered=ordered,
+        store_path=store_path, corpus=corpus, lazy_body=lazy_body, verbose=verbose
+    )
+
+    pubmed_docs = prepare_pubmed_documents(filtered_articles_pubmed)
+    pmc_docs = prepare_pmc_documents(filtered_articles_pmc)
+    return pubmed_docs + pmc_docs
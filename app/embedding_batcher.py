@@ -0,0 +1,136 @@
+import asyncio
+import random
+import openai
+import tiktoken
+from langchain_core.embeddings import Embeddings
+from config import OPENAI_API_KEY
+from app.tracing import span, record
+
+# Per-request limits of the OpenAI embeddings endpoint.
+MAX_TOKENS_PER_INPUT = 8191
+MAX_TOKENS_PER_REQUEST = 300_000
+MAX_INPUTS_PER_REQUEST = 2048
+
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError,
+                    openai.InternalServerError)
+
+
+def plan_embedding_batches(token_lists, max_tokens_per_request=MAX_TOKENS_PER_REQUEST,
+                           max_inputs_per_request=MAX_INPUTS_PER_REQUEST):
+    """
+    Packs tokenized inputs, in order, into requests that respect the per-request token and input limits.
+    Returns a list of batches, each a list of input positions.
+    """
+    batches = []
+    current, current_tokens = [], 0
+    for position, tokens in enumerate(token_lists):
+        if current and (current_tokens + len(tokens) > max_tokens_per_request
+                        or len(current) >= max_inputs_per_request):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(position)
+        current_tokens += len(tokens)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _retry_delay(error, attempt, base_delay, max_delay):
+    """
+    Backoff before the next attempt: the server's Retry-After when given, else jittered exponential backoff.
+    """
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), max_delay)
+        except ValueError:
+            pass
+    return min(base_delay * 2 ** attempt, max_delay) * (0.5 + random.random() / 2)
+
+
+class BatchedOpenAIEmbeddings(Embeddings):
+    """
+    OpenAI embeddings that count tokens locally with tiktoken, pack inputs into requests up to the API's
+    per-request limits and send the requests concurrently under an in-flight limit, retrying rate-limit and
+    transient errors with backoff.
+
+    Inputs longer than MAX_TOKENS_PER_INPUT are truncated. Counters of requests, retries and tokens sent are
+    kept on the instance.
+    """
+
+    def __init__(self, model="text-embedding-ada-002", max_in_flight=8, max_retries=6, base_delay=0.5,
+                 max_delay=30.0, max_tokens_per_request=MAX_TOKENS_PER_REQUEST,
+                 max_inputs_per_request=MAX_INPUTS_PER_REQUEST, encoding=None, client_kwargs=None):
+        self.model = model
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_tokens_per_request = max_tokens_per_request
+        self.max_inputs_per_request = max_inputs_per_request
+        self._encoding = encoding
+        self.client_kwargs = client_kwargs or {}
+        self.requests = 0
+        self.retries = 0
+        self.tokens = 0
+
+    @property
+    def encoding(self):
+        if self._encoding is None:
+            self._encoding = tiktoken.encoding_for_model(self.model)
+        return self._encoding
+
+    def tokenize(self, texts):
+        """
+        Tokenizes texts in one batch call, truncating to the per-input limit. Empty texts become a single space.
+        """
+        token_lists = self.encoding.encode_ordinary_batch([text or " " for text in texts])
+        return [tokens[:MAX_TOKENS_PER_INPUT] for tokens in token_lists]
+
+    async def _embed_batch(self, client, semaphore, token_lists):
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = await client.embeddings.create(model=self.model, input=token_lists)
+                    self.requests += 1
+                    self.tokens += sum(len(tokens) for tokens in token_lists)
+                    record(embedding_requests=1, embedding_tokens=sum(len(tokens) for tokens in token_lists))
+                    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+                except RETRYABLE_ERRORS as error:
+                    if attempt == self.max_retries:
+                        raise
+                    self.retries += 1
+                    record(embedding_retries=1)
+                    await asyncio.sleep(_retry_delay(error, attempt, self.base_delay, self.max_delay))
+
+    async def aembed_documents(self, texts):
+        if not texts:
+            return []
+        token_lists = self.tokenize(texts)
+        batches = plan_embedding_batches(token_lists, self.max_tokens_per_request, self.max_inputs_per_request)
+
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        # Retries are handled here, with the in-flight limit held, rather than inside the client.
+        async with openai.AsyncOpenAI(api_key=OPENAI_API_KEY, max_retries=0, **self.client_kwargs) as client:
+            results = await asyncio.gather(*[
+                self._embed_batch(client, semaphore, [token_lists[position] for position in batch])
+                for batch in batches
+            ])
+
+        vectors = [None] * len(texts)
+        for batch, batch_vectors in zip(batches, results):
+            for position, vector in zip(batch, batch_vectors):
+                vectors[position] = vector
+        return vectors
+
+    async def aembed_query(self, text):
+        return (await self.aembed_documents([text]))[0]
+
+    def embed_documents(self, texts):
+        with span("embeddings.embed_documents", model=self.model) as embedding:
+            embedding.add(texts=len(texts))
+            return asyncio.run(self.aembed_documents(texts))
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
@@ -0,0 +1,259 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from app.tracing import record
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    row INTEGER NOT NULL UNIQUE,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries (last_used);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def embedding_key(model_name, text):
+    """
+    Content address of an embedding: hash of the model name and the exact text.
+    """
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+
+def key_tag(key):
+    """
+    64-bit tag of a key, stored next to its vector to check that a row still holds that key's vector.
+    """
+    return np.uint64(int(key[:16], 16))
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache of one embedding model: a memory-mapped float32 matrix holding one vector per row, plus
+    an SQLite index from content key to row. The files live in a directory named after the model and carry the
+    vector dimension in their names; the matrix grows as rows are needed, up to max_rows, after which the least
+    recently used rows are reused. Each row also stores a tag of its key, checked on every read, so a row that was
+    reused or only partly written is never returned for another key.
+    Safe to share between threads (calls are serialized) and between processes (through SQLite transactions).
+    """
+
+    def __init__(self, cache_dir, model_name, max_rows=1_000_000):
+        self.cache_dir = os.path.join(cache_dir, re.sub(r"[^\w.-]", "_", model_name))
+        self.model_name = model_name
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.RLock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Autocommit mode: reads and writes take an explicit IMMEDIATE transaction, so concurrent processes allocate
+        # distinct rows and a row cannot be evicted between looking up its key and reading its vector.
+        self.conn = sqlite3.connect(os.path.join(self.cache_dir, "index.sqlite"), timeout=30,
+                                    check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.dim = None
+        self.vectors = None
+        self.tags = None
+
+    def _get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, str(value))
+        )
+
+    def _paths(self):
+        return (os.path.join(self.cache_dir, f"vectors-{self.dim}d.f32"),
+                os.path.join(self.cache_dir, f"tags-{self.dim}d.u64"))
+
+    def _map(self, min_rows=1):
+        """
+        Maps the matrix files (opened lazily, and again after another process grew them). Returns whether at least
+        min_rows rows are mapped.
+        """
+        if self.dim is None:
+            dim = self._get_meta("dim")
+            if dim is None:
+                return False
+            self.dim = int(dim)
+        if self.vectors is not None and len(self.vectors) >= min_rows:
+            return True
+        vectors_path, tags_path = self._paths()
+        if not os.path.exists(vectors_path) or not os.path.exists(tags_path):
+            return False
+        rows = min(os.path.getsize(vectors_path) // (4 * self.dim), os.path.getsize(tags_path) // 8)
+        if rows < min_rows:
+            return False
+        self.vectors = np.memmap(vectors_path, dtype=np.float32, mode="r+", shape=(rows, self.dim))
+        self.tags = np.memmap(tags_path, dtype=np.uint64, mode="r+", shape=(rows,))
+        return True
+
+    def _grow(self, rows):
+        """
+        Extends the matrix files to hold at least `rows` rows, doubling their size to keep resizes rare.
+        """
+        if self._map(rows):
+            return
+        capacity = len(self.vectors) if self.vectors is not None else 0
+        capacity = min(max(rows, 2 * capacity, 1024), self.max_rows)
+        self.vectors = self.tags = None
+        for path, row_size in zip(self._paths(), (4 * self.dim, 8)):
+            with open(path, "ab") as f:
+                if f.tell() < capacity * row_size:
+                    f.truncate(capacity * row_size)
+        self._map(rows)
+
+    def _existing_rows(self, keys):
+        found = {}
+        for begin in range(0, len(keys), 500):
+            batch = keys[begin:begin + 500]
+            placeholders = ",".join("?" * len(batch))
+            found.update(self.conn.execute(
+                f"SELECT key, row FROM entries WHERE key IN ({placeholders})", batch
+            ).fetchall())
+        return found
+
+    def get_many(self, keys):
+        """
+        Returns a list with the cached vector (float32 array) for each key, or None for misses.
+        """
+        with self.lock:
+            results = [None] * len(keys)
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                found = self._existing_rows(keys)
+                if found and self._map(max(found.values()) + 1):
+                    valid = [key for key, row in found.items() if self.tags[row] == key_tag(key)]
+                    vectors = {key: np.array(self.vectors[found[key]]) for key in valid}
+                    results = [vectors.get(key) for key in keys]
+                    now = time.time()
+                    self.conn.executemany("UPDATE entries SET last_used = ? WHERE key = ?",
+                                          [(now, key) for key in valid])
+                    # Rows whose tag does not match were overwritten by a write that was rolled back.
+                    self.conn.executemany("DELETE FROM entries WHERE key = ?",
+                                          [(key,) for key in found if key not in vectors])
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+            misses = sum(1 for result in results if result is None)
+            self.hits += len(keys) - misses
+            self.misses += misses
+            record(embedding_cache_hits=len(keys) - misses, embedding_cache_misses=misses)
+            return results
+
+    def _allocate_rows(self, count):
+        """
+        Returns `count` free matrix rows, evicting the least recently used entries when the matrix is full.
+        """
+        next_row = int(self._get_meta("next_row") or 0)
+        rows = list(range(next_row, min(next_row + count, self.max_rows)))
+        self._set_meta("next_row", next_row + len(rows))
+
+        shortfall = count - len(rows)
+        if shortfall > 0:
+            evicted = self.conn.execute(
+                "SELECT key, row FROM entries ORDER BY last_used LIMIT ?", (shortfall,)
+            ).fetchall()
+            self.conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in evicted])
+            rows.extend(row for _, row in evicted)
+            self.evictions += len(evicted)
+        return rows
+
+    def put_many(self, keys, vectors):
+        """
+        Stores vectors under their keys. Keys already present are left untouched.
+        """
+        with self.lock:
+            vectors = np.asarray(vectors, dtype=np.float32)
+            if not len(keys):
+                return
+            # Beyond max_rows only the most recent vectors can be kept.
+            keys, vectors = keys[-self.max_rows:], vectors[-self.max_rows:]
+            now = time.time()
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self.dim is None and self._get_meta("dim") is None:
+                    self._set_meta("dim", vectors.shape[1])
+                self._map(0)
+                if vectors.shape[1] != self.dim:
+                    raise ValueError(f"The embedding cache in {self.cache_dir} holds {self.dim}-dimensional "
+                                     f"vectors, got {vectors.shape[1]}")
+                present = self._existing_rows(keys)
+                new = [i for i, key in enumerate(keys) if key not in present]
+                rows = self._allocate_rows(len(new))
+                if rows:
+                    self._grow(max(rows) + 1)
+                for i, row in zip(new, rows):
+                    self.vectors[row] = vectors[i]
+                    self.tags[row] = key_tag(keys[i])
+                if rows:
+                    self.vectors.flush()
+                    self.tags.flush()
+                self.conn.executemany("INSERT INTO entries (key, row, last_used) VALUES (?, ?, ?)",
+                                      [(keys[i], row, now) for i, row in zip(new, rows)])
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def stats(self):
+        """
+        Returns hit/miss/eviction counters and the number of cached vectors.
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else None,
+            "evictions": self.evictions,
+            "size": self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0],
+            "max_rows": self.max_rows,
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    LangChain Embeddings wrapper that serves vectors from an EmbeddingCache and only sends cache misses to the
+    underlying embedding backend.
+    """
+
+    def __init__(self, underlying, model_name, cache):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.cache = cache
+
+    def embed_documents(self, texts):
+        keys = [embedding_key(self.model_name, text) for text in texts]
+        vectors = self.cache.get_many(keys)
+
+        missing = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None:
+                missing.setdefault(key, text)
+
+        if missing:
+            miss_keys = list(missing)
+            computed = self.underlying.embed_documents([missing[key] for key in miss_keys])
+            self.cache.put_many(miss_keys, computed)
+            by_key = dict(zip(miss_keys, computed))
+            vectors = [vector if vector is not None else by_key[key] for key, vector in zip(keys, vectors)]
+
+        return np.asarray(vectors, dtype=np.float32).tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
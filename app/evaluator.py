@@ -1,6 +1,8 @@
 import json
 import re
-from config import OPENAI_API_KEY, client
+from config import OPENAI_API_KEY
+from app.llm_cache import chat_completion
+from app.tracing import traced
 
 evaluation_prompt_template = """
 You are an expert medical evaluator reviewing the quality of an automatically generated summary.
@@ -42,6 +44,7 @@ def clean_json_text(text: str) -> str:
     text = re.sub(r"```(?:json)?\s*([\s\S]*?)\s*```", r"\1", text)
     return text.strip()
 
+@traced("evaluator.evaluate_summary")
 def evaluate_summary(user_role: str, user_question: str, summary_text: str):
     """
     Sends the generated summary to an LLM for evaluation based on medical criteria.
@@ -52,7 +55,8 @@ def evaluate_summary(user_role: str, user_question: str, summary_text: str):
         summary_text=summary_text
     )
 
-    response = client.chat.completions.create(
+    content = chat_completion(
+        "evaluate",
         model="gpt-4o",
         messages=[
             {"role": "system", "content": "You are a senior biomedical research evaluator."},
@@ -60,8 +64,6 @@ def evaluate_summary(user_role: str, user_question: str, summary_text: str):
         ],
         temperature=0
     )
-
-    content = response.choices[0].message.content
     cleaned = clean_json_text(content)
 
     try:
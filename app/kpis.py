@@ -1,8 +1,15 @@
 from typing import Dict
+import argparse
+import json
 import re
 from typing import List
 import numpy as np
-from config import OPENAI_API_KEY, client
+import tiktoken
+from config import KPI_EMBEDDING_MODEL
+from app.tracing import traced, record
+
+# [PMID12345] / [PMC12345] citations; the group is the cited label.
+CITATION_PATTERN = re.compile(r"\[(PM(?:C|ID)\d+)\]")
 
 
 def count_citations(summary: str) -> int:
@@ -10,24 +17,13 @@ def count_citations(summary: str) -> int:
     Count citations from PubMed and PMC in the summary.
     Looks for [PMID12345] and [PMC12345] patterns.
     """
-    return len(re.findall(r"\[PM(C|ID)\d+\]", summary))
+    return len(CITATION_PATTERN.findall(summary))
 
 def count_tokens(summary: str, model_name: str = "gpt-4") -> int:
     """
-    Estimate the number of tokens used in the summary using OpenAI tokenizer.
+    Count the number of tokens in the summary locally, with the model's tiktoken encoding.
     """
-    messages = [
-        {"role": "system", "content": "Count the number of tokens in the following text."},
-        {"role": "user", "content": summary},
-    ]
-
-    response = client.chat.completions.create(
-        model=model_name,
-        messages=messages,
-        temperature=0,
-        max_tokens=1
-    )
-    return response.usage.total_tokens
+    return len(tiktoken.encoding_for_model(model_name).encode_ordinary(summary))
 
 def count_source_documents(documents: List[dict]) -> int:
     """
@@ -44,18 +40,109 @@ def compute_avg_llm_score(evaluation_report: Dict[str, dict]) -> float:
         2
     )
 
-def compute_semantic_similarity_to_query(summary: str, query: str, model_name: str = "text-embedding-3-small") -> float:
+def cosine_similarities(vectors_a, vectors_b) -> np.ndarray:
+    """
+    Row-wise cosine similarity of two equally shaped batches of vectors.
+    """
+    a = np.asarray(vectors_a, dtype=np.float32)
+    b = np.asarray(vectors_b, dtype=np.float32)
+    norms = np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1)
+    return np.divide((a * b).sum(axis=1), norms, out=np.zeros(len(a), dtype=np.float32), where=norms > 0)
+
+def _fill_vectors(texts, vectors, embedding_model):
+    """
+    Returns vectors for texts, embedding (in one batch) only those not supplied.
+    """
+    vectors = list(vectors) if vectors is not None else [None] * len(texts)
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if missing:
+        if embedding_model is None:
+            from app.retrieval import get_embedding_model
+            embedding_model = get_embedding_model(model=KPI_EMBEDDING_MODEL)
+        for i, vector in zip(missing, embedding_model.embed_documents([texts[i] for i in missing])):
+            vectors[i] = vector
+    return vectors
+
+def compute_semantic_similarity_to_query(summary: str, query: str, query_vector=None, summary_vector=None,
+                                         embedding_model=None) -> float:
     """
     Compute cosine similarity between the query and generated summary using OpenAI embeddings.
     Returns a float between 0 (unrelated) and 1 (identical).
+    Vectors already computed with the same model are reused; the others come from KPI_EMBEDDING_MODEL
+    (text-embedding-3-small by default), through the on-disk embedding cache.
+    """
+    vectors = _fill_vectors([query, summary], [query_vector, summary_vector], embedding_model)
+    return round(float(cosine_similarities([vectors[0]], [vectors[1]])[0]), 4)
+
+@traced("kpis.compute_kpis_batch")
+def compute_kpis_batch(summaries: List[str], queries: List[str], evaluation_reports: List[dict] = None,
+                       num_source_documents: List[int] = None, query_vectors: list = None,
+                       summary_vectors: list = None, embedding_model=None, model_name: str = "gpt-4") -> List[dict]:
+    """
+    Computes the KPIs of many summaries at once: tokens are counted locally in one tiktoken batch call, missing
+    query/summary vectors (KPI_EMBEDDING_MODEL ones) are embedded in one batch, and similarities are computed with a single vectorized
+    cosine. KPIs whose inputs are not given (evaluation reports, source counts) are None.
     """
-    embeddings = client.embeddings.create(
-        model=model_name,
-        input=[query, summary]
+    count = len(summaries)
+    record(summaries=count)
+    encoding = tiktoken.encoding_for_model(model_name)
+    num_tokens = [len(tokens) for tokens in encoding.encode_ordinary_batch(list(summaries))]
+
+    texts = list(queries) + list(summaries)
+    vectors = _fill_vectors(
+        texts,
+        list(query_vectors or [None] * count) + list(summary_vectors or [None] * count),
+        embedding_model
     )
-    vec_query = np.array(embeddings.data[0].embedding)
-    vec_summary = np.array(embeddings.data[1].embedding)
+    similarities = cosine_similarities(vectors[:count], vectors[count:]) if count else []
 
-    cosine_sim = np.dot(vec_query, vec_summary) / (np.linalg.norm(vec_query) * np.linalg.norm(vec_summary))
-    return round(float(cosine_sim), 4)
+    return [
+        {
+            "avg_llm_score": compute_avg_llm_score(evaluation_reports[i]) if evaluation_reports else None,
+            "num_citations": count_citations(summaries[i]),
+            "num_tokens": num_tokens[i],
+            "num_source_documents": num_source_documents[i] if num_source_documents else None,
+            "semantic_similarity_to_query": round(float(similarities[i]), 4),
+        }
+        for i in range(count)
+    ]
+
+def compute_kpis(summary: str, query: str, evaluation_report: dict = None, documents: list = None,
+                 query_vector=None, summary_vector=None, embedding_model=None) -> dict:
+    """
+    KPIs of a single summary; see compute_kpis_batch.
+    """
+    return compute_kpis_batch(
+        [summary], [query],
+        evaluation_reports=[evaluation_report] if evaluation_report is not None else None,
+        num_source_documents=[count_source_documents(documents)] if documents is not None else None,
+        query_vectors=[query_vector], summary_vectors=[summary_vector], embedding_model=embedding_model
+    )[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute KPIs over archived results (JSON lines).")
+    parser.add_argument("input", help="JSONL with summary, query and optionally evaluation_report, "
+                                      "num_source_documents, query_vector and summary_vector per line")
+    parser.add_argument("--output", default=None, help="Write one KPI object per line here (default: stdout)")
+    args = parser.parse_args()
+
+    with open(args.input) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    kpis_batch = compute_kpis_batch(
+        [record["summary"] for record in records],
+        [record["query"] for record in records],
+        evaluation_reports=([record["evaluation_report"] for record in records]
+                            if all(record.get("evaluation_report") for record in records) else None),
+        num_source_documents=([record["num_source_documents"] for record in records]
+                              if all("num_source_documents" in record for record in records) else None),
+        query_vectors=[record.get("query_vector") for record in records],
+        summary_vectors=[record.get("summary_vector") for record in records],
+    )
 
+    lines = "\n".join(json.dumps(kpis) for kpis in kpis_batch) + "\n"
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(lines)
+    else:
+        print(lines, end="")
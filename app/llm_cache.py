@@ -0,0 +1,274 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from config import (get_client, LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_MAX_MB,
+                    LLM_CACHE_BYPASS)
+from app.tracing import span, record
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    call_site TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used);
+CREATE INDEX IF NOT EXISTS idx_responses_created ON responses (created);
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    entries INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+"""
+
+_llm_cache = None
+
+
+def llm_cache_key(model, messages, params):
+    """
+    Content address of an LLM response: hash of the model, the exact messages and the sampling parameters.
+    """
+    payload = json.dumps({"model": model, "messages": messages, "params": params}, sort_keys=True,
+                         ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    On-disk cache of deterministic (temperature 0) LLM responses in SQLite, shared by concurrent processes.
+
+    Entries older than ttl_seconds are treated as misses and purged; beyond max_entries or max_bytes of response
+    text the least recently used entries are evicted; the number and size of entries are kept as running totals
+    in the totals table, so a put does not scan the cache. Hits and misses are counted per call site. With bypass=True
+    lookups always miss but fresh responses are still stored, which refreshes the cache. Safe to share between
+    threads (calls are serialized).
+    """
+
+    def __init__(self, db_path, ttl_seconds=None, max_entries=100_000, max_bytes=512 * 2 ** 20, bypass=False):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bypass = bypass
+        self.counters = {}
+        self.evictions = 0
+        self.lock = threading.RLock()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit mode: writes take an explicit IMMEDIATE transaction so concurrent processes evict consistently.
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        # Caches created before the running totals were kept are scanned once.
+        self.conn.execute("INSERT OR IGNORE INTO totals (id, entries, bytes) "
+                          "SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM responses")
+
+    def _count(self, call_site, hit):
+        counters = self.counters.setdefault(call_site, {"hits": 0, "misses": 0})
+        counters["hits" if hit else "misses"] += 1
+        record(**{"llm_cache_hits" if hit else "llm_cache_misses": 1})
+
+    def _oldest_valid(self, now):
+        return now - self.ttl_seconds if self.ttl_seconds else 0.0
+
+    def get(self, key, call_site):
+        """
+        Returns the cached response text for key, or None on a miss.
+        """
+        with self.lock:
+            if self.bypass:
+                self._count(call_site, False)
+                return None
+            now = time.time()
+            row = self.conn.execute("SELECT response FROM responses WHERE key = ? AND created >= ?",
+                                    (key, self._oldest_valid(now))).fetchone()
+            if row is not None:
+                self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._count(call_site, row is not None)
+            return row[0] if row else None
+
+    def put(self, key, call_site, response):
+        """
+        Stores a response (replacing any previous one for the key) and applies TTL and size limits.
+        """
+        if not isinstance(response, str):
+            raise TypeError(f"Only text responses can be cached, got {type(response).__name__} for {call_site}")
+        with self.lock:
+            now = time.time()
+            size = len(response.encode("utf-8"))
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                previous = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, call_site, response, size, created, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, call_site, response, size, now, now)
+                )
+                if previous is None:
+                    self._add_totals(1, size)
+                else:
+                    self._add_totals(0, size - previous[0])
+                self._evict(now)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def _add_totals(self, entries, size):
+        self.conn.execute("UPDATE totals SET entries = entries + ?, bytes = bytes + ? WHERE id = 0", (entries, size))
+
+    def _totals(self):
+        return self.conn.execute("SELECT entries, bytes FROM totals WHERE id = 0").fetchone()
+
+    def _evict(self, now):
+        oldest_valid = self._oldest_valid(now)
+        expired, expired_bytes = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses WHERE created < ?", (oldest_valid,)
+        ).fetchone()
+        if expired:
+            self.conn.execute("DELETE FROM responses WHERE created < ?", (oldest_valid,))
+            self._add_totals(-expired, -expired_bytes)
+        count, total = self._totals()
+        victims = []
+        if count > self.max_entries or total > self.max_bytes:
+            excess_entries = max(0, count - self.max_entries)
+            excess_bytes = max(0, total - self.max_bytes)
+            victim_bytes = 0
+            for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY last_used"):
+                if len(victims) >= excess_entries and victim_bytes >= excess_bytes:
+                    break
+                victims.append((key,))
+                victim_bytes += size
+            self.conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+            self._add_totals(-len(victims), -victim_bytes)
+        self.evictions += expired + len(victims)
+
+    def get_or_compute(self, call_site, model, messages, params, compute):
+        """
+        Returns the cached response for (model, messages, params), or calls compute() and caches its result. A result
+        of None (a completion without text content, e.g. a refusal or a tool call) is returned but not cached.
+        """
+        key = llm_cache_key(model, messages, params)
+        response = self.get(key, call_site)
+        if response is None:
+            response = compute()
+            if response is not None:
+                self.put(key, call_site, response)
+        return response
+
+    def stats(self):
+        """
+        Per-call-site hit/miss counters and hit rates, evictions, and the number and size of cached responses.
+        """
+        call_sites = {}
+        for call_site, counters in sorted(self.counters.items()):
+            total = counters["hits"] + counters["misses"]
+            call_sites[call_site] = dict(counters, hit_rate=round(counters["hits"] / total, 4) if total else None)
+        count, total = self._totals()
+        return {"call_sites": call_sites, "evictions": self.evictions, "size": count, "bytes": total}
+
+
+def get_llm_cache():
+    """
+    Returns the process-wide LLM response cache, or None when LLM_CACHE_PATH is empty.
+    """
+    global _llm_cache
+    if _llm_cache is None and LLM_CACHE_PATH:
+        _llm_cache = LLMResponseCache(LLM_CACHE_PATH, ttl_seconds=LLM_CACHE_TTL_SECONDS or None,
+                                      max_entries=LLM_CACHE_MAX_ENTRIES, max_bytes=LLM_CACHE_MAX_MB * 2 ** 20,
+                                      bypass=LLM_CACHE_BYPASS)
+    return _llm_cache
+
+
+def message_dicts(messages):
+    """
+    Converts LangChain chat messages to OpenAI-style role/content dicts, for use as a cache key.
+    """
+    roles = {"system": "system", "human": "user", "ai": "assistant"}
+    return [{"role": roles.get(message.type, message.type), "content": message.content} for message in messages]
+
+
+def cached_llm_call(call_site, model, messages, params, compute):
+    """
+    Serves a deterministic LLM call from the response cache. Calls with a non-zero temperature, or with the cache
+    disabled, always go to compute().
+    """
+    with span(f"llm.{call_site}", model=model):
+        cache = get_llm_cache()
+        if cache is None or params.get("temperature", 1) != 0:
+            return compute()
+        return cache.get_or_compute(call_site, model, messages, params, compute)
+
+
+def record_usage(prompt_tokens, completion_tokens):
+    """
+    Adds the token usage reported for an LLM call to the current tracing span.
+    """
+    record(llm_calls=1, prompt_tokens=prompt_tokens or 0, completion_tokens=completion_tokens or 0)
+
+
+def chat_completion(call_site, model, messages, **params):
+    """
+    Returns the message content of an OpenAI chat completion, through the response cache.
+    """
+    def compute():
+        response = get_client().chat.completions.create(model=model, messages=messages, **params)
+        if response.usage is not None:
+            record_usage(response.usage.prompt_tokens, response.usage.completion_tokens)
+        return response.choices[0].message.content
+
+    return cached_llm_call(call_site, model, messages, params, compute)
+
+
+def cached_llm_stream(call_site, model, messages, params, stream):
+    """
+    Streaming counterpart of cached_llm_call: yields the pieces of stream() and caches their concatenation once the
+    stream completes, unless it is empty. A cached response is yielded as a single piece.
+    """
+    cache = get_llm_cache()
+    if cache is None or params.get("temperature", 1) != 0:
+        yield from stream()
+        return
+    key = llm_cache_key(model, messages, params)
+    response = cache.get(key, call_site)
+    if response is not None:
+        yield response
+        return
+    pieces = []
+    for piece in stream():
+        pieces.append(piece)
+        yield piece
+    response = "".join(pieces)
+    # An empty stream (e.g. one that yielded no content) is not cached, like a completion without text content.
+    if response:
+        cache.put(key, call_site, response)
+
+
+async def acached_llm_stream(call_site, model, messages, params, stream):
+    """
+    Async counterpart of cached_llm_stream, stream() returning an async iterator.
+    """
+    cache = get_llm_cache()
+    if cache is None or params.get("temperature", 1) != 0:
+        async for piece in stream():
+            yield piece
+        return
+    key = llm_cache_key(model, messages, params)
+    response = cache.get(key, call_site)
+    if response is not None:
+        yield response
+        return
+    pieces = []
+    async for piece in stream():
+        pieces.append(piece)
+        yield piece
+    response = "".join(pieces)
+    # An empty stream (e.g. one that yielded no content) is not cached, like a completion without text content.
+    if response:
+        cache.put(key, call_site, response)
@@ -0,0 +1,72 @@
+import os
+import time
+from multiprocessing import Pool
+
+
+def _timed_parse(task):
+    """
+    Worker entry point: runs a parse function on one item and reports the worker PID and elapsed time.
+    """
+    parse_fn, item = task
+    start = time.perf_counter()
+    result = parse_fn(item)
+    return item, result, os.getpid(), time.perf_counter() - start
+
+
+def record_worker_stats(stats, pid, articles, seconds):
+    """
+    Accumulates per-worker file, article and busy-time counters into a stats dict keyed by worker PID.
+    """
+    worker = stats.setdefault(pid, {"files": 0, "articles": 0, "seconds": 0.0})
+    worker["files"] += 1
+    worker["articles"] += len(articles)
+    worker["seconds"] += seconds
+
+
+def parallel_parse(parse_fn, items, workers=None, chunksize=8, ordered=True, window=None, stats=None):
+    """
+    Runs a picklable parse function over items in a process pool, yielding (item, articles) pairs.
+
+    Items are submitted to the pool in windows of `window` items (all at once by default) with `chunksize` items per
+    task, so a caller that stops early (e.g. after a file limit) does not pay for parsing the rest of the input.
+    With ordered=True results come back in input order; otherwise in completion order.
+    """
+    items = list(items)
+    workers = workers or os.cpu_count()
+    window = window or len(items) or 1
+
+    with Pool(processes=workers) as pool:
+        mapper = pool.imap if ordered else pool.imap_unordered
+        for begin in range(0, len(items), window):
+            tasks = [(parse_fn, item) for item in items[begin:begin + window]]
+            for item, articles, pid, seconds in mapper(_timed_parse, tasks, chunksize=chunksize):
+                if stats is not None:
+                    record_worker_stats(stats, pid, articles, seconds)
+                yield item, articles
+
+
+def summarize_worker_stats(stats):
+    """
+    Converts raw per-worker counters into a list of throughput rows, one per worker.
+    """
+    rows = []
+    for pid, worker in sorted(stats.items()):
+        seconds = worker["seconds"]
+        rows.append({
+            "pid": pid,
+            "files": worker["files"],
+            "articles": worker["articles"],
+            "busy_seconds": round(seconds, 3),
+            "files_per_sec": round(worker["files"] / seconds, 1) if seconds else None,
+            "articles_per_sec": round(worker["articles"] / seconds, 1) if seconds else None,
+        })
+    return rows
+
+
+def print_worker_stats(stats):
+    """
+    Prints per-worker throughput collected by parallel_parse.
+    """
+    for row in summarize_worker_stats(stats):
+        print(f"worker {row['pid']}: {row['files']} files, {row['articles']} articles, "
+              f"{row['busy_seconds']}s busy, {row['articles_per_sec']} articles/sec")
@@ -0,0 +1,224 @@
+import asyncio
+import time
+from app.retrieval import (step_back_and_extract_topics, softly_expand_topics, retrieve_context,
+                           get_embedding_model, get_corpus_vector_index)
+from app.embedding_cache import CachedEmbeddings
+from app.data_loader import load_corpus, load_indexed_corpus
+from app.summarizer import generate_summary_from_documents, stream_summary_from_documents, get_chat_model
+from app.evaluator import evaluate_summary
+from app.llm_cache import get_llm_cache
+from app.kpis import compute_avg_llm_score, compute_kpis
+from app.query_cache import get_query_cache, lookup_query, corpus_version
+from app.tracing import span
+
+
+class StageTimer:
+    """
+    Runs blocking pipeline stages on worker threads and records when each one started and finished, relative to
+    the creation of the timer, together with the stages it waited for. Point events (e.g. the first summary token)
+    can be recorded with mark().
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.stages = {}
+        self.marks = {}
+
+    def mark(self, name):
+        """
+        Records the time of event `name`, unless it was already recorded.
+        """
+        self.marks.setdefault(name, time.perf_counter() - self.origin)
+
+    async def run(self, name, after, fn, *args, **kwargs):
+        """
+        Runs fn(*args, **kwargs) in a thread as stage `name`; `after` lists the stages whose results it needs.
+        """
+        start = time.perf_counter() - self.origin
+        try:
+            return await asyncio.to_thread(fn, *args, **kwargs)
+        finally:
+            self.stages[name] = {"start": start, "end": time.perf_counter() - self.origin, "after": list(after)}
+
+    def critical_path(self):
+        """
+        Walks back from the last stage to finish, following at each step the dependency that finished last.
+        """
+        if not self.stages:
+            return []
+        name = max(self.stages, key=lambda stage: self.stages[stage]["end"])
+        path = [name]
+        while self.stages[name]["after"]:
+            name = max(self.stages[name]["after"], key=lambda stage: self.stages[stage]["end"])
+            path.append(name)
+        return path[::-1]
+
+    def report(self):
+        """
+        Per-stage start/end/duration in milliseconds, wall-clock time, the sum of stage durations (the latency of
+        running them one after another), the time saved by overlapping, the critical path and the time of each
+        mark.
+        """
+        def ms(seconds):
+            return round(seconds * 1000, 1)
+
+        stages = {
+            name: {"start_ms": ms(stage["start"]), "end_ms": ms(stage["end"]),
+                   "duration_ms": ms(stage["end"] - stage["start"])}
+            for name, stage in sorted(self.stages.items(), key=lambda item: item[1]["start"])
+        }
+        wall = max((stage["end"] for stage in self.stages.values()), default=0.0)
+        sequential = sum(stage["end"] - stage["start"] for stage in self.stages.values())
+        path = self.critical_path()
+        return {
+            "stages": stages,
+            "wall_ms": ms(wall),
+            "sequential_ms": ms(sequential),
+            "saved_ms": ms(sequential - wall),
+            "critical_path": path,
+            "critical_path_ms": {name: stages[name]["duration_ms"] for name in path},
+            "marks_ms": {name: ms(seconds) for name, seconds in self.marks.items()},
+        }
+
+
+def warm_up(pmc_limit=None, workers=None, lazy_body=False):
+    """
+    Loads everything shared by the questions of a long-lived process once: the indexed corpus, the prebuilt vector
+    index, the embedding, LLM response and query caches, the corpus version scoping the query cache and the chat
+    model client. Returns the corpus.
+    """
+    corpus = load_indexed_corpus(pmc_limit=pmc_limit, workers=workers, lazy_body=lazy_body)
+    get_corpus_vector_index()
+    get_embedding_model()
+    get_llm_cache()
+    if get_query_cache() is not None:
+        corpus_version()
+    get_chat_model()
+    return corpus
+
+
+def _stream_summary(timer, on_token, user_role, user_question, documents):
+    pieces = []
+    with span("summarizer.stream_summary") as streaming:
+        for piece in stream_summary_from_documents(user_role, user_question, documents):
+            timer.mark("first_token")
+            pieces.append(piece)
+            on_token(piece)
+        streaming.add(pieces=len(pieces))
+    return "".join(pieces)
+
+
+def _load_articles(pmc_limit, workers, lazy_body):
+    """
+    Loads the articles for retrieval, unless the prebuilt vector index resolves the topic filter by itself.
+    """
+    vector_index = get_corpus_vector_index()
+    if pmc_limit is None and vector_index is not None and vector_index.matches_topics():
+        return None
+    return load_corpus(pmc_limit=pmc_limit, workers=workers, lazy_body=lazy_body)
+
+
+def _prefetch_query_embedding(query_text):
+    """
+    Embeds the query into the on-disk cache so that retrieval finds it there; skipped when the cache is disabled.
+    """
+    embedding_model = get_embedding_model()
+    if isinstance(embedding_model, CachedEmbeddings):
+        embedding_model.embed_query(query_text)
+
+
+async def generate_summary_async(user_role, user_question, pmc_limit=None, workers=None, corpus=None,
+                                 lazy_body=False, sources=None, min_year=None, max_year=None, on_token=None,
+                                 on_documents=None):
+    """
+    Same pipeline and results as main.generate_summary, with independent stages overlapped:
+    - the corpus and the prebuilt vector index load while the step-back and topic-expansion LLM calls are in
+      flight. Without a preloaded corpus, the articles are loaded with load_corpus and filtered by brute force: the
+      topic indexes only pay off over many questions, so they are built by warm_up and not for a single one. With
+      a prebuilt vector index no articles are loaded (see retrieve_documents);
+    - the query is embedded (into the embedding cache) while topics are being expanded;
+    - the evaluation call and the (local) KPI computation run concurrently once the summary is ready.
+
+    The question is first looked up in the query cache (stage "query_cache"); an answer hit skips every other
+    stage (the cached summary is passed to on_token in one piece), a context hit skips the step-back, topic
+    expansion and retrieval stages. Either is marked under kpis["query_cache"].
+
+    With on_token, the summary is streamed and each piece is passed to on_token(piece) as it arrives (from a worker
+    thread); the time to first token is then reported in timings["marks_ms"]["first_token"]. With on_documents, the
+    documents the summary is generated from are passed to on_documents(documents) (e.g. to archive them for
+    evaluate_batch.py).
+
+    Returns (summary, evaluation_report, kpis, timings), timings being StageTimer.report().
+    """
+    # Tasks and worker threads copy the context when they start, so the spans of every stage nest under this one.
+    with span("generate_summary_async"):
+        return await _generate_summary_async(user_role, user_question, pmc_limit, workers, corpus, lazy_body,
+                                             sources, min_year, max_year, on_token, on_documents)
+
+
+async def _generate_summary_async(user_role, user_question, pmc_limit, workers, corpus, lazy_body, sources,
+                                  min_year, max_year, on_token, on_documents):
+    timer = StageTimer()
+
+    cached = await timer.run("query_cache", [], lookup_query, user_role, user_question, sources=sources,
+                             min_year=min_year, max_year=max_year, pmc_limit=pmc_limit)
+    if cached.kind == "answer":
+        if on_documents is not None:
+            on_documents(cached.documents())
+        if on_token is not None:
+            timer.mark("first_token")
+            on_token(cached.result["summary"])
+        return cached.result["summary"], cached.result["evaluation_report"], cached.kpis(), timer.report()
+
+    if cached.kind == "context":
+        step_back_summary, expand_topics = cached.result["step_back_summary"], cached.result["topics"]
+        query_text = f"""Question: {user_question}
+    General Context: {step_back_summary}""".strip()
+        similar_docs = cached.documents()
+        summary_after = ["query_cache"]
+    else:
+        articles, corpus_task = None, None
+        if corpus is None:
+            corpus_task = asyncio.create_task(timer.run(
+                "load_corpus", ["query_cache"], _load_articles, pmc_limit, workers, lazy_body
+            ))
+        index_task = asyncio.create_task(timer.run("load_vector_index", ["query_cache"], get_corpus_vector_index))
+
+        step_back_summary, topics = await timer.run("step_back", ["query_cache"], step_back_and_extract_topics,
+                                                    user_question)
+        query_text = f"""Question: {user_question}
+    General Context: {step_back_summary}""".strip()
+
+        prefetch_task = asyncio.create_task(timer.run("prefetch_query_embedding", ["step_back"],
+                                                      _prefetch_query_embedding, query_text))
+        expand_topics = await timer.run("expand_topics", ["step_back"], softly_expand_topics, topics)
+        await asyncio.gather(index_task, prefetch_task)
+        retrieval_after = ["expand_topics", "load_vector_index", "prefetch_query_embedding"]
+        if corpus_task is not None:
+            articles = await corpus_task
+            retrieval_after.append("load_corpus")
+        similar_docs = await timer.run(
+            "retrieve", retrieval_after, retrieve_context, query_text, expand_topics, k=7, sources=sources,
+            min_year=min_year, max_year=max_year, corpus=corpus, articles=articles
+        )
+        summary_after = ["retrieve"]
+    if on_documents is not None:
+        on_documents(similar_docs)
+
+    if on_token is None:
+        summary = await timer.run("summarize", summary_after, generate_summary_from_documents, user_role,
+                                  user_question, similar_docs)
+    else:
+        summary = await timer.run("summarize", summary_after, _stream_summary, timer, on_token, user_role,
+                                  user_question, similar_docs)
+
+    evaluation_report, kpis = await asyncio.gather(
+        timer.run("evaluate", ["summarize"], evaluate_summary, user_role, user_question, summary),
+        timer.run("kpis", ["summarize"], compute_kpis, summary, query_text, documents=similar_docs),
+    )
+    kpis["avg_llm_score"] = compute_avg_llm_score(evaluation_report)
+    await asyncio.to_thread(cached.store, step_back_summary, expand_topics, similar_docs, summary, evaluation_report,
+                            kpis)
+    if cached.kind is not None:
+        kpis["query_cache"] = cached.info()
+    return summary, evaluation_report, kpis, timer.report()
@@ -0,0 +1,366 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from pathlib import Path
+import numpy as np
+from langchain.schema import Document
+from config import (CORPUS_DB_PATH, QUERY_CACHE_PATH, QUERY_CACHE_THRESHOLD, QUERY_CACHE_CONTEXT_THRESHOLD,
+                    QUERY_CACHE_TTL_SECONDS, QUERY_CACHE_MAX_ENTRIES)
+from app.retrieval import get_embedding_model
+from app.tracing import traced, record
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS queries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    scope TEXT NOT NULL,
+    question TEXT NOT NULL,
+    normalized TEXT NOT NULL,
+    vector BLOB,
+    result TEXT NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_queries_scope ON queries (scope, id);
+CREATE INDEX IF NOT EXISTS idx_queries_normalized ON queries (scope, normalized);
+CREATE INDEX IF NOT EXISTS idx_queries_last_used ON queries (last_used);
+CREATE INDEX IF NOT EXISTS idx_queries_created ON queries (created);
+"""
+# Upper edges of the best-match similarity histogram reported by stats().
+SIMILARITY_BINS = [0.5, 0.7, 0.8, 0.85, 0.9, 0.925, 0.95, 0.975, 1.0]
+# Number of recent lookups whose best-match similarity is kept for the distribution.
+RECENT_LOOKUPS = 10_000
+WORD_RE = re.compile(r"\w+")
+
+_query_cache = None
+_corpus_versions = {}
+
+
+def normalize_question(question):
+    """
+    Key of exact-duplicate matching: the question's words, lowercased, without punctuation or extra whitespace.
+    """
+    return " ".join(WORD_RE.findall(question.lower()))
+
+
+def query_scope(role, sources=None, min_year=None, max_year=None, pmc_limit=None, corpus_version=0):
+    """
+    Partition of the cache a question is looked up in: a question only matches questions asked with the same role
+    and retrieval restrictions against the same version of the corpus.
+    """
+    return json.dumps({"role": role, "sources": sorted(sources) if sources else None, "min_year": min_year,
+                       "max_year": max_year, "pmc_limit": pmc_limit, "corpus_version": corpus_version},
+                      sort_keys=True)
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticQueryCache:
+    """
+    Cache of answered questions in SQLite. A question that normalizes (normalize_question) to a cached one gets its
+    summary, evaluation and KPIs back. Matching by embedding similarity is opt-in, because questions that differ
+    only in the drug, dose or patient group embed very close to each other: a match with cosine similarity >=
+    answer_threshold (None: exact duplicates only) also returns the cached answer, and a match >= context_threshold
+    (None: disabled) reuses the cached topics and retrieved documents, so that only the summary, evaluation and
+    KPIs are computed for the new wording. Both thresholds should only be set after calibrating them on the
+    embedding model in use (see benchmarks/bench_query_cache.py --pairs).
+
+    The question vectors of each scope (see query_scope) are kept in memory and searched exhaustively; entries
+    written by other processes are picked up on the next lookup. Entries older than ttl_seconds are ignored and
+    purged, and beyond max_entries the least recently used are evicted. Hits and misses are counted per role, and
+    the best-match similarity of recent lookups is kept to tune the thresholds on. Safe to share between threads
+    (calls are serialized).
+    """
+
+    def __init__(self, db_path, answer_threshold=None, context_threshold=None, ttl_seconds=None, max_entries=10_000):
+        self.db_path = db_path
+        self.answer_threshold = answer_threshold
+        self.context_threshold = context_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.scopes = {}
+        self.counters = {}
+        self.similarities = deque(maxlen=RECENT_LOOKUPS)
+        self.evictions = 0
+        self.lock = threading.RLock()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit mode: writes take an explicit IMMEDIATE transaction so concurrent processes evict consistently.
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(queries)")]
+        if columns and "normalized" not in columns:
+            # Written by an earlier version without exact-duplicate keys; a cache, so it is simply dropped.
+            self.conn.execute("DROP TABLE queries")
+        self.conn.executescript(SCHEMA)
+
+    @property
+    def semantic(self):
+        """
+        Whether questions are also matched by embedding similarity (and therefore need to be embedded).
+        """
+        return bool(self.answer_threshold or self.context_threshold)
+
+    def _oldest_valid(self, now):
+        return now - self.ttl_seconds if self.ttl_seconds else 0.0
+
+    def _scope_vectors(self, scope):
+        """
+        Returns (entry ids, unit vectors) of a scope, after loading the entries added since the last call.
+        """
+        ids, vectors = self.scopes.get(scope, (np.empty(0, dtype=np.int64), None))
+        last_id = int(ids[-1]) if len(ids) else 0
+        rows = self.conn.execute(
+            "SELECT id, vector FROM queries WHERE scope = ? AND id > ? AND vector IS NOT NULL ORDER BY id",
+            (scope, last_id)
+        ).fetchall()
+        if rows:
+            new = np.vstack([np.frombuffer(vector, dtype=np.float32) for _, vector in rows])
+            ids = np.concatenate([ids, np.array([entry_id for entry_id, _ in rows], dtype=np.int64)])
+            vectors = new if vectors is None else np.vstack([vectors, new])
+            self.scopes[scope] = (ids, vectors)
+        return ids, vectors
+
+    def _forget(self, entries):
+        """
+        Drops (entry id, scope) pairs that were evicted or expired from the in-memory vectors.
+        """
+        by_scope = {}
+        for entry_id, scope in entries:
+            by_scope.setdefault(scope, []).append(entry_id)
+        for scope, entry_ids in by_scope.items():
+            if scope in self.scopes:
+                ids, vectors = self.scopes[scope]
+                keep = ~np.isin(ids, entry_ids)
+                self.scopes[scope] = (ids[keep], vectors[keep])
+
+    def _count(self, role, kind, similarity):
+        counter = {"answer": "answer_hits", "context": "context_hits", None: "misses"}[kind]
+        counters = self.counters.setdefault(role, {"answer_hits": 0, "context_hits": 0, "misses": 0})
+        counters[counter] += 1
+        if similarity is not None:
+            self.similarities.append(similarity)
+        record(**{f"query_cache_{counter}": 1})
+
+    def lookup(self, role, scope, question, vector=None):
+        """
+        Finds a live cached answer to the question in the scope: first an exact duplicate, then (with a vector and
+        semantic matching enabled) the most similar cached question. Returns (kind, similarity, result): kind is
+        "answer", "context" or None for a miss, similarity the similarity of the match (1.0 for a duplicate) or the
+        best one found, and result the cached entry.
+        """
+        with self.lock:
+            now = time.time()
+            row = self.conn.execute(
+                "SELECT id, result FROM queries WHERE scope = ? AND normalized = ? AND created >= ? "
+                "ORDER BY id DESC LIMIT 1",
+                (scope, normalize_question(question), self._oldest_valid(now))
+            ).fetchone()
+            if row is not None:
+                self.conn.execute("UPDATE queries SET last_used = ? WHERE id = ?", (now, row[0]))
+                self._count(role, "answer", None)
+                return "answer", 1.0, json.loads(row[1])
+            if vector is None or not self.semantic:
+                self._count(role, None, None)
+                return None, None, None
+
+            vector = _unit(vector)
+            ids, vectors = self._scope_vectors(scope)
+            if not len(ids):
+                self._count(role, None, None)
+                return None, None, None
+
+            similarities = vectors @ vector
+            threshold = min(t for t in (self.answer_threshold, self.context_threshold) if t)
+            for i in np.argsort(-similarities, kind="stable"):
+                similarity = float(similarities[i])
+                if similarity < threshold:
+                    break
+                entry_id = int(ids[i])
+                row = self.conn.execute("SELECT result FROM queries WHERE id = ? AND created >= ?",
+                                        (entry_id, self._oldest_valid(now))).fetchone()
+                if row is None:
+                    # Expired, or evicted by another process.
+                    self._forget([(entry_id, scope)])
+                    similarities[i] = -1.0
+                    continue
+                self.conn.execute("UPDATE queries SET last_used = ? WHERE id = ?", (now, entry_id))
+                kind = "answer" if self.answer_threshold and similarity >= self.answer_threshold else "context"
+                self._count(role, kind, similarity)
+                return kind, similarity, json.loads(row[0])
+
+            best = float(similarities.max())
+            self._count(role, None, best)
+            return None, best, None
+
+    def put(self, scope, question, vector, result):
+        """
+        Caches the result (a JSON-serializable dict) of a question and applies the TTL and size limits. The vector
+        may be None when semantic matching is disabled.
+        """
+        with self.lock:
+            now = time.time()
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute(
+                    "INSERT INTO queries (scope, question, normalized, vector, result, created, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (scope, question, normalize_question(question),
+                     _unit(vector).tobytes() if vector is not None else None,
+                     json.dumps(result, ensure_ascii=False), now, now)
+                )
+                self._evict(now)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def _evict(self, now):
+        victims = self.conn.execute("SELECT id, scope FROM queries WHERE created < ?",
+                                    (self._oldest_valid(now),)).fetchall()
+        count = self.conn.execute("SELECT COUNT(*) FROM queries").fetchone()[0] - len(victims)
+        if count > self.max_entries:
+            victims += self.conn.execute(
+                "SELECT id, scope FROM queries WHERE created >= ? ORDER BY last_used LIMIT ?",
+                (self._oldest_valid(now), count - self.max_entries)
+            ).fetchall()
+        self.conn.executemany("DELETE FROM queries WHERE id = ?", [(entry_id,) for entry_id, _ in victims])
+        self._forget(victims)
+        self.evictions += len(victims)
+
+    def stats(self):
+        """
+        Per-role hit counters and hit rates, the distribution of best-match similarities over recent lookups,
+        evictions and the number of cached questions.
+        """
+        roles = {}
+        for role, counters in sorted(self.counters.items()):
+            total = sum(counters.values())
+            hits = counters["answer_hits"] + counters["context_hits"]
+            roles[role] = dict(counters, hit_rate=round(hits / total, 4) if total else None)
+
+        similarities = np.minimum(np.asarray(self.similarities, dtype=np.float32), SIMILARITY_BINS[-1])
+        bins = np.bincount(np.searchsorted(SIMILARITY_BINS, similarities), minlength=len(SIMILARITY_BINS))
+        distribution = {"count": len(similarities)}
+        if len(similarities):
+            distribution.update({f"p{q}": round(float(np.percentile(similarities, q)), 4) for q in (10, 50, 90)})
+        distribution["histogram"] = {f"<={edge}": int(count) for edge, count in zip(SIMILARITY_BINS, bins)}
+        return {
+            "roles": roles,
+            "similarity": distribution,
+            "thresholds": {"answer": self.answer_threshold, "context": self.context_threshold},
+            "evictions": self.evictions,
+            "size": self.conn.execute("SELECT COUNT(*) FROM queries").fetchone()[0],
+        }
+
+
+def get_query_cache():
+    """
+    Returns the process-wide semantic query cache, or None when QUERY_CACHE_PATH is empty.
+    """
+    global _query_cache
+    if _query_cache is None and QUERY_CACHE_PATH:
+        _query_cache = SemanticQueryCache(QUERY_CACHE_PATH, answer_threshold=QUERY_CACHE_THRESHOLD or None,
+                                          context_threshold=QUERY_CACHE_CONTEXT_THRESHOLD or None,
+                                          ttl_seconds=QUERY_CACHE_TTL_SECONDS or None,
+                                          max_entries=QUERY_CACHE_MAX_ENTRIES)
+    return _query_cache
+
+
+def corpus_version(store_path=CORPUS_DB_PATH):
+    """
+    Version of the corpus store (0 without one); part of the cache scope, so that answers are recomputed once the
+    corpus changes. Read once per process, with a read-only connection: a process answers from the corpus it
+    loaded at start (warm_up reads the version then).
+    """
+    if store_path not in _corpus_versions:
+        row = None
+        if store_path and os.path.exists(store_path):
+            conn = sqlite3.connect(f"{Path(store_path).resolve().as_uri()}?mode=ro", uri=True)
+            try:
+                row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            except sqlite3.OperationalError:
+                # A store created before versioning.
+                pass
+            finally:
+                conn.close()
+        _corpus_versions[store_path] = int(row[0]) if row else 0
+    return _corpus_versions[store_path]
+
+
+class QueryLookup:
+    """
+    Outcome of looking a question up: kind is "answer", "context" or None (a miss, or the cache is disabled) and
+    result the cached entry. store() caches what was computed for the question.
+    """
+
+    def __init__(self, cache=None, scope=None, question=None, vector=None, kind=None, similarity=None, result=None):
+        self.cache = cache
+        self.scope = scope
+        self.question = question
+        self.vector = vector
+        self.kind = kind
+        self.similarity = similarity
+        self.result = result
+
+    def documents(self):
+        """
+        The retrieved (packed) documents of the cached question.
+        """
+        return [Document(page_content=doc["page_content"], metadata=doc["metadata"])
+                for doc in self.result["documents"]]
+
+    def info(self):
+        """
+        How the question was served, added to the KPIs of cache hits so that users can tell: the kind of match,
+        its similarity and the cached question it matched.
+        """
+        return {"match": self.kind,
+                "similarity": round(self.similarity, 4) if self.similarity is not None else None,
+                "cached_question": self.result["question"] if self.result else None}
+
+    def kpis(self):
+        """
+        The cached KPIs of an answer hit, marked as served from the cache.
+        """
+        return dict(self.result["kpis"], query_cache=self.info())
+
+    def store(self, step_back_summary, topics, documents, summary, evaluation_report, kpis):
+        """
+        Caches the answer to the question, unless it was itself served from the cache. After a context hit the new
+        wording gets its own entry.
+        """
+        if self.cache is None or self.kind == "answer":
+            return
+        self.cache.put(self.scope, self.question, self.vector, {
+            "question": self.question,
+            "step_back_summary": step_back_summary,
+            "topics": topics,
+            "documents": [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in documents],
+            "summary": summary,
+            "evaluation_report": evaluation_report,
+            "kpis": kpis,
+        })
+
+
+@traced("query_cache.lookup")
+def lookup_query(role, question, sources=None, min_year=None, max_year=None, pmc_limit=None, embedding_model=None):
+    """
+    Looks the question up in the query cache, embedding it (through the embedding cache) only when semantic
+    matching is enabled.
+    """
+    cache = get_query_cache()
+    if cache is None:
+        return QueryLookup()
+    vector = (embedding_model or get_embedding_model()).embed_query(question) if cache.semantic else None
+    scope = query_scope(role, sources, min_year, max_year, pmc_limit, corpus_version())
+    kind, similarity, result = cache.lookup(role, scope, question, vector)
+    return QueryLookup(cache, scope, question, vector, kind, similarity, result)
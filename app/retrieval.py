@@ -1,7 +1,23 @@
 from langchain_community.vectorstores import FAISS
-from langchain_openai import OpenAIEmbeddings
-from config import OPENAI_API_KEY, client
-
+import threading
+from config import (OPENAI_API_KEY, EMBEDDING_MODEL, EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_MAX_ROWS,
+                    EMBEDDING_MAX_IN_FLIGHT, VECTOR_INDEX_DIR, HYBRID_CANDIDATES, CONTEXT_TOKEN_BUDGET,
+                    CONTEXT_CANDIDATES, CONTEXT_MMR_LAMBDA)
+from app.bm25 import hybrid_rank, vector_rank
+from app.llm_cache import chat_completion
+from app.context_packer import pack_documents
+from app.tracing import traced, record, span
+from app.embedding_batcher import BatchedOpenAIEmbeddings
+from app.embedding_cache import EmbeddingCache, CachedEmbeddings
+from app.vector_index import (load_corpus_vector_index, filtered_article_keys, index_exists, index_version,
+                              SOURCE_CODES)
+from app.data_loader import load_filtered_articles, prepare_chunk_store
+
+_embedding_caches = {}
+_corpus_vector_index = None
+_corpus_vector_index_lock = threading.Lock()
+
+@traced("retrieval.step_back_and_extract_topics")
 def step_back_and_extract_topics(question, model="gpt-3.5-turbo"):
     """
     Extracts a broader biomedical context and related topics from a user question to support document retrieval.
@@ -41,14 +57,13 @@ def step_back_and_extract_topics(question, model="gpt-3.5-turbo"):
     Topics:
     """
 
-    response = client.chat.completions.create(
+    output = chat_completion(
+        "step_back",
         model=model,
         messages=[{"role": "user", "content": prompt}],
         temperature=0,
     )
 
-    output = response.choices[0].message.content
-
     lines = output.strip().splitlines()
     summary_line = next((line for line in lines if line.startswith("Step-Back Summary:")), "")
     topics_line = next((line for line in lines if line.startswith("Topics:")), "")
@@ -59,9 +74,11 @@ def step_back_and_extract_topics(question, model="gpt-3.5-turbo"):
     except:
         topics = []
 
+    record(topics=len(topics))
     return summary, topics
 
 
+@traced("retrieval.softly_expand_topics")
 def softly_expand_topics(topics, model="gpt-3.5-turbo", max_terms=15):
     """
     Expands a list of biomedical topics by adding broader, more general medical terms while avoiding overly generic ones.
@@ -89,12 +106,12 @@ def softly_expand_topics(topics, model="gpt-3.5-turbo", max_terms=15):
     Respond only with a valid Python list of strings. No extra text.
     """
 
-    response = client.chat.completions.create(
+    output = chat_completion(
+        "expand_topics",
         model=model,
         messages=[{"role": "user", "content": prompt}],
         temperature=0,
-    )
-    output = response.choices[0].message.content.strip()
+    ).strip()
 
     try:
         expanded = eval(output)
@@ -111,13 +128,107 @@ def softly_expand_topics(topics, model="gpt-3.5-turbo", max_terms=15):
 
     combined = list(set(topics) | set(expanded_clean))
 
+    record(topics=len(combined[:max_terms]))
     return combined[:max_terms]
 
 
-def build_faiss_vectorstore(documents):
+def get_embedding_model(use_cache=True, model=EMBEDDING_MODEL):
+    """
+    Returns the OpenAI embedding model (the retrieval model unless another is named), wrapped with the shared
+    on-disk embedding cache unless disabled. Cache misses are packed into token-limited requests and sent
+    concurrently.
+    """
+    embedding_model = BatchedOpenAIEmbeddings(model=model, max_in_flight=EMBEDDING_MAX_IN_FLIGHT)
+    if not use_cache or not EMBEDDING_CACHE_DIR:
+        return embedding_model
+
+    if model not in _embedding_caches:
+        _embedding_caches[model] = EmbeddingCache(EMBEDDING_CACHE_DIR, model, max_rows=EMBEDDING_CACHE_MAX_ROWS)
+    return CachedEmbeddings(embedding_model, model, _embedding_caches[model])
+
+
+def build_faiss_vectorstore(documents, embedding_model=None):
     """
     Builds a FAISS vector store from input documents using OpenAI embeddings for efficient similarity search.
+    Embeddings are served from the on-disk cache where possible; only unseen chunks are sent to the API.
     """
-    embedding_model = OpenAIEmbeddings()
+    embedding_model = embedding_model or get_embedding_model()
     vectorstore = FAISS.from_documents(documents, embedding_model)
     return vectorstore
+
+
+def get_corpus_vector_index(index_dir=VECTOR_INDEX_DIR):
+    """
+    Returns the prebuilt corpus-wide vector index, or None if it has not been built. It is loaded once per process
+    and reloaded when ingest.py publishes a new version (compaction, rebuild) or applies updates to it.
+    """
+    global _corpus_vector_index
+    if _corpus_vector_index is None or _corpus_vector_index.version != index_version(index_dir):
+        with _corpus_vector_index_lock:
+            version = index_version(index_dir)
+            if _corpus_vector_index is not None and _corpus_vector_index.version == version:
+                return _corpus_vector_index
+            if index_exists(index_dir):
+                _corpus_vector_index = load_corpus_vector_index(index_dir)
+    return _corpus_vector_index
+
+
+@traced("retrieval.retrieve_documents")
+def retrieve_documents(query_text, topics, k=7, sources=None, min_year=None, max_year=None,
+                       candidates=HYBRID_CANDIDATES, **load_kwargs):
+    """
+    Returns the k documents most similar to the query among articles matching the topics.
+
+    With a prebuilt corpus index (see ingest.py --build_index) the topic, source and year restrictions become ID
+    selectors on that index. The topic filter then goes through the topic indexes of a preloaded corpus when one is
+    passed, and is otherwise resolved from the index's own tables (see CorpusVectorIndex.topic_article_keys), so
+    no articles are loaded per question. A pmc_limit (to keep its PMC subset) or an index saved without article
+    terms still loads the corpus.
+    Without the index the matching articles are chunked into a compact ChunkStore and searched directly, and
+    Documents are only created for the k results.
+    With candidates > 0 retrieval is hybrid: BM25 and vector rankings are fused with RRF, and on the per-query path
+    only the top `candidates` BM25 hits are embedded. candidates=0 gives pure vector retrieval.
+    load_kwargs are passed to load_filtered_articles (pmc_limit, workers, corpus, lazy_body, ...).
+    """
+    if sources is not None:
+        unknown = set(sources) - set(SOURCE_CODES)
+        if unknown:
+            raise ValueError(f"Unknown sources: {sorted(unknown)} (expected {sorted(SOURCE_CODES)})")
+
+    vector_index = get_corpus_vector_index()
+    if vector_index is not None:
+        if vector_index.matches_topics() and all(load_kwargs.get(name) is None
+                                                 for name in ("corpus", "articles", "pmc_limit")):
+            article_keys = vector_index.topic_article_keys(topics,
+                                                           include_body=load_kwargs.get("include_body", True))
+        else:
+            article_keys = filtered_article_keys(*load_filtered_articles(topics, **load_kwargs))
+        return vector_index.similarity_search(
+            query_text, get_embedding_model(), k=k, article_keys=article_keys, sources=sources,
+            min_year=min_year, max_year=max_year, candidates=candidates
+        )
+
+    filtered_articles_pubmed, filtered_articles_pmc = load_filtered_articles(topics, **load_kwargs)
+    chunks = prepare_chunk_store(filtered_articles_pubmed, filtered_articles_pmc)
+    ids = chunks.select(sources=sources, min_year=min_year, max_year=max_year)
+    with span("retrieval.rank", hybrid=bool(candidates)) as ranking:
+        ranking.add(chunks=len(ids))
+        if candidates:
+            return chunks.documents(hybrid_rank(query_text, chunks.texts(), get_embedding_model(), k=k,
+                                                candidates=candidates, bm25=chunks.bm25(), ids=ids))
+        ranked = vector_rank(query_text, chunks.texts(ids), get_embedding_model(), k=k)
+    return chunks.documents([ids[i] for i in ranked])
+
+
+@traced("retrieval.retrieve_context")
+def retrieve_context(query_text, topics, k=7, budget_tokens=CONTEXT_TOKEN_BUDGET,
+                     context_candidates=CONTEXT_CANDIDATES, mmr_lambda=CONTEXT_MMR_LAMBDA, **retrieve_kwargs):
+    """
+    Returns the documents for the summary prompt. With a token budget, the best context_candidates documents are
+    retrieved and packed into budget_tokens by MMR, adjacent PMC chunks merged; with budget_tokens=0, the k best
+    documents as before. retrieve_kwargs are passed to retrieve_documents.
+    """
+    if not budget_tokens:
+        return retrieve_documents(query_text, topics, k=k, **retrieve_kwargs)
+    documents = retrieve_documents(query_text, topics, k=context_candidates, **retrieve_kwargs)
+    return pack_documents(query_text, documents, get_embedding_model(), budget_tokens, mmr_lambda=mmr_lambda)
@@ -2,6 +2,28 @@ from langchain_core.messages import SystemMessage, HumanMessage
 from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
 from config import OPENAI_API_KEY
+from app.llm_cache import cached_llm_call, cached_llm_stream, acached_llm_stream, message_dicts, record_usage
+from app.tracing import traced
+
+_chat_model = None
+
+
+def get_chat_model():
+    """
+    Returns the summarization chat model, created once per process so its HTTP connections are reused.
+    """
+    global _chat_model
+    if _chat_model is None:
+        # stream_usage: streamed responses end with a chunk carrying the token usage, as non-streamed ones do.
+        _chat_model = ChatOpenAI(model="gpt-4", temperature=0, stream_usage=True)
+    return _chat_model
+
+
+def _record_message_usage(message):
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        record_usage(usage.get("input_tokens"), usage.get("output_tokens"))
+
 
 def get_system_prompt_by_user_role(user_role: str) -> str:
     """
@@ -40,24 +62,35 @@ def get_system_prompt_by_user_role(user_role: str) -> str:
             "Make sure to cite articles and stay clear and concise."
         )
 
-def generate_chat_prompt(user_role, user_question, retrieved_docs):
+def citation_label(doc, i):
     """
-    Constructs a list of chat messages (system + user) combining the research question and relevant document content for summarization.
+    The [PMID...] / [PMC...] label a document is cited with, Doc{i} when it has no identifier.
+    """
+    pmid = doc.metadata.get("pmid")
+    pmcid = doc.metadata.get("pmcid")
+
+    if pmid and not pmid.startswith("PMID"):
+        return f"PMID{pmid}"
+    if pmcid and not pmcid.startswith("PMC"):
+        return f"PMC{pmcid}"
+    return pmid or pmcid or f"Doc{i}"
+
+
+def format_context(retrieved_docs):
     """
-    context_snippets = ""
-    for i, doc in enumerate(retrieved_docs, 1):
-        pmid = doc.metadata.get("pmid")
-        pmcid = doc.metadata.get("pmcid")
+    The "Scientific Articles" section of the prompt: each document's citation label, title and text.
+    """
+    return "".join(
+        f"[{citation_label(doc, i)}] {doc.metadata.get('title', 'Unknown Title')}\n{doc.page_content.strip()}\n\n"
+        for i, doc in enumerate(retrieved_docs, 1)
+    )
 
-        if pmid and not pmid.startswith("PMID"):
-            source = f"PMID{pmid}"
-        elif pmcid and not pmcid.startswith("PMC"):
-            source = f"PMC{pmcid}"
-        else:
-            source = pmid or pmcid or f"Doc{i}"
 
-        title = doc.metadata.get("title", "Unknown Title")
-        context_snippets += f"[{source}] {title}\n{doc.page_content.strip()}\n\n"
+def generate_chat_prompt(user_role, user_question, retrieved_docs):
+    """
+    Constructs a list of chat messages (system + user) combining the research question and relevant document content for summarization.
+    """
+    context_snippets = format_context(retrieved_docs)
 
     system_message = SystemMessage(
         content=get_system_prompt_by_user_role(user_role)
@@ -79,15 +112,51 @@ def generate_chat_prompt(user_role, user_question, retrieved_docs):
     return [system_message, human_message]
 
 
+@traced("summarizer.generate_summary")
 def generate_summary_from_documents(user_role, user_question, retrieved_docs):
     """
     Sends the formatted prompt and retrieved documents to the LLM to generate a concise, role-specific summary.
     """
     chat_messages = generate_chat_prompt(user_role, user_question, retrieved_docs)
-    llm = ChatOpenAI(model="gpt-4", temperature=0)
-    response_chat = llm.invoke(chat_messages)
-    return response_chat.content
+    llm = get_chat_model()
+
+    def compute():
+        message = llm.invoke(chat_messages)
+        _record_message_usage(message)
+        return message.content
+
+    return cached_llm_call("summarize", "gpt-4", message_dicts(chat_messages), {"temperature": 0}, compute)
+
+
+def stream_summary_from_documents(user_role, user_question, retrieved_docs):
+    """
+    Same summary as generate_summary_from_documents, yielded piece by piece as the LLM generates it.
+    """
+    chat_messages = generate_chat_prompt(user_role, user_question, retrieved_docs)
+    llm = get_chat_model()
+
+    def stream():
+        for chunk in llm.stream(chat_messages):
+            _record_message_usage(chunk)
+            if chunk.content:
+                yield chunk.content
 
+    yield from cached_llm_stream("summarize", "gpt-4", message_dicts(chat_messages), {"temperature": 0}, stream)
 
 
+async def astream_summary_from_documents(user_role, user_question, retrieved_docs):
+    """
+    Async iterator over the pieces of the summary, as stream_summary_from_documents.
+    """
+    chat_messages = generate_chat_prompt(user_role, user_question, retrieved_docs)
+    llm = get_chat_model()
+
+    async def stream():
+        async for chunk in llm.astream(chat_messages):
+            _record_message_usage(chunk)
+            if chunk.content:
+                yield chunk.content
 
+    async for piece in acached_llm_stream("summarize", "gpt-4", message_dicts(chat_messages), {"temperature": 0},
+                                          stream):
+        yield piece
@@ -0,0 +1,259 @@
+import re
+from array import array
+from bisect import bisect_right
+import numpy as np
+
+TOKEN_RE = re.compile(r"\w+")
+SINGLE_TOKEN_RE = re.compile(r"\w+\Z")
+# Separates fields that are matched independently (e.g. individual MeSH terms); topics never contain it.
+FIELD_SEP = "\x1f"
+
+
+def pubmed_topic_text(article):
+    """
+    Returns (text, meta_length): the normalized text filter_pubmed_articles_by_topics matches, title and abstract
+    followed by the MeSH terms as separate fields.
+    """
+    text = ((article["title"] or "") + " " + (article["abstract"] or "")).lower()
+    text = FIELD_SEP.join([text] + [term.lower() for term in article["mesh_terms"] or []])
+    return text, len(text)
+
+
+def pmc_topic_text(article, body=None):
+    """
+    Returns (text, meta_length): the normalized text filter_pmc_articles_by_topics matches, title, abstract and
+    keywords followed by the body (the article's own, unless a lazily parsed article's body is passed). Only
+    text[:meta_length] is matched with include_body=False.
+    """
+    meta = " ".join([
+        article.get("title", "") or "",
+        article.get("abstract", "") or "",
+        " ".join(article.get("keywords", []) or [])
+    ]).lower()
+    body = body if body is not None else article.get("body", "") or ""
+    return meta + " " + body.lower(), len(meta)
+
+
+class TopicIndex:
+    """
+    Topic filter over a fixed set of articles whose text is normalized (lower-cased) once at build time.
+
+    Matching keeps the substring semantics of filter_pubmed_articles_by_topics and filter_pmc_articles_by_topics:
+    - a single-word topic matches every article with a token containing it, resolved from an inverted index over
+      the token vocabulary without touching article text;
+    - phrase topics are narrowed to articles that have a token containing each of the phrase's words, and the
+      candidates are then verified with a single scan for all phrases at once.
+    """
+
+    def __init__(self, texts, meta_lengths, body_refs=None, body_loader=None, text_loader=None):
+        self.texts = texts if text_loader is None else None
+        # Lazily parsed articles keep only their metadata text here; bodies are re-read through body_loader.
+        self.body_refs = body_refs
+        self.body_loader = body_loader
+        # Without texts in memory (see from_texts and load), phrase candidates are verified with the texts
+        # text_loader(doc_ids) yields as (doc_id, text) pairs.
+        self.text_loader = text_loader
+        self._index_documents(zip(texts, meta_lengths))
+
+    def _index_documents(self, docs):
+        """
+        Builds the postings and vocabulary from (text, meta_length) pairs, reading each pair once.
+        """
+        self.vocab = {}
+        body_refs = self.body_refs
+        # Typed arrays keep the (token, doc) pairs compact; a million abstracts produce hundreds of millions of them.
+        token_ids = (array("i"), array("i"))
+        doc_ids = (array("i"), array("i"))
+        lengths = array("q")
+        for doc_id, (text, meta_length) in enumerate(docs):
+            lengths.append(meta_length)
+            regions = (text[:meta_length], text[meta_length:])
+            if body_refs is not None and body_refs[doc_id] is not None:
+                regions = (regions[0], regions[1] + self._load_body(doc_id))
+            for region, region_tokens, region_docs in zip(regions, token_ids, doc_ids):
+                if not region:
+                    continue
+                ids = [self.vocab.setdefault(token, len(self.vocab)) for token in set(TOKEN_RE.findall(region))]
+                region_tokens.extend(ids)
+                region_docs.extend(array("i", [doc_id]) * len(ids))
+
+        self.meta_lengths = np.frombuffer(lengths, dtype=np.int64) if len(lengths) else np.zeros(0, dtype=np.int64)
+        self.meta_postings = self._build_postings(token_ids[0], doc_ids[0])
+        self.body_postings = self._build_postings(token_ids[1], doc_ids[1])
+        self._set_vocab(list(self.vocab))
+
+    def _set_vocab(self, tokens):
+        self._vocab_blob = "\n".join(tokens)
+        self._vocab_starts = []
+        position = 0
+        for token in tokens:
+            self._vocab_starts.append(position)
+            position += len(token) + 1
+
+    def _load_body(self, doc_id):
+        return self.body_loader(self.body_refs[doc_id]).lower()
+
+    def _build_postings(self, token_ids, doc_ids):
+        """
+        Builds CSR-style postings (indptr, doc_ids) sorted by token id.
+        """
+        token_ids = np.frombuffer(token_ids, dtype=np.int32) if len(token_ids) else np.zeros(0, dtype=np.int32)
+        doc_ids = np.frombuffer(doc_ids, dtype=np.int32) if len(doc_ids) else np.zeros(0, dtype=np.int32)
+        order = np.argsort(token_ids, kind="stable")
+        counts = np.bincount(token_ids, minlength=len(self.vocab))
+        indptr = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        return indptr, doc_ids[order]
+
+    @classmethod
+    def from_pubmed_articles(cls, articles):
+        """
+        Builds an index matching filter_pubmed_articles_by_topics: title and abstract, or any single MeSH term.
+        """
+        texts = [pubmed_topic_text(article)[0] for article in articles]
+        return cls(texts, [len(text) for text in texts])
+
+    @classmethod
+    def from_pmc_articles(cls, articles, body_loader=None):
+        """
+        Builds an index matching filter_pmc_articles_by_topics: title, abstract and keywords, plus the body when
+        matching with include_body=True. Bodies of lazily parsed articles are read through body_loader while
+        indexing and when verifying phrase candidates, but are not kept.
+        """
+        texts = []
+        meta_lengths = []
+        body_refs = []
+        for article in articles:
+            text, meta_length = pmc_topic_text(article)
+            texts.append(text)
+            meta_lengths.append(meta_length)
+            body_ref = article.get("body_ref") if body_loader is not None and not article.get("body") else None
+            body_refs.append(body_ref)
+        if not any(ref is not None for ref in body_refs):
+            body_refs = None
+        return cls(texts, meta_lengths, body_refs=body_refs, body_loader=body_loader)
+
+    @classmethod
+    def from_texts(cls, docs, text_loader):
+        """
+        Builds an index from (text, meta_length) pairs (see pubmed_topic_text and pmc_topic_text) read once, e.g.
+        while they are written to disk, without keeping the texts; phrase candidates are verified through
+        text_loader.
+        """
+        index = cls([], [], text_loader=text_loader)
+        index._index_documents(docs)
+        return index
+
+    def save(self, path):
+        """
+        Saves the postings and vocabulary (not the texts) to an .npz file for load.
+        """
+        np.savez(
+            path,
+            vocab=np.frombuffer(self._vocab_blob.encode(), dtype=np.uint8),
+            meta_lengths=self.meta_lengths,
+            meta_indptr=self.meta_postings[0],
+            meta_doc_ids=self.meta_postings[1],
+            body_indptr=self.body_postings[0],
+            body_doc_ids=self.body_postings[1],
+        )
+
+    @classmethod
+    def load(cls, path, text_loader):
+        """
+        Loads an index saved with save; phrase candidates are verified with the texts read through text_loader.
+        """
+        data = np.load(path)
+        index = cls([], [], text_loader=text_loader)
+        blob = data["vocab"].tobytes().decode()
+        index._set_vocab(blob.split("\n") if data["meta_indptr"].size > 1 else [])
+        index.meta_lengths = data["meta_lengths"]
+        index.meta_postings = (data["meta_indptr"], data["meta_doc_ids"])
+        index.body_postings = (data["body_indptr"], data["body_doc_ids"])
+        return index
+
+    def __len__(self):
+        return len(self.meta_lengths)
+
+    def _token_ids_containing(self, fragment):
+        """
+        Returns the ids of all vocabulary tokens that contain fragment as a substring.
+        """
+        blob, starts = self._vocab_blob, self._vocab_starts
+        ids = []
+        position = blob.find(fragment)
+        while position != -1:
+            token_id = bisect_right(starts, position) - 1
+            ids.append(token_id)
+            if token_id + 1 >= len(starts):
+                break
+            position = blob.find(fragment, starts[token_id + 1])
+        return ids
+
+    def _mark_docs_with_fragment(self, fragment, mask, include_body):
+        """
+        Sets mask[doc] for every article with a token containing fragment.
+        """
+        token_ids = self._token_ids_containing(fragment)
+        postings = [self.meta_postings, self.body_postings] if include_body else [self.meta_postings]
+        for indptr, doc_ids in postings:
+            slices = [doc_ids[indptr[token_id]:indptr[token_id + 1]] for token_id in token_ids]
+            if slices:
+                mask[np.concatenate(slices)] = True
+
+    def match(self, topics, include_body=True):
+        """
+        Returns the sorted positions of articles matching any of the topics.
+        """
+        num_docs = len(self)
+        topics_lower = [topic.lower() for topic in topics]
+        if any(topic == "" for topic in topics_lower):
+            return list(range(num_docs))
+
+        matched = np.zeros(num_docs, dtype=bool)
+        phrases = []
+        for topic in topics_lower:
+            if SINGLE_TOKEN_RE.match(topic):
+                self._mark_docs_with_fragment(topic, matched, include_body)
+            else:
+                phrases.append(topic)
+
+        if phrases:
+            candidates = np.zeros(num_docs, dtype=bool)
+            for phrase in phrases:
+                phrase_candidates = np.ones(num_docs, dtype=bool)
+                # Every word of a phrase occurrence lies inside some token of the text, so articles lacking a token
+                # containing any one of the words cannot match.
+                for word in set(TOKEN_RE.findall(phrase)):
+                    word_docs = np.zeros(num_docs, dtype=bool)
+                    self._mark_docs_with_fragment(word, word_docs, include_body)
+                    phrase_candidates &= word_docs
+                candidates |= phrase_candidates
+
+            # One alternation over all phrases scans each candidate once in C, rather than once per phrase.
+            pattern = re.compile("|".join(re.escape(phrase) for phrase in phrases))
+            for doc_id, text in self._candidate_texts(np.flatnonzero(candidates & ~matched), include_body):
+                end = len(text) if include_body else self.meta_lengths[doc_id]
+                if pattern.search(text, 0, end):
+                    matched[doc_id] = True
+
+        return np.flatnonzero(matched).tolist()
+
+    def _candidate_texts(self, doc_ids, include_body):
+        """
+        Yields (doc_id, text) for the phrase candidates, with lazily parsed bodies when include_body is set.
+        """
+        if self.text_loader is not None:
+            yield from self.text_loader(doc_ids)
+            return
+        for doc_id in doc_ids:
+            text = self.texts[doc_id]
+            if include_body and self.body_refs is not None and self.body_refs[doc_id] is not None:
+                text = text + self._load_body(doc_id)
+            yield doc_id, text
+
+    def filter(self, articles, topics, include_body=True):
+        """
+        Returns the articles (from the list the index was built over) that match any of the topics.
+        """
+        return [articles[i] for i in self.match(topics, include_body=include_body)]
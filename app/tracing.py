@@ -0,0 +1,223 @@
+import contextvars
+import functools
+import itertools
+import json
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+MAXRSS_BYTES = 1 if sys.platform == "darwin" else 1024
+PROMETHEUS_PREFIX = "summarization"
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def _peak_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * MAXRSS_BYTES
+
+
+class Span:
+    """
+    One timed pipeline step. Counters (items processed, LLM tokens, cache hits, ...) are added with add() and
+    summed over the span; attributes set with set() are kept as given.
+    """
+
+    def __init__(self, span_id, name, parent_id):
+        self.span_id = span_id
+        self.name = name
+        self.parent_id = parent_id
+        self.thread = threading.current_thread().name
+        self.counters = {}
+        self.attributes = {}
+        self.start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+        self._peak_rss_start = _peak_rss()
+        self.wall = self.cpu = None
+        self.peak_rss_delta = None
+
+    def add(self, **counters):
+        for key, value in counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def finish(self):
+        self.wall = time.perf_counter() - self.start
+        self.cpu = time.thread_time() - self._cpu_start
+        self.peak_rss_delta = _peak_rss() - self._peak_rss_start
+
+    def to_dict(self, origin):
+        return {
+            "id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "thread": self.thread,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "wall_ms": round(self.wall * 1000, 3),
+            "cpu_ms": round(self.cpu * 1000, 3),
+            "peak_rss_delta_bytes": self.peak_rss_delta,
+            "counters": self.counters,
+            "attributes": self.attributes,
+        }
+
+
+class _NoSpan:
+    """
+    Stand-in returned while tracing is disabled; records nothing.
+    """
+
+    def add(self, **counters):
+        pass
+
+    def set(self, **attributes):
+        pass
+
+
+NO_SPAN = _NoSpan()
+
+
+class Tracer:
+    """
+    Collects finished spans while enabled. Spans nest through a context variable, so a span opened in a worker
+    thread started with asyncio.to_thread (which copies the context) is a child of the span that started it.
+
+    CPU time is that of the span's own thread; the peak RSS delta is how much the process-wide peak resident set
+    size grew while the span was open (0 when it stayed under an earlier peak).
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.spans = []
+        self.origin = time.perf_counter()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self.spans = []
+            self.origin = time.perf_counter()
+
+    @contextmanager
+    def span(self, name, **attributes):
+        if not self.enabled:
+            yield NO_SPAN
+            return
+        parent = _current_span.get()
+        current = Span(next(self._ids), name, parent.span_id if parent is not None else None)
+        current.set(**attributes)
+        token = _current_span.set(current)
+        try:
+            yield current
+        except BaseException as e:
+            current.set(error=type(e).__name__)
+            raise
+        finally:
+            _current_span.reset(token)
+            current.finish()
+            with self._lock:
+                self.spans.append(current)
+
+    def to_json(self):
+        """
+        The trace as a JSON document: every finished span, in start order, with its parent id.
+        """
+        spans = sorted(self.spans, key=lambda span: span.start)
+        return json.dumps({"spans": [span.to_dict(self.origin) for span in spans]}, indent=2)
+
+    def aggregate(self):
+        """
+        Per span name: call count, total wall and CPU seconds, largest peak RSS delta and summed counters.
+        """
+        by_name = {}
+        for span in self.spans:
+            stats = by_name.setdefault(span.name, {"count": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0,
+                                                   "peak_rss_delta_bytes": 0, "counters": {}})
+            stats["count"] += 1
+            stats["wall_seconds"] += span.wall
+            stats["cpu_seconds"] += span.cpu
+            stats["peak_rss_delta_bytes"] = max(stats["peak_rss_delta_bytes"], span.peak_rss_delta)
+            for key, value in span.counters.items():
+                stats["counters"][key] = stats["counters"].get(key, 0) + value
+        return dict(sorted(by_name.items()))
+
+    def to_prometheus(self):
+        """
+        The aggregated spans in the Prometheus text exposition format.
+        """
+        aggregated = self.aggregate()
+        metrics = [
+            ("span_calls_total", "counter", "Number of times the span ran", "count"),
+            ("span_wall_seconds_total", "counter", "Wall-clock time spent in the span", "wall_seconds"),
+            ("span_cpu_seconds_total", "counter", "CPU time of the span's thread", "cpu_seconds"),
+            ("span_peak_rss_delta_bytes", "gauge", "Largest growth of the peak RSS during one run of the span",
+             "peak_rss_delta_bytes"),
+        ]
+        lines = []
+        for metric, kind, description, field in metrics:
+            lines += [f"# HELP {PROMETHEUS_PREFIX}_{metric} {description}",
+                      f"# TYPE {PROMETHEUS_PREFIX}_{metric} {kind}"]
+            lines += [f'{PROMETHEUS_PREFIX}_{metric}{{span="{name}"}} {stats[field]:.6g}'
+                      for name, stats in aggregated.items()]
+        counter_names = sorted({key for stats in aggregated.values() for key in stats["counters"]})
+        if counter_names:
+            lines += [f"# HELP {PROMETHEUS_PREFIX}_span_counter_total Counters recorded by spans (items, tokens, ...)",
+                      f"# TYPE {PROMETHEUS_PREFIX}_span_counter_total counter"]
+            lines += [f'{PROMETHEUS_PREFIX}_span_counter_total{{span="{name}",counter="{key}"}} {value}'
+                      for name, stats in aggregated.items() for key, value in sorted(stats["counters"].items())]
+        return "\n".join(lines) + "\n"
+
+    def report(self):
+        """
+        Human-readable table of the aggregated spans.
+        """
+        rows = [f"{'span':<44}{'calls':>6}{'wall ms':>11}{'cpu ms':>11}{'rss +MB':>9}  counters"]
+        for name, stats in self.aggregate().items():
+            counters = ", ".join(f"{key}={value}" for key, value in sorted(stats["counters"].items()))
+            rows.append(f"{name:<44}{stats['count']:>6}{stats['wall_seconds'] * 1000:>11.1f}"
+                        f"{stats['cpu_seconds'] * 1000:>11.1f}{stats['peak_rss_delta_bytes'] / 2 ** 20:>9.1f}  "
+                        f"{counters}")
+        return "\n".join(rows)
+
+
+tracer = Tracer()
+
+
+def span(name, **attributes):
+    """
+    Context manager timing a block as a span of the process-wide tracer; yields the span (a no-op when disabled).
+    """
+    return tracer.span(name, **attributes)
+
+
+def record(**counters):
+    """
+    Adds counters to the innermost open span, if any.
+    """
+    current = _current_span.get()
+    if current is not None:
+        current.add(**counters)
+
+
+def traced(name):
+    """
+    Decorator running the function inside a span named `name`.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return fn(*args, **kwargs)
+            with tracer.span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
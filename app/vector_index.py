@@ -0,0 +1,645 @@
+import json
+import os
+import shutil
+import sqlite3
+import zlib
+import faiss
+import numpy as np
+from langchain.schema import Document
+from app.bm25 import BM25Index, reciprocal_rank_fusion
+from app.chunk_store import ChunkStore, SOURCES, NO_YEAR
+from app.topic_index import TopicIndex, pubmed_topic_text, pmc_topic_text
+from app.tracing import traced
+
+SOURCE_CODES = {source: code for code, source in enumerate(SOURCES)}
+# Changes applied since the index was built: vectors of new chunks, their columns and tombstoned ids.
+DELTA_FILE = "delta.npz"
+# Names the version directory (inside the index directory) that holds the current index files. Builds and
+# compactions write a new version and switch this pointer, so processes that loaded an older version keep reading
+# consistent files until they reload.
+CURRENT_FILE = "CURRENT"
+INDEX_FILES = ["index.faiss", "columns.npz", "chunks.sqlite", "bm25.npz", "topics.npz", "topic_keys.npy", "info.json",
+               DELTA_FILE, "delta.tmp.npz"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    article_key TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    content TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS topic_texts (
+    doc_id INTEGER PRIMARY KEY,
+    article_key TEXT NOT NULL,
+    meta_length INTEGER NOT NULL,
+    text BLOB NOT NULL
+);
+"""
+
+
+def article_key(source, external_id):
+    """
+    Identifier shared by all chunks of one article, e.g. "PubMed:12345" or "PMC:PMC67890".
+    """
+    return f"{source}:{external_id}"
+
+
+def filtered_article_keys(pubmed_articles, pmc_articles):
+    """
+    Returns the article keys of topic-filtered articles, matching the metadata prepare_*_documents would produce.
+    """
+    keys = {article_key("PubMed", article.get("pmid", "unknown")) for article in pubmed_articles}
+    keys.update(article_key("PMC", article.get("pmcid", "unknown")) for article in pmc_articles)
+    return keys
+
+
+def _current_version(index_dir):
+    try:
+        with open(os.path.join(index_dir, CURRENT_FILE)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        # Indexes saved before versioning keep their files directly in index_dir.
+        return ""
+
+
+def index_files_dir(index_dir):
+    """
+    Directory holding the files of the current version of the index saved in index_dir.
+    """
+    return os.path.join(index_dir, _current_version(index_dir))
+
+
+def index_exists(index_dir):
+    return os.path.exists(os.path.join(index_files_dir(index_dir), "index.faiss"))
+
+
+def index_version(index_dir):
+    """
+    Changes whenever the saved index does: a new version is published or an update rewrites the delta.
+    """
+    version = _current_version(index_dir)
+    try:
+        delta_mtime = os.stat(os.path.join(index_dir, version, DELTA_FILE)).st_mtime_ns
+    except FileNotFoundError:
+        delta_mtime = None
+    return version, delta_mtime
+
+
+def _new_version_dir(index_dir):
+    numbers = [int(name[1:]) for name in os.listdir(index_dir) if name[:1] == "v" and name[1:].isdigit()]
+    version_dir = os.path.join(index_dir, f"v{max(numbers, default=0) + 1}")
+    shutil.rmtree(version_dir, ignore_errors=True)
+    os.makedirs(version_dir)
+    return version_dir
+
+
+def _publish_version(index_dir, version_dir):
+    """
+    Atomically makes version_dir the current version. The version it replaces is kept, as processes that loaded it
+    may still be reading it; older ones are removed.
+    """
+    previous, version = _current_version(index_dir), os.path.basename(version_dir)
+    tmp_path = os.path.join(index_dir, f"{CURRENT_FILE}.tmp")
+    with open(tmp_path, "w") as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(index_dir, CURRENT_FILE))
+
+    for name in os.listdir(index_dir):
+        if name[:1] == "v" and name[1:].isdigit() and name not in (version, previous):
+            shutil.rmtree(os.path.join(index_dir, name), ignore_errors=True)
+    if previous:
+        for name in INDEX_FILES:
+            if os.path.exists(os.path.join(index_dir, name)):
+                os.remove(os.path.join(index_dir, name))
+
+
+def article_topic_texts(pubmed_articles, pmc_articles, body_loader=None):
+    """
+    Yields (article key, meta_length, text) with the normalized text the topic filters match for each article (see
+    pubmed_topic_text and pmc_topic_text), saved with the index for CorpusVectorIndex.topic_article_keys. Bodies of
+    lazily parsed PMC articles are read through body_loader.
+    """
+    for article in pubmed_articles:
+        text, meta_length = pubmed_topic_text(article)
+        yield article_key("PubMed", article.get("pmid", "unknown")), meta_length, text
+    for article in pmc_articles:
+        body = None
+        if body_loader is not None and not article.get("body") and article.get("body_ref") is not None:
+            body = body_loader(article["body_ref"])
+        text, meta_length = pmc_topic_text(article, body)
+        yield article_key("PMC", article.get("pmcid", "unknown")), meta_length, text
+
+
+def _topic_text_loader(db_path, batch_size=500):
+    """
+    Returns a TopicIndex text_loader reading topic texts back from the index's topic_texts table.
+    """
+    def load(doc_ids):
+        with sqlite3.connect(db_path) as conn:
+            for begin in range(0, len(doc_ids), batch_size):
+                batch = [int(doc_id) for doc_id in doc_ids[begin:begin + batch_size]]
+                placeholders = ",".join("?" * len(batch))
+                for doc_id, text in conn.execute(
+                    f"SELECT doc_id, text FROM topic_texts WHERE doc_id IN ({placeholders})", batch
+                ):
+                    yield doc_id, zlib.decompress(text).decode()
+    return load
+
+
+def create_faiss_index(dim, num_vectors, index_type="flat", nlist=None, hnsw_m=32):
+    """
+    Creates an empty L2 FAISS index of the given type ("flat", "ivf" or "hnsw"), matching the metric LangChain's
+    FAISS store uses.
+    """
+    if index_type == "flat":
+        return faiss.IndexFlatL2(dim)
+    if index_type == "ivf":
+        nlist = nlist or max(1, int(4 * np.sqrt(num_vectors)))
+        return faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, nlist, faiss.METRIC_L2)
+    if index_type == "hnsw":
+        return faiss.IndexHNSWFlat(dim, hnsw_m, faiss.METRIC_L2)
+    raise ValueError(f"Unknown index type: {index_type!r} (expected 'flat', 'ivf' or 'hnsw')")
+
+
+def build_corpus_vector_index(chunks, embedding_model, index_dir, index_type="flat", nlist=None, hnsw_m=32,
+                              batch_size=50_000, updates=(), topics=None, verbose=False):
+    """
+    Embeds every chunk of the corpus once and saves a FAISS index plus chunk metadata to index_dir, as a new
+    version (see CURRENT_FILE). chunks is a ChunkStore (see prepare_chunk_store) or a list of LangChain Documents.
+
+    Vector ids are the chunk positions, so the per-id source/year/article columns saved next to the index can
+    be turned directly into FAISS ID selectors at query time.
+
+    Each embed_documents call receives batch_size chunks, enough for a batched embedding model to keep many
+    requests in flight; smaller batches mainly give more frequent progress output.
+
+    updates names the PubMed update files the chunks already include (see update_corpus_vector_index).
+
+    topics (see article_topic_texts) lets the index resolve topic filters by itself; without it, retrieval still
+    filters topics over the loaded corpus.
+    """
+    if not isinstance(chunks, ChunkStore):
+        chunks = ChunkStore.from_documents(chunks)
+    if not len(chunks):
+        raise ValueError("Cannot build a vector index without documents.")
+    os.makedirs(index_dir, exist_ok=True)
+
+    vectors = []
+    for begin in range(0, len(chunks), batch_size):
+        batch = chunks.texts(range(begin, min(begin + batch_size, len(chunks))))
+        vectors.append(np.asarray(embedding_model.embed_documents(list(batch)), dtype=np.float32))
+        if verbose:
+            print(f"Embedded {begin + len(batch)}/{len(chunks)} chunks")
+    vectors = np.vstack(vectors)
+
+    keys = chunks.article_keys()
+    rows = ((key, json.dumps(chunks.metadata(i)), chunks.text(i)) for i, key in enumerate(keys))
+    version_dir = _new_version_dir(index_dir)
+    _write_index(version_dir, vectors, chunks.sources(), chunks.years(), keys, rows, index_type=index_type,
+                 nlist=nlist, hnsw_m=hnsw_m, updates=updates, topics=topics)
+    _publish_version(index_dir, version_dir)
+    return load_corpus_vector_index(index_dir)
+
+
+def _write_index(index_dir, vectors, sources, years, keys, rows, index_type="flat", nlist=None, hnsw_m=32,
+                 updates=(), topics=None):
+    """
+    Writes the files of a corpus index: the FAISS index, the per-id columns, the chunk table (rows of
+    (article_key, metadata JSON, content) in vector id order), the BM25 index, info.json and, given topics (see
+    article_topic_texts), the topic index with its texts.
+    """
+    index = create_faiss_index(vectors.shape[1], len(vectors), index_type=index_type, nlist=nlist, hnsw_m=hnsw_m)
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    faiss.write_index(index, os.path.join(index_dir, "index.faiss"))
+
+    np.savez(
+        os.path.join(index_dir, "columns.npz"),
+        sources=sources,
+        years=years,
+        article_keys=np.array(keys, dtype=str),
+    )
+
+    db_path = os.path.join(index_dir, "chunks.sqlite")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    with sqlite3.connect(db_path) as conn:
+        conn.executescript(SCHEMA)
+        conn.executemany(
+            "INSERT INTO chunks (id, article_key, metadata, content) VALUES (?, ?, ?, ?)",
+            ((i, key, metadata, content) for i, (key, metadata, content) in enumerate(rows))
+        )
+        BM25Index.from_texts(content for content, in conn.execute("SELECT content FROM chunks ORDER BY id")).save(
+            os.path.join(index_dir, "bm25.npz")
+        )
+        num_topic_docs = _write_topics(conn, index_dir, topics) if topics is not None else None
+
+    delta_path = os.path.join(index_dir, DELTA_FILE)
+    if os.path.exists(delta_path):
+        os.remove(delta_path)
+    with open(os.path.join(index_dir, "info.json"), "w") as f:
+        json.dump({"index_type": index_type, "num_vectors": len(vectors), "dim": int(vectors.shape[1]),
+                   "updates": list(updates), "topic_docs": num_topic_docs}, f)
+
+
+def _write_topics(conn, index_dir, topics):
+    """
+    Stores the compressed topic texts in the topic_texts table while building the TopicIndex over them in the same
+    pass, and saves its postings and the article key of each of its documents. Returns the number of documents.
+    """
+    keys = []
+
+    def stored_texts():
+        for doc_id, (key, meta_length, text) in enumerate(topics):
+            conn.execute("INSERT INTO topic_texts (doc_id, article_key, meta_length, text) VALUES (?, ?, ?, ?)",
+                         (doc_id, key, meta_length, zlib.compress(text.encode())))
+            keys.append(key)
+            yield text, meta_length
+
+    TopicIndex.from_texts(stored_texts(), None).save(os.path.join(index_dir, "topics.npz"))
+    np.save(os.path.join(index_dir, "topic_keys.npy"), np.array(keys, dtype=str))
+    return len(keys)
+
+
+def load_corpus_vector_index(index_dir, mmap=True):
+    """
+    Loads a corpus index saved by build_corpus_vector_index, memory-mapping the FAISS index where supported.
+    """
+    version = index_version(index_dir)
+    index_dir = os.path.join(index_dir, version[0])
+    path = os.path.join(index_dir, "index.faiss")
+    index = None
+    if mmap:
+        try:
+            index = faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            index = None
+    if index is None:
+        index = faiss.read_index(path)
+    if isinstance(index, faiss.IndexIVF):
+        # Needed to reconstruct vectors for exact search over small filtered subsets.
+        index.make_direct_map()
+
+    with open(os.path.join(index_dir, "info.json")) as f:
+        info = json.load(f)
+    columns = np.load(os.path.join(index_dir, "columns.npz"))
+    # Indexes built before hybrid retrieval have no BM25 index and are searched by vector only.
+    bm25_path = os.path.join(index_dir, "bm25.npz")
+    bm25 = BM25Index.load(bm25_path) if os.path.exists(bm25_path) else None
+    sources, years, article_keys = columns["sources"], columns["years"], columns["article_keys"]
+    db_path = os.path.join(index_dir, "chunks.sqlite")
+
+    topic_index = topic_keys = None
+    if info.get("topic_docs") is not None:
+        topic_index = TopicIndex.load(os.path.join(index_dir, "topics.npz"), _topic_text_loader(db_path))
+        topic_keys = np.load(os.path.join(index_dir, "topic_keys.npy"))
+
+    delta_path = os.path.join(index_dir, DELTA_FILE)
+    if not os.path.exists(delta_path):
+        return CorpusVectorIndex(index, info, sources, years, article_keys, db_path, bm25=bm25, version=version,
+                                 topic_index=topic_index, topic_keys=topic_keys)
+
+    delta = np.load(delta_path)
+    sources = np.concatenate([sources, delta["sources"]])
+    years = np.concatenate([years, delta["years"]])
+    article_keys = np.concatenate([article_keys, delta["article_keys"]])
+    delta_bm25 = None
+    if bm25 is not None:
+        with sqlite3.connect(db_path) as conn:
+            delta_bm25 = BM25Index.from_texts(content for content, in conn.execute(
+                "SELECT content FROM chunks WHERE id >= ? AND id < ? ORDER BY id", (index.ntotal, len(sources))
+            ))
+    delta_topics = {}
+    if topic_index is not None:
+        # The topic texts of revised articles are few, so their index is rebuilt in memory on every load.
+        topic_ids = delta["topic_ids"].tolist()
+        with sqlite3.connect(db_path) as conn:
+            rows = dict((doc_id, row) for doc_id, *row in conn.execute(
+                f"SELECT doc_id, article_key, meta_length, text FROM topic_texts "
+                f"WHERE doc_id IN ({','.join('?' * len(topic_ids))})", topic_ids
+            ))
+        rows = [rows[doc_id] for doc_id in topic_ids]
+        delta_topics = {
+            "delta_topic_index": TopicIndex([zlib.decompress(text).decode() for _, _, text in rows],
+                                            [meta_length for _, meta_length, _ in rows]),
+            "delta_topic_keys": [key for key, _, _ in rows],
+            "delta_topic_ids": topic_ids,
+            "removed_topic_keys": delta["removed_topic_keys"].tolist(),
+        }
+    return CorpusVectorIndex(index, info, sources, years, article_keys, db_path, bm25=bm25,
+                             delta_vectors=delta["vectors"], delta_bm25=delta_bm25, tombstones=delta["tombstones"],
+                             delta_updates=delta["updates"].tolist(), version=version, topic_index=topic_index,
+                             topic_keys=topic_keys, **delta_topics)
+
+
+def update_corpus_vector_index(index_dir, chunks, removed_keys, embedding_model, updates=(), topics=None):
+    """
+    Applies corpus changes to a saved index without rebuilding it. All chunks of the articles in removed_keys
+    (revised and deleted ones) are tombstoned, which excludes them from every search, and the chunks of the new
+    versions (a ChunkStore, see prepare_chunk_store) are embedded into the delta: a small segment stored next to the
+    main index and searched exactly. updates names the update files applied and topics holds the topic texts of the
+    new versions (see article_topic_texts), required when the index matches topics. Returns the reloaded index.
+
+    Tombstones and the delta only grow; compact_corpus_vector_index folds them into the main index. The current
+    version is changed in place: chunk and topic text rows are only appended and the delta is replaced atomically,
+    so processes that loaded it keep working and pick the changes up when they reload.
+    """
+    index = load_corpus_vector_index(index_dir)
+    if index.matches_topics() and topics is None:
+        raise ValueError("The index matches topics; pass the topic texts of the new versions (see "
+                         "article_topic_texts).")
+    files_dir = os.path.dirname(index.db_path)
+    first_id = len(index.sources)
+    dead = index.select_ids(article_keys=removed_keys) if removed_keys else np.empty(0, dtype=np.int64)
+    if len(chunks):
+        vectors = np.asarray(embedding_model.embed_documents(list(chunks.texts())), dtype=np.float32)
+    else:
+        vectors = np.empty((0, index.index.d), dtype=np.float32)
+
+    keys = chunks.article_keys()
+    topic_ids = [doc_id for doc_id, key in zip(index.delta_topic_ids, index.delta_topic_keys)
+                 if key not in removed_keys]
+    with sqlite3.connect(index.db_path) as conn:
+        # Rows past the known ids are left over from an interrupted update.
+        conn.execute("DELETE FROM chunks WHERE id >= ?", (first_id,))
+        conn.executemany(
+            "INSERT INTO chunks (id, article_key, metadata, content) VALUES (?, ?, ?, ?)",
+            ((first_id + i, key, json.dumps(chunks.metadata(i)), chunks.text(i)) for i, key in enumerate(keys))
+        )
+        if index.matches_topics():
+            # Numbered after every existing row, including ones left over from an interrupted update.
+            next_id, = conn.execute("SELECT COALESCE(MAX(doc_id) + 1, 0) FROM topic_texts").fetchone()
+            for doc_id, (key, meta_length, text) in enumerate(topics, start=next_id):
+                conn.execute("INSERT INTO topic_texts (doc_id, article_key, meta_length, text) VALUES (?, ?, ?, ?)",
+                             (doc_id, key, meta_length, zlib.compress(text.encode())))
+                topic_ids.append(doc_id)
+
+    base = index.num_base
+    # Written to a temporary file and renamed, so a reader never sees a half-written delta.
+    tmp_path = os.path.join(files_dir, "delta.tmp.npz")
+    np.savez(
+        tmp_path,
+        vectors=np.vstack([index.delta_vectors, vectors]),
+        sources=np.concatenate([index.sources[base:], chunks.sources()]),
+        years=np.concatenate([index.years[base:], chunks.years()]),
+        article_keys=np.concatenate([index.article_keys[base:], np.array(keys, dtype=str)]),
+        tombstones=np.union1d(index.tombstones, dead).astype(np.int64),
+        updates=np.array(index.delta_updates + list(updates), dtype=str),
+        topic_ids=np.array(topic_ids, dtype=np.int64),
+        removed_topic_keys=np.array(sorted(index.removed_topic_keys | set(removed_keys)), dtype=str),
+    )
+    os.replace(tmp_path, os.path.join(files_dir, DELTA_FILE))
+    return load_corpus_vector_index(index_dir)
+
+
+def compact_corpus_vector_index(index_dir, batch_size=50_000):
+    """
+    Folds the delta into the main index and drops tombstoned chunks. Live vectors are read back from the index (no
+    embedding requests) and written, renumbered, to a fresh index of the same type saved as a new version.
+    Processes that loaded the previous version keep reading its files, which stay in place until the next version
+    is published, and reload once they see the new one (see index_version). Returns the reloaded index.
+    """
+    index = load_corpus_vector_index(index_dir)
+    live = np.flatnonzero(index.live)
+    base_live = live[live < index.num_base]
+    vectors = [index.index.reconstruct_batch(base_live[begin:begin + batch_size])
+               for begin in range(0, len(base_live), batch_size)]
+    vectors.append(index.delta_vectors[live[live >= index.num_base] - index.num_base])
+    vectors = np.vstack(vectors)
+
+    faiss_index = index.index
+    nlist = faiss_index.nlist if isinstance(faiss_index, faiss.IndexIVF) else None
+    hnsw_m = faiss_index.hnsw.nb_neighbors(1) if isinstance(faiss_index, faiss.IndexHNSW) else 32
+
+    version_dir = _new_version_dir(index_dir)
+    with sqlite3.connect(index.db_path) as conn:
+        topics = _live_topic_texts(conn, index) if index.matches_topics() else None
+        rows = (
+            (key, metadata, content)
+            for vector_id, key, metadata, content in conn.execute(
+                "SELECT id, article_key, metadata, content FROM chunks WHERE id < ? ORDER BY id", (len(index.live),)
+            )
+            if index.live[vector_id]
+        )
+        _write_index(version_dir, vectors, index.sources[live], index.years[live], index.article_keys[live], rows,
+                     index_type=index.info["index_type"], nlist=nlist, hnsw_m=hnsw_m, updates=index.applied_updates(),
+                     topics=topics)
+    _publish_version(index_dir, version_dir)
+    return load_corpus_vector_index(index_dir)
+
+
+def _live_topic_texts(conn, index):
+    """
+    Yields the (article key, meta_length, text) topic texts of the main index's articles that no update removed,
+    followed by those of the delta, for the compacted index.
+    """
+    num_base, delta_ids = index.info["topic_docs"], set(index.delta_topic_ids)
+    for doc_id, key, meta_length, text in conn.execute(
+        "SELECT doc_id, article_key, meta_length, text FROM topic_texts ORDER BY doc_id"
+    ):
+        if doc_id < num_base and key not in index.removed_topic_keys or doc_id in delta_ids:
+            yield key, meta_length, zlib.decompress(text).decode()
+
+
+class CorpusVectorIndex:
+    """
+    Build-once, load-many FAISS index over the whole corpus. Per-query topic, source and year restrictions are
+    applied as ID selectors inside the FAISS search instead of building a new index per query.
+    """
+
+    def __init__(self, index, info, sources, years, article_keys, db_path, bm25=None, delta_vectors=None,
+                 delta_bm25=None, tombstones=None, delta_updates=(), version=None, topic_index=None, topic_keys=None,
+                 delta_topic_index=None, delta_topic_keys=(), delta_topic_ids=(), removed_topic_keys=()):
+        self.index = index
+        # index_version of the saved index this was loaded from.
+        self.version = version
+        self.bm25 = bm25
+        self.info = info
+        self.sources = sources
+        self.years = years
+        self.article_keys = article_keys
+        self.db_path = db_path
+        self._ids_by_article = {}
+        for vector_id, key in enumerate(article_keys.tolist()):
+            self._ids_by_article.setdefault(key, []).append(vector_id)
+
+        # Ids from num_base on belong to the delta (see update_corpus_vector_index).
+        self.num_base = index.ntotal
+        self.delta_vectors = (delta_vectors if delta_vectors is not None
+                              else np.empty((0, index.d), dtype=np.float32))
+        self.delta_bm25 = delta_bm25
+        self.delta_updates = list(delta_updates)
+        self.tombstones = tombstones if tombstones is not None else np.empty(0, dtype=np.int64)
+        self.live = np.ones(len(sources), dtype=bool)
+        self.live[self.tombstones] = False
+        base_tombstones = self.tombstones[self.tombstones < self.num_base]
+        # Keeps tombstoned vectors out of unrestricted searches of the main index (the inner selector must outlive
+        # the outer one).
+        self._tombstone_selector = faiss.IDSelectorBatch(base_tombstones) if len(base_tombstones) else None
+        self._live_selector = (faiss.IDSelectorNot(self._tombstone_selector)
+                               if self._tombstone_selector is not None else None)
+
+        # Topic index over the articles of the main index, with the article key of each of its documents. Articles
+        # removed by updates are dropped from its matches, and their new versions are matched by the delta's.
+        self.topic_index = topic_index
+        self.topic_keys = topic_keys
+        self.delta_topic_index = delta_topic_index
+        self.delta_topic_keys = list(delta_topic_keys)
+        self.delta_topic_ids = list(delta_topic_ids)
+        self.removed_topic_keys = set(removed_topic_keys)
+
+    def __len__(self):
+        return len(self.live) - len(self.tombstones)
+
+    def applied_updates(self):
+        """
+        Names of the PubMed update files whose changes the index includes.
+        """
+        return self.info.get("updates", []) + self.delta_updates
+
+    def matches_topics(self):
+        """
+        Whether the index was saved with topic texts, so topic_article_keys matches like the corpus filters.
+        """
+        return self.topic_index is not None
+
+    def delta_ratio(self):
+        """
+        Delta and tombstoned vectors relative to the size of the main index; compaction resets it to 0.
+        """
+        return (len(self.delta_vectors) + len(self.tombstones)) / max(self.num_base, 1)
+
+    def select_ids(self, article_keys=None, sources=None, min_year=None, max_year=None):
+        """
+        Returns the live vector ids allowed by the restrictions, or None when nothing is restricted.
+        """
+        if article_keys is None and sources is None and min_year is None and max_year is None:
+            return None
+
+        mask = np.ones(len(self.sources), dtype=bool)
+        if article_keys is not None:
+            allowed = np.zeros(len(self.sources), dtype=bool)
+            for key in article_keys:
+                allowed[self._ids_by_article.get(key, [])] = True
+            mask &= allowed
+        if sources is not None:
+            mask &= np.isin(self.sources, [SOURCE_CODES[source] for source in sources])
+        if min_year is not None:
+            mask &= self.years >= min_year
+        if max_year is not None:
+            mask &= (self.years <= max_year) & (self.years != NO_YEAR)
+        return np.flatnonzero(mask & self.live).astype(np.int64)
+
+    def _search_params(self, selector, nprobe, ef_search):
+        if isinstance(self.index, faiss.IndexIVF):
+            return faiss.SearchParametersIVF(sel=selector, nprobe=nprobe)
+        if isinstance(self.index, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=ef_search)
+        return faiss.SearchParameters(sel=selector)
+
+    def _split_ids(self, ids):
+        """
+        Splits allowed ids into main-index and delta ids; ids=None allows every live vector, and gives None for the
+        main index.
+        """
+        if ids is None:
+            return None, np.flatnonzero(self.live[self.num_base:]) + self.num_base
+        ids = np.asarray(ids, dtype=np.int64)
+        return ids[ids < self.num_base], ids[ids >= self.num_base]
+
+    def search_by_vector(self, vector, k=7, ids=None, nprobe=16, ef_search=128, exact_threshold=20000):
+        """
+        Returns [(vector_id, distance)] for the k nearest allowed vectors.
+
+        Approximate indexes (IVF, HNSW) can miss most of a highly selective filter, so when at most exact_threshold
+        ids are allowed their vectors are reconstructed and scored exactly instead. Delta vectors are always scored
+        exactly and merged in; tombstoned vectors are never returned.
+        """
+        if ids is not None and len(ids) == 0:
+            return []
+        query = np.asarray([vector], dtype=np.float32)
+        base_ids, delta_ids = self._split_ids(ids)
+        hits = self._search_base(query, k, base_ids, nprobe, ef_search, exact_threshold)
+        if not len(delta_ids):
+            return hits
+
+        distances = ((self.delta_vectors[delta_ids - self.num_base] - query) ** 2).sum(axis=1)
+        top = np.argsort(distances, kind="stable")[:k]
+        hits += [(int(delta_ids[i]), float(distances[i])) for i in top]
+        return sorted(hits, key=lambda hit: hit[1])[:k]
+
+    def _search_base(self, query, k, ids, nprobe, ef_search, exact_threshold):
+        if ids is not None and len(ids) == 0:
+            return []
+        if ids is not None and len(ids) <= exact_threshold:
+            candidates = self.index.reconstruct_batch(ids)
+            distances = ((candidates - query) ** 2).sum(axis=1)
+            top = np.argsort(distances, kind="stable")[:k]
+            return [(int(ids[i]), float(distances[i])) for i in top]
+
+        selector = faiss.IDSelectorBatch(ids) if ids is not None else self._live_selector
+        params = self._search_params(selector, nprobe, ef_search)
+        distances, labels = self.index.search(query, k, params=params)
+        return [(int(label), float(distance)) for label, distance in zip(labels[0], distances[0]) if label != -1]
+
+    def lexical_search(self, query_text, n=300, ids=None):
+        """
+        Returns [(vector_id, score)] for the n best BM25 matches among the allowed (by default all live) chunks.
+        """
+        base_ids, delta_ids = self._split_ids(ids)
+        if base_ids is None and self._tombstone_selector is not None:
+            base_ids = np.flatnonzero(self.live[:self.num_base])
+        hits = self.bm25.search(query_text, n=n, ids=base_ids)
+        if self.delta_bm25 is None or not len(delta_ids):
+            return hits
+
+        hits += [(self.num_base + doc_id, score)
+                 for doc_id, score in self.delta_bm25.search(query_text, n=n, ids=delta_ids - self.num_base)]
+        return sorted(hits, key=lambda hit: -hit[1])[:n]
+
+    def get_documents(self, ids):
+        """
+        Reads the chunks with the given vector ids back as LangChain Documents, in the given order.
+        """
+        if not ids:
+            return []
+        with sqlite3.connect(self.db_path) as conn:
+            placeholders = ",".join("?" * len(ids))
+            rows = dict((row_id, (metadata, content)) for row_id, metadata, content in conn.execute(
+                f"SELECT id, metadata, content FROM chunks WHERE id IN ({placeholders})", list(ids)
+            ))
+        return [Document(page_content=rows[i][1], metadata=json.loads(rows[i][0])) for i in ids]
+
+    @traced("vector_index.topic_article_keys")
+    def topic_article_keys(self, topics, include_body=True):
+        """
+        Returns the keys of the articles matching any of the topics, resolved from the topic index saved with the
+        index (see TopicIndex) instead of loading the corpus: the same articles filter_pubmed_articles_by_topics and
+        filter_pmc_articles_by_topics (with include_body_in_filter=include_body) return. Needs an index saved with
+        topic texts (see matches_topics).
+        """
+        keys = set(self.topic_keys[self.topic_index.match(topics, include_body=include_body)].tolist())
+        keys -= self.removed_topic_keys
+        if self.delta_topic_index is not None:
+            keys.update(self.delta_topic_keys[doc_id]
+                        for doc_id in self.delta_topic_index.match(topics, include_body=include_body))
+        return keys
+
+    @traced("vector_index.similarity_search")
+    def similarity_search(self, query_text, embedding_model, k=7, article_keys=None, sources=None, min_year=None,
+                          max_year=None, candidates=0, **search_kwargs):
+        """
+        Embeds the query and returns the k most similar chunks that satisfy the restrictions.
+
+        With candidates > 0 and a BM25 index, the top `candidates` lexical and vector hits are fused with RRF.
+        """
+        ids = self.select_ids(article_keys=article_keys, sources=sources, min_year=min_year, max_year=max_year)
+        vector = embedding_model.embed_query(query_text)
+        if not candidates or self.bm25 is None:
+            hits = self.search_by_vector(vector, k=k, ids=ids, **search_kwargs)
+            return self.get_documents([vector_id for vector_id, _ in hits])
+
+        lexical = [vector_id for vector_id, _ in self.lexical_search(query_text, n=candidates, ids=ids)]
+        semantic = [vector_id for vector_id, _ in self.search_by_vector(vector, k=candidates, ids=ids, **search_kwargs)]
+        return self.get_documents(reciprocal_rank_fusion([lexical, semantic], limit=k))
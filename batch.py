@@ -0,0 +1,160 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.pipeline import generate_summary_async, warm_up
+
+
+def read_questions(path, default_role=None):
+    """
+    Reads role/question records from a JSONL file. Records without a request_id are identified by their line
+    number, so that reruns over the same file resume consistently.
+    """
+    records = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            record.setdefault("request_id", f"line-{line_number}")
+            if default_role is not None:
+                record.setdefault("role", default_role)
+            records.append(record)
+    return records
+
+
+def completed_request_ids(output_path):
+    """
+    Request IDs already answered successfully in an existing output file; failed requests are retried.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path) as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by an interrupted run.
+                continue
+            if "error" not in result:
+                done.add(result["request_id"])
+    return done
+
+
+def _percentiles(values):
+    values = np.asarray(values, dtype=np.float64)
+    return {"count": len(values), "p50_ms": round(float(np.percentile(values, 50)), 1),
+            "p95_ms": round(float(np.percentile(values, 95)), 1)}
+
+
+def summarize_results(results, wall_seconds):
+    """
+    Aggregate throughput, end-to-end latency and p50/p95 duration per pipeline stage of a batch run.
+    """
+    succeeded = [result for result in results if "error" not in result]
+    stage_durations = {}
+    for result in succeeded:
+        for name, stage in result["timings"]["stages"].items():
+            stage_durations.setdefault(name, []).append(stage["duration_ms"])
+    return {
+        "completed": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "wall_seconds": round(wall_seconds, 2),
+        "questions_per_minute": round(60 * len(succeeded) / wall_seconds, 2) if wall_seconds else None,
+        "latency": _percentiles([result["latency_ms"] for result in succeeded]) if succeeded else None,
+        "stages": {name: _percentiles(durations) for name, durations in sorted(stage_durations.items())},
+    }
+
+
+async def _answer(record, corpus, pmc_limit, semaphore, save_documents):
+    async with semaphore:
+        start = time.perf_counter()
+        documents = []
+        try:
+            summary, evaluation_report, kpis, timings = await generate_summary_async(
+                record["role"], record["question"], corpus=corpus, pmc_limit=pmc_limit, sources=record.get("sources"),
+                min_year=record.get("min_year"), max_year=record.get("max_year"),
+                on_documents=documents.extend if save_documents else None
+            )
+        except Exception as e:
+            return {"request_id": record["request_id"], "error": f"{type(e).__name__}: {e}"}
+        result = {
+            "request_id": record["request_id"],
+            "role": record["role"],
+            "question": record["question"],
+            "summary": summary,
+            "evaluation_report": evaluation_report,
+            "kpis": kpis,
+            "timings": timings,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+        if save_documents:
+            result["documents"] = [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in documents]
+        return result
+
+
+async def run_batch(records, output_path, corpus, concurrency=4, save_documents=False, pmc_limit=None,
+                    verbose=False):
+    """
+    Answers the records with at most `concurrency` questions in flight, appending each result to output_path as
+    soon as it finishes. With save_documents, each result also holds the documents its summary was generated from.
+    pmc_limit is the one the corpus was loaded with (it scopes the query cache). Returns the results of this run.
+    """
+    loop = asyncio.get_running_loop()
+    # Each question runs up to three blocking stages at a time on worker threads.
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=max(4, 3 * concurrency)))
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = [asyncio.create_task(_answer(record, corpus, pmc_limit, semaphore, save_documents)) for record in records]
+
+    results = []
+    with open(output_path, "a") as out:
+        for task in asyncio.as_completed(tasks):
+            result = await task
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            results.append(result)
+            if verbose:
+                status = result["error"] if "error" in result else f"{result['latency_ms']} ms"
+                print(f"[{len(results)}/{len(records)}] {result['request_id']}: {status}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of role/question records in one process.")
+    parser.add_argument("input", help="JSONL with request_id (optional), role, question and optionally sources, "
+                                      "min_year and max_year per line")
+    parser.add_argument("--output", default="results.jsonl",
+                        help="JSONL results file; requests already answered in it are skipped")
+    parser.add_argument("--concurrency", type=int, default=4, help="Number of questions processed concurrently")
+    parser.add_argument("--role", default=None, help="Role used for records that do not specify one")
+    parser.add_argument("--pmc_limit", type=int, default=None, help="Optional limit on number of PMC files to load")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of worker processes for XML parsing (default: sequential)")
+    parser.add_argument("--lazy_body", action="store_true",
+                        help="Keep PMC bodies on disk and load them only for articles that pass the topic filter")
+    parser.add_argument("--save_documents", action="store_true",
+                        help="Also write the documents each summary was generated from (needed by the citation "
+                             "and faithfulness pre-check of evaluate_batch.py)")
+    args = parser.parse_args()
+
+    done = completed_request_ids(args.output)
+    pending = [record for record in read_questions(args.input, default_role=args.role)
+               if record["request_id"] not in done]
+    print(f"{len(done)} requests already answered, {len(pending)} to go")
+
+    if pending:
+        start = time.perf_counter()
+        corpus = warm_up(pmc_limit=args.pmc_limit, workers=args.workers, lazy_body=args.lazy_body)
+        print(f"Warm-up: {time.perf_counter() - start:.1f} s")
+
+        start = time.perf_counter()
+        batch_results = asyncio.run(run_batch(pending, args.output, corpus, concurrency=args.concurrency,
+                                              save_documents=args.save_documents, pmc_limit=args.pmc_limit,
+                                              verbose=True))
+        print(json.dumps(summarize_results(batch_results, time.perf_counter() - start), indent=2))
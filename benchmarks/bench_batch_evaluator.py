@@ -0,0 +1,130 @@
+"""
+Compares evaluating archived summaries one at a time with evaluate_summary against the batch evaluator, with and
+without the local citation and faithfulness pre-check, using the fake OpenAI server for the LLM rubric.
+
+Synthetic summaries are generated from synthetic retrieved documents in three kinds: grounded (sentences taken
+from the cited documents, lightly reworded), hallucinated (unrelated sentences, some citing unknown articles) and
+mixed (half of each). Reports wall time, evaluations/sec, LLM calls made and saved, the pre-check time per summary
+and how the pre-check verdicts line up with the kinds (grounded should pass, hallucinated fail, mixed stay
+uncertain and go to the LLM). The LLM response cache is disabled so that every call reaches the fake backend.
+
+Usage:
+    python -m benchmarks.bench_batch_evaluator --num_summaries 500 --chat_latency_ms 300 --max_in_flight 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+from langchain.schema import Document
+
+from benchmarks.fake_openai_server import start_fake_server
+
+KINDS = ["grounded", "hallucinated", "mixed"]
+
+
+def _sentence(rng, words=12):
+    from benchmarks.bench_topic_filter import VOCABULARY
+
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words)).capitalize() + "."
+
+
+def _reword(rng, sentence):
+    words = sentence.rstrip(".").split()
+    del words[rng.randrange(len(words))]
+    return " ".join(words) + "."
+
+
+def make_summaries(count, documents_per_summary=7, sentences_per_summary=4, seed=0):
+    """
+    Returns [(kind, record)], records holding request_id, role, question, summary and documents.
+    """
+    rng = random.Random(seed)
+    items = []
+    for n in range(count):
+        documents = [
+            Document(page_content=" ".join(_sentence(rng) for _ in range(6)),
+                     metadata={"source": "PubMed", "pmid": str(100000 * n + i), "title": _sentence(rng, 6)})
+            for i in range(documents_per_summary)
+        ]
+        kind = KINDS[n % len(KINDS)]
+        sentences = []
+        for i in range(sentences_per_summary):
+            doc = rng.choice(documents)
+            grounded = kind == "grounded" or (kind == "mixed" and i % 2 == 0)
+            if grounded:
+                text = _reword(rng, rng.choice(doc.page_content.split(". ")).rstrip(".") + ".")
+                label = f"PMID{doc.metadata['pmid']}"
+            else:
+                text = _sentence(rng)
+                label = f"PMID{doc.metadata['pmid']}" if i % 2 else f"PMID{rng.randrange(10 ** 8)}"
+            sentences.append(f"{text[:-1]} [{label}].")
+        items.append((kind, {"request_id": f"summary-{n}", "role": "researcher",
+                             "question": "What is the efficacy of etanercept in juvenile idiopathic arthritis?",
+                             "summary": " ".join(sentences), "documents": documents}))
+    return items
+
+
+def run_benchmark(num_summaries=300, chat_latency_ms=100.0, max_in_flight=8, requests_per_minute=0.0, seed=0):
+    """
+    Returns the sequential, batched and batched-with-pre-check results.
+    """
+    backend = start_fake_server(chat_latency_ms=chat_latency_ms)
+    # The configuration (API base URL, caches) is read when the app modules are first imported, so they are
+    # imported only now.
+    os.environ.update({
+        "OPENAI_BASE_URL": backend.base_url,
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY") or "fake",
+        "LLM_CACHE_PATH": "",
+    })
+    from app.batch_evaluator import evaluate_batch, summarize_evaluations, precheck_summary
+    from app.evaluator import evaluate_summary
+
+    items = make_summaries(num_summaries, seed=seed)
+    records = [record for _, record in items]
+    results = {"num_summaries": num_summaries, "chat_latency_ms": chat_latency_ms, "max_in_flight": max_in_flight}
+    try:
+        calls_before, start = backend.chat_requests, time.perf_counter()
+        for record in records:
+            evaluate_summary(record["role"], record["question"], record["summary"])
+        elapsed = time.perf_counter() - start
+        results["sequential"] = {"wall_seconds": round(elapsed, 2),
+                                 "evaluations_per_sec": round(len(records) / elapsed, 2),
+                                 "llm_calls": backend.chat_requests - calls_before}
+
+        for name, skip_verdicts in [("batched", ()), ("batched_precheck", ("fail", "pass"))]:
+            calls_before, start = backend.chat_requests, time.perf_counter()
+            batch = asyncio.run(evaluate_batch(records, max_in_flight=max_in_flight,
+                                               requests_per_minute=requests_per_minute,
+                                               skip_verdicts=skip_verdicts))
+            results[name] = dict(summarize_evaluations(batch, time.perf_counter() - start),
+                                 llm_calls=backend.chat_requests - calls_before)
+            results[name].pop("mean_llm_faithfulness_by_verdict")
+    finally:
+        backend.shutdown()
+
+    start = time.perf_counter()
+    verdicts = [precheck_summary(record["summary"], record["documents"])["verdict"] for record in records]
+    results["precheck_ms_per_summary"] = round((time.perf_counter() - start) * 1000 / len(records), 3)
+    confusion = {kind: {} for kind in KINDS}
+    for (kind, _), verdict in zip(items, verdicts):
+        confusion[kind][verdict] = confusion[kind].get(verdict, 0) + 1
+    results["verdicts_by_kind"] = confusion
+    results["speedup"] = round(results["sequential"]["wall_seconds"]
+                               / results["batched_precheck"]["wall_seconds"], 1)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the batch evaluator and its local pre-check.")
+    parser.add_argument("--num_summaries", type=int, default=300)
+    parser.add_argument("--chat_latency_ms", type=float, default=100.0, help="Latency of each LLM evaluation call")
+    parser.add_argument("--max_in_flight", type=int, default=8)
+    parser.add_argument("--requests_per_minute", type=float, default=0.0,
+                        help="Rate limit of the batch evaluator (0: none)")
+    args = parser.parse_args()
+
+    print(json.dumps(run_benchmark(args.num_summaries, args.chat_latency_ms, args.max_in_flight,
+                                   args.requests_per_minute), indent=2))
@@ -0,0 +1,83 @@
+"""
+Compares the memory held by prepared chunks as a list of LangChain Documents (prepare_*_documents) with the
+compact ChunkStore (prepare_chunk_store), on synthetic PubMed abstracts and PMC articles with full-text bodies.
+
+Memory is the Python heap retained after building each representation, measured with tracemalloc; the input
+articles are allocated before tracing starts and are not counted.
+
+Usage:
+    python -m benchmarks.bench_chunk_store --num_abstracts 100000 --num_pmc 5000
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+from app.data_loader import prepare_pubmed_documents, prepare_pmc_documents, prepare_chunk_store
+from benchmarks.bench_topic_filter import make_articles
+
+
+def make_pmc_articles(num_articles, paragraphs_per_body=12, seed=1):
+    """
+    Synthetic PMC article dicts whose bodies are a dozen abstract-sized paragraphs (about 15 chunks each).
+    """
+    abstracts = make_articles(num_articles * (paragraphs_per_body + 1), seed=seed)
+    articles = []
+    for i in range(num_articles):
+        paragraphs = abstracts[i * (paragraphs_per_body + 1):(i + 1) * (paragraphs_per_body + 1)]
+        articles.append({
+            "pmcid": f"PMC{i}",
+            "title": paragraphs[0]["title"],
+            "abstract": paragraphs[0]["abstract"],
+            "body": "\n\n".join(paragraph["abstract"] for paragraph in paragraphs[1:]),
+            "publication_year": paragraphs[0]["publication_year"],
+        })
+    return articles
+
+
+def _measure(build):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, {"seconds": round(elapsed, 3), "retained_mb": round(retained / 2 ** 20, 1),
+                    "peak_mb": round(peak / 2 ** 20, 1)}
+
+
+def run_benchmark(num_abstracts, num_pmc):
+    """
+    Returns chunk counts, text size and, per representation, build time and retained/peak memory.
+    """
+    pubmed = make_articles(num_abstracts)
+    pmc = make_pmc_articles(num_pmc)
+
+    documents, documents_stats = _measure(lambda: prepare_pubmed_documents(pubmed) + prepare_pmc_documents(pmc))
+    text_mb = sum(len(doc.page_content.encode("utf-8")) for doc in documents) / 2 ** 20
+    num_chunks = len(documents)
+    expected = [(doc.page_content, doc.metadata) for doc in documents[::97]]
+    del documents
+
+    chunks, chunk_store_stats = _measure(lambda: prepare_chunk_store(pubmed, pmc))
+    sample = [(doc.page_content, doc.metadata) for doc in chunks.documents(range(0, len(chunks), 97))]
+
+    return {
+        "num_chunks": num_chunks,
+        "text_mb": round(text_mb, 1),
+        "documents": documents_stats,
+        "chunk_store": chunk_store_stats,
+        "same_chunks": len(chunks) == num_chunks and sample == expected,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ChunkStore memory against a list of Documents.")
+    parser.add_argument("--num_abstracts", type=int, default=100000)
+    parser.add_argument("--num_pmc", type=int, default=5000)
+    args = parser.parse_args()
+
+    print(json.dumps(run_benchmark(args.num_abstracts, args.num_pmc), indent=2))
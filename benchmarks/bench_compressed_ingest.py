@@ -0,0 +1,140 @@
+"""
+Compares extract-then-parse (what download_and_unzip_pubmed.py used to leave on disk: gunzipped baseline files and
+an untarred PMC folder) with parsing straight from the compressed archives, on a synthetic corpus: pubmed*.xml.gz
+files and one PMC .tar.gz package.
+
+Reports wall time, bytes read and written through system calls (rchar/wchar from /proc/self/io, Linux only), the
+disk space each approach needs, and checks that both return the same articles. Each approach runs in a fresh
+process so the I/O counters and page cache warm-up are its own.
+
+Usage:
+    python -m benchmarks.bench_compressed_ingest --num_abstracts 100000 --num_pmc 2000
+"""
+import argparse
+import contextlib
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+
+PMC_ARCHIVE = "oa_comm_xml.PMC000xxxxxx.baseline.tar.gz"
+
+
+def _io_counters():
+    try:
+        with open("/proc/self/io") as f:
+            counters = dict(line.split(": ") for line in f.read().splitlines())
+        return int(counters["rchar"]), int(counters["wchar"])
+    except OSError:
+        return None, None
+
+
+def _disk_usage(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def _fingerprint(articles_pubmed, articles_pmc):
+    digest = hashlib.sha1()
+    for article in articles_pubmed + sorted(articles_pmc, key=lambda article: article["pmcid"]):
+        digest.update(json.dumps(article, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def _run(mode, archive_dir, work_dir, queue):
+    from app.data_loader import find_source_files, parse_pubmed_files, parse_folder_pmc, parse_pmc_archives
+    from download_and_unzip_pubmed import extract_gzip, extract_tar
+
+    read_before, written_before = _io_counters()
+    start = time.perf_counter()
+    if mode == "extract_then_parse":
+        with contextlib.redirect_stdout(sys.stderr):
+            for name in sorted(os.listdir(work_dir)):
+                path = os.path.join(work_dir, name)
+                if name.endswith(".xml.gz"):
+                    extract_gzip(path, path[:-3])
+                elif name.endswith(".tar.gz"):
+                    extract_tar(path, work_dir)
+        extract_seconds = time.perf_counter() - start
+        pubmed_files, pmc_dirs, _ = find_source_files(work_dir)
+        articles_pubmed = parse_pubmed_files(pubmed_files)
+        articles_pmc = [article for folder in pmc_dirs for article in parse_folder_pmc(folder, include_body=True)]
+    else:
+        extract_seconds = 0.0
+        pubmed_files, _, pmc_archives = find_source_files(archive_dir)
+        articles_pubmed = parse_pubmed_files(pubmed_files)
+        articles_pmc = parse_pmc_archives(pmc_archives, include_body=True)
+    seconds = time.perf_counter() - start
+    read_after, written_after = _io_counters()
+
+    queue.put({
+        "seconds": round(seconds, 3),
+        "extract_seconds": round(extract_seconds, 3),
+        "read_mb": round((read_after - read_before) / 2 ** 20, 1) if read_before is not None else None,
+        "written_mb": round((written_after - written_before) / 2 ** 20, 1) if written_before is not None else None,
+        "disk_mb": round(_disk_usage(work_dir if mode == "extract_then_parse" else archive_dir) / 2 ** 20, 1),
+        "pubmed_articles": len(articles_pubmed),
+        "pmc_articles": len(articles_pmc),
+        "fingerprint": _fingerprint(articles_pubmed, articles_pmc),
+    })
+
+
+def make_archives(folder, num_abstracts, num_pmc, pubmed_files, seed=0):
+    """
+    Writes a synthetic corpus as downloaded: gzipped baseline files and a PMC .tar.gz package, in folder.
+    """
+    # The synthetic corpus reuses generators from modules that load the app configuration, which needs a key.
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    from benchmarks.synthetic_corpus import generate_corpus
+
+    with tempfile.TemporaryDirectory() as plain:
+        pubmed_paths, pmc_folder, _ = generate_corpus(plain, num_abstracts, num_pmc, pubmed_files, seed=seed)
+        for path in pubmed_paths:
+            archive_path = os.path.join(folder, os.path.basename(path) + ".gz")
+            with open(path, "rb") as f_in, gzip.open(archive_path, "wb") as f_out:
+                shutil.copyfileobj(f_in, f_out)
+        with tarfile.open(os.path.join(folder, PMC_ARCHIVE), "w:gz") as tar:
+            tar.add(pmc_folder, arcname=os.path.basename(pmc_folder))
+
+
+def run_benchmark(num_abstracts=100000, num_pmc=2000, pubmed_files=4):
+    """
+    Returns the archive size and, for each approach, time, I/O, disk usage and article counts.
+    """
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as archive_dir:
+        make_archives(archive_dir, num_abstracts, num_pmc, pubmed_files)
+        results["archives_mb"] = round(_disk_usage(archive_dir) / 2 ** 20, 1)
+        for mode in ("extract_then_parse", "stream_from_archives"):
+            with tempfile.TemporaryDirectory() as work_dir:
+                if mode == "extract_then_parse":
+                    for name in os.listdir(archive_dir):
+                        shutil.copy(os.path.join(archive_dir, name), work_dir)
+                queue = context.Queue()
+                process = context.Process(target=_run, args=(mode, archive_dir, work_dir, queue))
+                process.start()
+                results[mode] = queue.get()
+                process.join()
+
+    results["same_articles"] = (results["extract_then_parse"].pop("fingerprint")
+                                == results["stream_from_archives"].pop("fingerprint"))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare extract-then-parse with parsing compressed archives.")
+    parser.add_argument("--num_abstracts", type=int, default=100000)
+    parser.add_argument("--num_pmc", type=int, default=2000)
+    parser.add_argument("--pubmed_files", type=int, default=4)
+    args = parser.parse_args()
+
+    print(json.dumps(run_benchmark(args.num_abstracts, args.num_pmc, args.pubmed_files), indent=2))
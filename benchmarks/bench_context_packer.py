@@ -0,0 +1,106 @@
+"""
+Compares the previous fixed k=7 prompt context with MMR context packing on chunks of real PMC articles.
+
+For each query (words of a random body chunk, as in a known-item search), the candidates are the chunks nearest to
+the query under a local hash-based embedding stand-in. The baseline formats the 7 nearest; the packer picks among
+the --candidates nearest by MMR, merges adjacent chunks and fills --budget tokens. Reports prompt tokens of the
+context section (gpt-4 encoding), the prefill latency that saves at --prefill_tokens_per_sec, packing time,
+distinct articles, and redundancy (mean pairwise cosine similarity of the selected chunks).
+
+Usage:
+    python -m benchmarks.bench_context_packer data/PMC000xxxxxx --limit 500 --queries 50 --budget 1500
+"""
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+
+from app.context_packer import pack_context, context_tokens, get_prompt_encoding
+from app.data_loader import parse_folder_pmc, prepare_pmc_documents
+from benchmarks.fake_embeddings import HashEmbeddings
+
+
+def _redundancy(vectors):
+    if len(vectors) < 2:
+        return 0.0
+    vectors = np.asarray(vectors, dtype=np.float32)
+    similarities = vectors @ vectors.T
+    return float(similarities[np.triu_indices(len(vectors), k=1)].mean())
+
+
+def run_benchmark(folder, limit=None, queries=50, budget=1500, candidates=30, k=7, mmr_lambda=0.5,
+                  prefill_tokens_per_sec=2500.0, seed=0):
+    """
+    Returns mean per-query statistics of the fixed-k baseline and of the packed context.
+    """
+    documents = prepare_pmc_documents(parse_folder_pmc(folder, include_body=True, limit=limit))
+    embeddings = HashEmbeddings()
+    vectors = np.asarray(embeddings.embed_documents([doc.page_content for doc in documents]), dtype=np.float32)
+    encoding = get_prompt_encoding()
+    rng = random.Random(seed)
+    body_ids = [i for i, doc in enumerate(documents) if doc.metadata["section"] == "body"]
+
+    baseline, packed = [], []
+    for _ in range(queries):
+        words = documents[rng.choice(body_ids)].page_content.split()
+        start = rng.randrange(max(1, len(words) - 12))
+        query_vector = np.asarray(embeddings.embed_query(" ".join(words[start:start + 12])), dtype=np.float32)
+        nearest = np.argsort(-(vectors @ query_vector), kind="stable")[:max(k, candidates)]
+
+        fixed = [documents[i] for i in nearest[:k]]
+        baseline.append({
+            "tokens": context_tokens(fixed, encoding),
+            "articles": len({doc.metadata["pmcid"] for doc in fixed}),
+            "redundancy": _redundancy(vectors[nearest[:k]]),
+        })
+
+        pool = [documents[i] for i in nearest[:candidates]]
+        start_time = time.perf_counter()
+        selected = pack_context(pool, vectors[nearest[:candidates]], query_vector, budget, mmr_lambda=mmr_lambda,
+                                encoding=encoding)
+        pack_ms = (time.perf_counter() - start_time) * 1000
+        selected_vectors = embeddings.embed_documents([doc.page_content for doc in selected])
+        packed.append({
+            "tokens": context_tokens(selected, encoding),
+            "articles": len({doc.metadata["pmcid"] for doc in selected}),
+            "redundancy": _redundancy(selected_vectors),
+            "merged": sum(1 for doc in selected if "chunk_ids" in doc.metadata),
+            "pack_ms": pack_ms,
+        })
+
+    def mean(rows, field):
+        return round(float(np.mean([row[field] for row in rows])), 3)
+
+    baseline_tokens, packed_tokens = mean(baseline, "tokens"), mean(packed, "tokens")
+    return {
+        "chunks": len(documents),
+        "queries": queries,
+        "budget": budget,
+        "fixed_k": {"k": k, "tokens": baseline_tokens, "articles": mean(baseline, "articles"),
+                    "redundancy": mean(baseline, "redundancy")},
+        "packed": {"candidates": candidates, "tokens": packed_tokens,
+                   "max_tokens": max(row["tokens"] for row in packed), "articles": mean(packed, "articles"),
+                   "redundancy": mean(packed, "redundancy"), "merged_blocks": mean(packed, "merged"), "pack_ms": mean(packed, "pack_ms")},
+        "prompt_tokens_saved": round(baseline_tokens - packed_tokens, 1),
+        "prompt_tokens_saved_ratio": round(1 - packed_tokens / baseline_tokens, 4) if baseline_tokens else None,
+        "estimated_prefill_ms_saved": round((baseline_tokens - packed_tokens) / prefill_tokens_per_sec * 1000, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark MMR context packing against the fixed k=7 context.")
+    parser.add_argument("folder", help="Folder of PMC XML files")
+    parser.add_argument("--limit", type=int, default=None, help="Maximum number of PMC files to read")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--budget", type=int, default=1500, help="Context token budget")
+    parser.add_argument("--candidates", type=int, default=30)
+    parser.add_argument("--mmr_lambda", type=float, default=0.5)
+    parser.add_argument("--prefill_tokens_per_sec", type=float, default=2500.0,
+                        help="Prompt processing rate used to estimate the latency saved")
+    args = parser.parse_args()
+
+    print(json.dumps(run_benchmark(args.folder, limit=args.limit, queries=args.queries, budget=args.budget,
+                                   candidates=args.candidates, mmr_lambda=args.mmr_lambda,
+                                   prefill_tokens_per_sec=args.prefill_tokens_per_sec), indent=2))
@@ -0,0 +1,132 @@
+"""
+Compares absorbing a PubMed update file with the delta path (ingest_pubmed_updates into the corpus store, then
+update_corpus_vector_index: tombstones plus an exactly-searched delta) against a full re-parse and index rebuild,
+on a synthetic baseline and a synthetic update file that revises and deletes a share of its articles.
+
+Reports the time of each path, query latency before the update, with the delta and after compaction, the
+compaction time, and checks that no deleted article is ever returned and that revised articles are found in their
+new version.
+
+Embeddings come from the local hash-based stand-in; --embed_latency_ms models the API round-trip per request.
+
+Usage:
+    python -m benchmarks.bench_delta_ingest --num_abstracts 200000 --revised_ratio 0.01 --deleted_ratio 0.002
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from app.corpus_store import CorpusStore
+from app.data_loader import ingest_corpus, ingest_pubmed_updates, load_corpus, prepare_chunk_store, UPDATES_SUBDIR
+from app.vector_index import (build_corpus_vector_index, update_corpus_vector_index, compact_corpus_vector_index,
+                              article_key)
+from benchmarks.fake_embeddings import HashEmbeddings
+from benchmarks.synthetic_corpus import write_pubmed_baseline, write_pubmed_update
+
+
+def _full_rebuild(data_dir, db_path, index_dir, embeddings, index_type):
+    with CorpusStore(db_path) as store:
+        ingest_corpus(store, data_dir=data_dir)
+    articles, _ = load_corpus(store_path=db_path)
+    return build_corpus_vector_index(prepare_chunk_store(articles, []), embeddings, index_dir, index_type=index_type)
+
+
+def _query_latency_ms(index, queries, embeddings):
+    latencies = []
+    for query_text in queries:
+        start = time.perf_counter()
+        index.similarity_search(query_text, embeddings, k=7, candidates=50)
+        latencies.append(time.perf_counter() - start)
+    return round(float(np.percentile(latencies, 50)) * 1000, 2)
+
+
+def run_benchmark(num_abstracts=200000, pubmed_files=4, revised_ratio=0.01, deleted_ratio=0.002, num_queries=50,
+                  index_type="flat", embed_latency_ms=0.0, seed=0):
+    """
+    Returns timings of the delta and full-rebuild paths, query latencies and the correctness checks.
+    """
+    rng = random.Random(seed)
+    embeddings = HashEmbeddings(latency_ms=embed_latency_ms)
+    results = {"num_abstracts": num_abstracts, "index_type": index_type}
+    with tempfile.TemporaryDirectory() as data_dir:
+        write_pubmed_baseline(data_dir, num_abstracts, num_files=pubmed_files, seed=seed)
+        db_path = os.path.join(data_dir, "corpus.sqlite")
+        index_dir = os.path.join(data_dir, "vector_index")
+        index = _full_rebuild(data_dir, db_path, index_dir, embeddings, index_type)
+        articles, _ = load_corpus(store_path=db_path)
+
+        picked = rng.sample(articles, int(len(articles) * (revised_ratio + deleted_ratio)))
+        revised = [dict(article, abstract=f"Revised {article['abstract']}")
+                   for article in picked[:int(len(articles) * revised_ratio)]]
+        deleted = [article["pmid"] for article in picked[len(revised):]]
+        queries = [f"{article['title']}\n{article['abstract']}" for article in rng.sample(articles, num_queries)]
+        results["latency_before_ms"] = _query_latency_ms(index, queries, embeddings)
+
+        os.makedirs(os.path.join(data_dir, UPDATES_SUBDIR))
+        update_path = os.path.join(data_dir, UPDATES_SUBDIR, "pubmed25n1300.xml.gz")
+        write_pubmed_update(update_path, revised, deleted)
+
+        start = time.perf_counter()
+        with CorpusStore(db_path) as store:
+            changes = ingest_pubmed_updates(store, os.path.join(data_dir, UPDATES_SUBDIR))
+        store_seconds = time.perf_counter() - start
+        chunks = prepare_chunk_store([article for article in changes.values() if article is not None], [])
+        index = update_corpus_vector_index(index_dir, chunks, {article_key("PubMed", pmid) for pmid in changes},
+                                           embeddings, updates=[os.path.basename(update_path)])
+        results["delta"] = {
+            "revised": len(revised),
+            "deleted": len(deleted),
+            "store_seconds": round(store_seconds, 3),
+            "total_seconds": round(time.perf_counter() - start, 3),
+            "delta_ratio": round(index.delta_ratio(), 4),
+        }
+        results["latency_with_delta_ms"] = _query_latency_ms(index, queries, embeddings)
+
+        deleted_keys = {article_key("PubMed", pmid) for pmid in deleted}
+        deleted_titles = {article["pmid"]: article["title"] for article in picked[len(revised):]}
+        returned = sum(
+            article_key("PubMed", doc.metadata["pmid"]) in deleted_keys
+            for title in list(deleted_titles.values())[:num_queries]
+            for doc in index.similarity_search(title, embeddings, k=7, candidates=50)
+        )
+        found = sum(
+            "Revised" in index.similarity_search(f"{article['title']}\n{article['abstract']}", embeddings,
+                                                 k=1)[0].page_content
+            for article in revised[:num_queries]
+        )
+        results["checks"] = {"deleted_returned": returned,
+                             "revised_found": f"{found}/{min(len(revised), num_queries)}"}
+
+        start = time.perf_counter()
+        index = compact_corpus_vector_index(index_dir)
+        results["compaction_seconds"] = round(time.perf_counter() - start, 3)
+        results["latency_after_compaction_ms"] = _query_latency_ms(index, queries, embeddings)
+
+        with tempfile.TemporaryDirectory() as rebuild_dir:
+            start = time.perf_counter()
+            _full_rebuild(data_dir, os.path.join(rebuild_dir, "corpus.sqlite"), os.path.join(rebuild_dir, "index"),
+                          embeddings, index_type)
+            results["full_rebuild_seconds"] = round(time.perf_counter() - start, 3)
+    results["speedup"] = round(results["full_rebuild_seconds"] / results["delta"]["total_seconds"], 1)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark delta ingestion of PubMed update files.")
+    parser.add_argument("--num_abstracts", type=int, default=200000)
+    parser.add_argument("--pubmed_files", type=int, default=4)
+    parser.add_argument("--revised_ratio", type=float, default=0.01, help="Share of articles the update revises")
+    parser.add_argument("--deleted_ratio", type=float, default=0.002, help="Share of articles the update deletes")
+    parser.add_argument("--num_queries", type=int, default=50)
+    parser.add_argument("--index_type", choices=["flat", "ivf", "hnsw"], default="flat")
+    parser.add_argument("--embed_latency_ms", type=float, default=0.0,
+                        help="Simulated latency per embedding request")
+    args = parser.parse_args()
+
+    print(json.dumps(run_benchmark(args.num_abstracts, args.pubmed_files, args.revised_ratio, args.deleted_ratio,
+                                   args.num_queries, args.index_type, args.embed_latency_ms), indent=2))
@@ -0,0 +1,208 @@
+"""
+Measures the corpus downloader (download_and_unzip_pubmed.py) against a local HTTP server that serves fixture
+archives the way the NCBI FTP site does: a baseline index page, gzipped PubMed files with .md5 sidecars, and
+HTTP Range requests. The server models a remote link with a per-request latency and a per-connection bandwidth
+limit, and can cut each file's first transfer short (--drop_ratio) to exercise resuming.
+
+For each number of connections the fixture files are downloaded into a fresh folder; reports files/sec, MB/sec,
+bytes re-used by resumed transfers, retries, and whether every extracted file matches its fixture. A second run
+over the same folder checks that the manifest makes it skip everything.
+
+Usage:
+    python -m benchmarks.bench_downloader --files 16 --num_abstracts 2000 --latency_ms 50 --bandwidth_mbps 20
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import download_and_unzip_pubmed as downloader
+
+RANGE_RE = re.compile(r"bytes=(\d+)-(\d*)")
+
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, files, latency_ms=0.0, bandwidth_mbps=None, drop_ratio=0.0):
+        super().__init__(address, FixtureHandler)
+        self.files = files
+        self.latency_ms = latency_ms
+        self.bandwidth_mbps = bandwidth_mbps
+        self.drop_ratio = drop_ratio
+        self.dropped = set()
+        self.lock = threading.Lock()
+        self.range_requests = 0
+        self.connections = 0
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/pubmed/baseline/"
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def _send(self, status, body, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_throttled(self, data):
+        if not self.server.bandwidth_mbps:
+            self.wfile.write(data)
+            return
+        block = 64 * 1024
+        for begin in range(0, len(data), block):
+            self.wfile.write(data[begin:begin + block])
+            time.sleep(len(data[begin:begin + block]) / (self.server.bandwidth_mbps * 2 ** 20 / 8))
+
+    def do_GET(self):
+        server = self.server
+        if server.latency_ms:
+            time.sleep(server.latency_ms / 1000)
+        name = self.path.rsplit("/", 1)[-1]
+        if self.path.endswith("/"):
+            links = "".join(f'<a href="{file_name}">{file_name}</a>\n' for file_name in sorted(server.files))
+            self._send(200, f"<html><body>{links}</body></html>".encode())
+            return
+        if name.endswith(".md5") and name[:-4] in server.files:
+            digest = hashlib.md5(server.files[name[:-4]]).hexdigest()
+            self._send(200, f"MD5({name[:-4]})= {digest}\n".encode())
+            return
+        if name not in server.files:
+            self._send(404, b"Not found")
+            return
+
+        data = server.files[name]
+        start, end, status = 0, len(data) - 1, 200
+        match = RANGE_RE.match(self.headers.get("Range", ""))
+        if match:
+            with server.lock:
+                server.range_requests += 1
+            start = int(match.group(1))
+            end = min(int(match.group(2)), end) if match.group(2) else end
+            if start >= len(data):
+                self._send(416, b"", {"Content-Range": f"bytes */{len(data)}"})
+                return
+            status = 206
+
+        with server.lock:
+            drop = server.drop_ratio and name not in server.dropped and status == 200
+            if drop:
+                server.dropped.add(name)
+        self.send_response(status)
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        if drop:
+            # Cut the transfer short and close the connection, as a flaky link would.
+            self._write_throttled(data[start:start + int((end - start + 1) * server.drop_ratio)])
+            self.close_connection = True
+            return
+        self._write_throttled(data[start:end + 1])
+
+
+def make_fixture_files(num_files, num_abstracts, seed=0):
+    """
+    Gzipped synthetic PubMed baseline files, by archive name, plus the uncompressed XML of each.
+    """
+    # The synthetic corpus reuses generators from modules that load the app configuration, which needs a key.
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    from benchmarks.synthetic_corpus import write_pubmed_baseline
+
+    archives, xml = {}, {}
+    with tempfile.TemporaryDirectory() as folder:
+        for path in write_pubmed_baseline(folder, num_abstracts * num_files, num_files=num_files, seed=seed):
+            with open(path, "rb") as f:
+                data = f.read()
+            name = os.path.basename(path) + ".gz"
+            archives[name] = gzip.compress(data, compresslevel=6, mtime=0)
+            xml[name[:-3]] = data
+    return archives, xml
+
+
+def _download(server, output_dir, connections):
+    pool = downloader.ConnectionPool()
+    jobs = downloader.pubmed_jobs(pool, None, base_url=server.base_url, count=None)
+    return downloader.download_all(jobs, output_dir=output_dir, connections=connections, retries=3, backoff=0.05,
+                                   pool=pool)
+
+
+def run_benchmark(num_files=16, num_abstracts=2000, connection_levels=(1, 2, 4, 8), latency_ms=50.0,
+                  bandwidth_mbps=20.0, drop_ratio=0.5):
+    """
+    Returns the fixture size and, per connection count, download statistics and the result of the re-run.
+    """
+    archives, xml = make_fixture_files(num_files, num_abstracts)
+    results = {"files": num_files, "archive_mb": round(sum(map(len, archives.values())) / 2 ** 20, 2), "runs": []}
+    for connections in connection_levels:
+        server = FixtureServer(("127.0.0.1", 0), archives, latency_ms=latency_ms, bandwidth_mbps=bandwidth_mbps,
+                               drop_ratio=drop_ratio)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            with tempfile.TemporaryDirectory() as output_dir:
+                stats = _download(server, output_dir, connections)
+                intact = all(
+                    os.path.exists(os.path.join(output_dir, name))
+                    and open(os.path.join(output_dir, name), "rb").read() == data
+                    for name, data in xml.items()
+                )
+                rerun = _download(server, output_dir, connections)
+        finally:
+            server.shutdown()
+        results["runs"].append({
+            "connections": connections,
+            "seconds": stats["seconds"],
+            "files_per_sec": round(stats["downloaded"] / stats["seconds"], 2),
+            "mb_per_sec": round(stats["bytes"] / 2 ** 20 / stats["seconds"], 2),
+            "resumed_mb": round(stats["resumed_bytes"] / 2 ** 20, 2),
+            "range_requests": server.range_requests,
+            "retries": stats["retries"],
+            "failed": len(stats["failed"]),
+            "tcp_connections": server.connections,
+            "files_intact": intact,
+            "rerun_skipped": rerun["skipped"],
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the parallel, resumable corpus downloader.")
+    parser.add_argument("--files", type=int, default=16, help="Number of fixture baseline files")
+    parser.add_argument("--num_abstracts", type=int, default=2000, help="Articles per fixture file")
+    parser.add_argument("--connections", default="1,2,4,8", help="Comma-separated connection counts")
+    parser.add_argument("--latency_ms", type=float, default=50.0, help="Latency of each request")
+    parser.add_argument("--bandwidth_mbps", type=float, default=20.0,
+                        help="Bandwidth of each connection in Mbit/s (0 for unlimited)")
+    parser.add_argument("--drop_ratio", type=float, default=0.5,
+                        help="Share of each file sent before its first transfer is cut (0 disables)")
+    args = parser.parse_args()
+
+    print(json.dumps(run_benchmark(args.files, args.num_abstracts,
+                                   [int(level) for level in args.connections.split(",")], args.latency_ms,
+                                   args.bandwidth_mbps or None, args.drop_ratio), indent=2))
+
+
+if __name__ == "__main__":
+    main()
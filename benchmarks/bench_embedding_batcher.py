@@ -0,0 +1,70 @@
+"""
+Measures embedding throughput (chunks/sec) of BatchedOpenAIEmbeddings against the local fake OpenAI server for a
+range of in-flight limits, and checks that every run returns the same vectors.
+
+The server's per-request latency models the API round-trip; --server_max_concurrent makes it answer HTTP 429
+beyond that many concurrent requests, to exercise the retry path.
+
+Usage:
+    python -m benchmarks.bench_embedding_batcher --num_abstracts 5000 --latency_ms 200 --concurrency 1,2,4,8,16
+"""
+import argparse
+import json
+import time
+
+from app.data_loader import prepare_pubmed_documents
+from app.embedding_batcher import BatchedOpenAIEmbeddings
+from benchmarks.bench_topic_filter import make_articles
+from benchmarks.fake_openai_server import start_fake_server, fingerprint
+
+
+def run_benchmark(num_abstracts, concurrency_levels, latency_ms=200.0, max_inputs_per_request=256,
+                  server_max_concurrent=None):
+    """
+    Returns the chunk count and, per in-flight limit, elapsed time, throughput, requests and retries.
+    """
+    texts = [doc.page_content for doc in prepare_pubmed_documents(make_articles(num_abstracts))]
+    server = start_fake_server(latency_ms=latency_ms, max_concurrent=server_max_concurrent)
+    results = {"num_chunks": len(texts), "runs": []}
+    try:
+        reference = None
+        for max_in_flight in concurrency_levels:
+            embeddings = BatchedOpenAIEmbeddings(max_in_flight=max_in_flight,
+                                                 max_inputs_per_request=max_inputs_per_request,
+                                                 client_kwargs={"base_url": server.base_url})
+            start = time.perf_counter()
+            vectors = embeddings.embed_documents(texts)
+            elapsed = time.perf_counter() - start
+
+            digest = fingerprint(vectors)
+            reference = reference or digest
+            results["runs"].append({
+                "max_in_flight": max_in_flight,
+                "seconds": round(elapsed, 3),
+                "chunks_per_sec": round(len(texts) / elapsed, 1),
+                "requests": embeddings.requests,
+                "retries": embeddings.retries,
+                "same_vectors": digest == reference,
+            })
+    finally:
+        server.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched, concurrent embedding requests.")
+    parser.add_argument("--num_abstracts", type=int, default=5000)
+    parser.add_argument("--concurrency", default="1,2,4,8,16", help="Comma-separated in-flight limits")
+    parser.add_argument("--latency_ms", type=float, default=200.0, help="Fake server latency per request")
+    parser.add_argument("--max_inputs_per_request", type=int, default=256)
+    parser.add_argument("--server_max_concurrent", type=int, default=None)
+    args = parser.parse_args()
+
+    results = run_benchmark(args.num_abstracts, [int(level) for level in args.concurrency.split(",")],
+                            latency_ms=args.latency_ms, max_inputs_per_request=args.max_inputs_per_request,
+                            server_max_concurrent=args.server_max_concurrent)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
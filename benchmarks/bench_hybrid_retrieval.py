@@ -0,0 +1,123 @@
+"""
+Compares pure-vector retrieval over all topic-filtered chunks (the per-query path without a prebuilt index) with
+hybrid BM25 + vector retrieval, for several BM25 candidate-set sizes.
+
+Each query is built from words of a random target chunk plus a few unrelated "context" terms, and is filtered by
+a broad topic the target article matches. Reports, per method, recall@k of the target chunk, overlap with the
+pure-vector top k, the number of chunks embedded per query and the query latency. Embeddings come from the local
+hash-based stand-in; --embed_latency_ms models the API round-trip per 1,000-text request. Because the stand-in is
+itself bag-of-words, lexical and vector rankings agree more than they would with real embeddings.
+
+Usage:
+    python -m benchmarks.bench_hybrid_retrieval --num_abstracts 50000 --num_queries 20 --candidates 100 300 1000
+"""
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+
+from app.bm25 import BM25Index, hybrid_search
+from app.data_loader import prepare_pubmed_documents
+from app.topic_index import TopicIndex
+from benchmarks.bench_topic_filter import make_articles, VOCABULARY
+from benchmarks.fake_embeddings import HashEmbeddings
+
+
+def _percentile_ms(samples, q):
+    return round(float(np.percentile(samples, q)) * 1000, 2)
+
+
+def _vector_top_k(query_text, documents, embeddings, k):
+    vectors = np.asarray(embeddings.embed_documents([doc.page_content for doc in documents]), dtype=np.float32)
+    query = np.asarray(embeddings.embed_query(query_text), dtype=np.float32)
+    distances = ((vectors - query) ** 2).sum(axis=1)
+    return [documents[i] for i in np.argsort(distances, kind="stable")[:k]]
+
+
+def _overlap(found, expected):
+    expected = {id(doc) for doc in expected}
+    return len(expected & {id(doc) for doc in found}) / len(expected) if expected else 1.0
+
+
+def _summary(found, targets, expected, num_embedded, latencies):
+    summary = {
+        "recall_at_k": round(float(np.mean([any(doc is target for doc in docs)
+                                            for docs, target in zip(found, targets)])), 3),
+        "overlap_with_vector": round(float(np.mean([_overlap(docs, truth)
+                                                    for docs, truth in zip(found, expected)])), 3),
+        "avg_chunks_embedded": round(num_embedded / len(found), 1),
+    }
+    if latencies:
+        summary["p50_ms"] = _percentile_ms(latencies, 50)
+        summary["p95_ms"] = _percentile_ms(latencies, 95)
+    return summary
+
+
+def run_benchmark(num_abstracts, num_queries, candidate_sizes, k=7, embedding_dim=1024, embed_latency_ms=0.0,
+                  seed=0):
+    """
+    Returns, per method, recall@k of the target chunk, overlap with pure-vector retrieval, chunks embedded per
+    query and latency.
+    """
+    rng = random.Random(seed)
+    articles = make_articles(num_abstracts)
+    documents_by_article = [prepare_pubmed_documents([article]) for article in articles]
+    topic_index = TopicIndex.from_pubmed_articles(articles)
+
+    queries, targets, subsets = [], [], []
+    for _ in range(num_queries):
+        article_id = rng.randrange(len(articles))
+        target = rng.choice(documents_by_article[article_id])
+        # Titles end with one biomedical term: a broad topic, like "autoimmune diseases" after topic expansion.
+        topics = [articles[article_id]["title"].split()[-1]]
+        words = rng.sample(target.page_content.split(), k=8) + rng.sample(VOCABULARY, k=4)
+        queries.append(" ".join(words))
+        targets.append(target)
+        subsets.append([doc for i in topic_index.match(topics) for doc in documents_by_article[i]])
+
+    results = {"num_documents": sum(len(docs) for docs in documents_by_article), "num_queries": num_queries,
+               "k": k, "embed_latency_ms": embed_latency_ms,
+               "avg_filtered_chunks": round(sum(len(docs) for docs in subsets) / num_queries, 1)}
+
+    embeddings = HashEmbeddings(dim=embedding_dim, latency_ms=embed_latency_ms)
+    expected, latencies = [], []
+    for query_text, subset in zip(queries, subsets):
+        start = time.perf_counter()
+        expected.append(_vector_top_k(query_text, subset, embeddings, k))
+        latencies.append(time.perf_counter() - start)
+    results["vector"] = _summary(expected, targets, expected, embeddings.num_texts, latencies)
+
+    found = []
+    for query_text, subset in zip(queries, subsets):
+        hits = BM25Index.from_texts([doc.page_content for doc in subset]).search(query_text, n=k)
+        found.append([subset[doc_id] for doc_id, _ in hits])
+    results["bm25"] = _summary(found, targets, expected, 0, None)
+
+    for candidates in candidate_sizes:
+        embeddings = HashEmbeddings(dim=embedding_dim, latency_ms=embed_latency_ms)
+        found, latencies = [], []
+        for query_text, subset in zip(queries, subsets):
+            start = time.perf_counter()
+            found.append(hybrid_search(query_text, subset, embeddings, k=k, candidates=candidates))
+            latencies.append(time.perf_counter() - start)
+        results[f"hybrid_{candidates}"] = _summary(found, targets, expected, embeddings.num_texts, latencies)
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark hybrid BM25 + vector retrieval against pure vector.")
+    parser.add_argument("--num_abstracts", type=int, default=50000)
+    parser.add_argument("--num_queries", type=int, default=20)
+    parser.add_argument("--candidates", type=int, nargs="+", default=[100, 300, 1000])
+    parser.add_argument("--k", type=int, default=7)
+    parser.add_argument("--embedding_dim", type=int, default=1024)
+    parser.add_argument("--embed_latency_ms", type=float, default=0.0,
+                        help="Simulated latency per embedding request of up to 1,000 texts")
+    args = parser.parse_args()
+
+    print(json.dumps(run_benchmark(args.num_abstracts, args.num_queries, args.candidates, k=args.k,
+                                   embedding_dim=args.embedding_dim, embed_latency_ms=args.embed_latency_ms),
+                     indent=2))
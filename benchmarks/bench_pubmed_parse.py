@@ -0,0 +1,74 @@
+"""
+Compares the tree-based PubMed parser with the streaming iterparse parser.
+
+Each parser runs in a fresh child process so the reported peak RSS belongs to that parser alone.
+
+Usage:
+    python -m benchmarks.bench_pubmed_parse [data/pubmed25n0001.xml ...]
+"""
+import argparse
+import glob
+import json
+import multiprocessing as mp
+import os
+import resource
+import sys
+import time
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run_parser(parser_name, paths, queue):
+    from app.data_loader import parse_pubmed_file_filtered, iter_pubmed_articles
+
+    baseline_rss = _peak_rss_mb()
+    start = time.perf_counter()
+    count = 0
+    for path in paths:
+        if parser_name == "tree":
+            count += len(parse_pubmed_file_filtered(path))
+        else:
+            count += sum(1 for _ in iter_pubmed_articles(path))
+    elapsed = time.perf_counter() - start
+
+    queue.put({
+        "parser": parser_name,
+        "articles": count,
+        "seconds": round(elapsed, 3),
+        "articles_per_sec": round(count / elapsed, 1) if elapsed else None,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "peak_rss_delta_mb": round(_peak_rss_mb() - baseline_rss, 1),
+    })
+
+
+def run_benchmark(paths):
+    """
+    Runs both parsers over the given files and returns one result dict per parser.
+    """
+    ctx = mp.get_context("spawn")
+    results = []
+    for parser_name in ("tree", "iterparse"):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_run_parser, args=(parser_name, paths, queue))
+        proc.start()
+        results.append(queue.get())
+        proc.join()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark PubMed XML parsers (throughput and peak RSS).")
+    parser.add_argument("paths", nargs="*", help="PubMed XML files (defaults to data/pubmed*.xml)")
+    args = parser.parse_args()
+
+    xml_paths = args.paths or sorted(glob.glob(os.path.join("data", "pubmed*.xml")))
+    if not xml_paths:
+        raise SystemExit("No PubMed XML files found. Pass paths explicitly or run the download script.")
+
+    total_mb = sum(os.path.getsize(p) for p in xml_paths) / (1024 * 1024)
+    print(f"Parsing {len(xml_paths)} file(s), {total_mb:.1f} MB")
+    print(json.dumps(run_benchmark(xml_paths), indent=2))
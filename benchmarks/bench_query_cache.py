@@ -0,0 +1,190 @@
+"""
+Replays a synthetic stream of questions, where users ask about the same intents (aspect, drug, condition,
+population) in different wordings and roles, through the semantic query cache for a range of similarity thresholds.
+
+For each threshold (context hits from the threshold on, answer hits from threshold + --answer_gap) it reports the
+answer and context hit rates, wrong matches (a hit on a cached question with a different intent), the share of
+LLM calls saved (an answer hit saves all 4 calls, a context hit the step-back and topic-expansion calls and the
+retrieval) and the distribution of best-match similarities. It also measures lookup latency against the number of
+cached questions, with random vectors of the embedding model's dimension.
+
+Question embeddings come from the local hash-based stand-in, so absolute similarities are lower than with a real
+embedding model; the trade-off between hit rate and wrong matches is what the benchmark shows. Exact duplicates
+(after normalization) are always answer hits.
+
+With --pairs, the thresholds are instead calibrated on a labelled JSONL file of question pairs
+({"question_a": ..., "question_b": ..., "paraphrase": true/false}) embedded with the configured embedding model
+(this calls the API): for each threshold it reports how many paraphrase pairs would match and how many
+non-paraphrase pairs would wrongly match, and the highest similarity of a non-paraphrase pair, below which no
+threshold is safe.
+
+Usage:
+    python -m benchmarks.bench_query_cache --num_queries 5000 --num_intents 500
+    python -m benchmarks.bench_query_cache --pairs labelled_pairs.jsonl --thresholds 0.95 0.97 0.98 0.99
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from app.query_cache import SemanticQueryCache, query_scope
+from benchmarks.fake_embeddings import HashEmbeddings
+
+ROLES = ["pediatrician", "general practitioner", "researcher"]
+ASPECTS = ["efficacy", "safety", "long-term outcomes", "optimal dosing", "side effects"]
+DRUGS = ["etanercept", "adalimumab", "infliximab", "methotrexate", "tocilizumab", "insulin", "budesonide"]
+CONDITIONS = ["juvenile idiopathic arthritis", "uveitis", "Crohn's disease", "asthma", "type 1 diabetes"]
+POPULATIONS = ["children", "adolescents", "infants", "young adults"]
+TEMPLATES = [
+    "What is the {aspect} of {drug} for {condition} in {population}?",
+    "What is the {aspect} of {drug} in {population} with {condition}?",
+    "{drug} for {condition} in {population}: what is its {aspect}?",
+    "What do we know about the {aspect} of {drug} for {condition} in {population}?",
+    "what is the {aspect} of {drug} for {condition} in {population}",
+]
+# LLM calls of one question: step-back, topic expansion, summary and evaluation.
+LLM_CALLS = 4
+CONTEXT_HIT_SAVED_CALLS = 2
+
+
+def make_workload(num_queries, num_intents, zipf=1.1, seed=0):
+    """
+    Returns [(role, intent id, question)]: intents are drawn with Zipf-distributed popularity, each asked with a
+    random template and role.
+    """
+    rng = random.Random(seed)
+    intents = set()
+    while len(intents) < min(num_intents, len(ASPECTS) * len(DRUGS) * len(CONDITIONS) * len(POPULATIONS)):
+        intents.add((rng.choice(ASPECTS), rng.choice(DRUGS), rng.choice(CONDITIONS), rng.choice(POPULATIONS)))
+    intents = sorted(intents)
+    rng.shuffle(intents)
+    weights = [1 / (rank + 1) ** zipf for rank in range(len(intents))]
+    workload = []
+    for intent_id in rng.choices(range(len(intents)), weights=weights, k=num_queries):
+        aspect, drug, condition, population = intents[intent_id]
+        question = rng.choice(TEMPLATES).format(aspect=aspect, drug=drug, condition=condition, population=population)
+        workload.append((rng.choice(ROLES), intent_id, question))
+    return workload
+
+
+def replay(workload, vectors, threshold, answer_gap, workdir):
+    """
+    Runs the workload through a fresh cache; a miss (or context hit) caches the question with its intent and role.
+    """
+    cache = SemanticQueryCache(os.path.join(workdir, f"query_cache_{threshold}.sqlite"),
+                               answer_threshold=min(round(threshold + answer_gap, 4), 1.0),
+                               context_threshold=threshold)
+    counts = {"answer": 0, "context": 0, None: 0}
+    wrong = {"answer": 0, "context": 0}
+    saved_calls = 0
+    for (role, intent_id, question), vector in zip(workload, vectors):
+        scope = query_scope(role)
+        kind, _, result = cache.lookup(role, scope, question, vector)
+        counts[kind] += 1
+        if kind is not None:
+            wrong[kind] += result["intent"] != intent_id or result["role"] != role
+            saved_calls += LLM_CALLS if kind == "answer" else CONTEXT_HIT_SAVED_CALLS
+        if kind != "answer":
+            cache.put(scope, question, vector, {"intent": intent_id, "role": role})
+    stats = cache.stats()
+    cache.conn.close()
+    return {
+        "answer_threshold": cache.answer_threshold,
+        "answer_hit_rate": round(counts["answer"] / len(workload), 4),
+        "context_hit_rate": round(counts["context"] / len(workload), 4),
+        "wrong_answers": wrong["answer"],
+        "wrong_contexts": wrong["context"],
+        "llm_calls_saved": round(saved_calls / (LLM_CALLS * len(workload)), 4),
+        "cached_questions": stats["size"],
+        "similarity": stats["similarity"],
+    }
+
+
+def lookup_latency(sizes, dim, num_lookups, workdir, seed=0):
+    """
+    Median lookup latency (ms) in a scope holding each number of cached questions.
+    """
+    rng = np.random.default_rng(seed)
+    scope = query_scope("researcher")
+    results = {}
+    for size in sizes:
+        cache = SemanticQueryCache(os.path.join(workdir, f"latency_{size}.sqlite"), max_entries=size)
+        for vector in rng.standard_normal((size, dim), dtype=np.float32):
+            cache.put(scope, "question", vector, {})
+        latencies = []
+        for vector in rng.standard_normal((num_lookups, dim), dtype=np.float32):
+            start = time.perf_counter()
+            cache.lookup("researcher", scope, "question", vector)
+            latencies.append(time.perf_counter() - start)
+        cache.conn.close()
+        results[size] = round(float(np.percentile(latencies, 50)) * 1000, 3)
+    return results
+
+
+def calibrate(pairs_path, thresholds):
+    """
+    Matches and wrong matches of each threshold on labelled question pairs, embedded with the configured model.
+    """
+    from app.kpis import cosine_similarities
+    from app.retrieval import get_embedding_model
+
+    with open(pairs_path) as f:
+        pairs = [json.loads(line) for line in f if line.strip()]
+    embedding_model = get_embedding_model()
+    vectors_a = embedding_model.embed_documents([pair["question_a"] for pair in pairs])
+    vectors_b = embedding_model.embed_documents([pair["question_b"] for pair in pairs])
+    similarities = cosine_similarities(vectors_a, vectors_b)
+    labels = np.array([bool(pair["paraphrase"]) for pair in pairs])
+    return {
+        "pairs": len(pairs),
+        "paraphrase_pairs": int(labels.sum()),
+        "max_non_paraphrase_similarity": round(float(similarities[~labels].max()), 4) if (~labels).any() else None,
+        "thresholds": {
+            str(threshold): {"paraphrases_matched": int((similarities[labels] >= threshold).sum()),
+                             "wrong_matches": int((similarities[~labels] >= threshold).sum())}
+            for threshold in thresholds
+        },
+    }
+
+
+def run_benchmark(num_queries=5000, num_intents=500, thresholds=(0.8, 0.85, 0.9, 0.95), answer_gap=0.05,
+                  sizes=(1000, 10000, 50000), dim=1536, num_lookups=200, seed=0):
+    """
+    Returns the replay results per threshold and the lookup latency per cache size.
+    """
+    workload = make_workload(num_queries, num_intents, seed=seed)
+    vectors = HashEmbeddings().embed_documents([question for _, _, question in workload])
+    with tempfile.TemporaryDirectory() as workdir:
+        return {
+            "num_queries": num_queries,
+            "num_intents": len({intent_id for _, intent_id, _ in workload}),
+            "thresholds": {str(threshold): replay(workload, vectors, threshold, answer_gap, workdir)
+                           for threshold in thresholds},
+            "lookup_p50_ms": lookup_latency(sizes, dim, num_lookups, workdir, seed),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the semantic query cache.")
+    parser.add_argument("--num_queries", type=int, default=5000)
+    parser.add_argument("--num_intents", type=int, default=500, help="Distinct questions (before rewording)")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.8, 0.85, 0.9, 0.95],
+                        help="Context-hit similarity thresholds to replay the workload with")
+    parser.add_argument("--answer_gap", type=float, default=0.05,
+                        help="Answer-hit threshold minus the context-hit threshold")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000],
+                        help="Cache sizes to measure lookup latency at")
+    parser.add_argument("--dim", type=int, default=1536, help="Embedding dimension for the latency measurement")
+    parser.add_argument("--pairs", default=None,
+                        help="Calibrate the thresholds on this labelled JSONL of question pairs instead")
+    args = parser.parse_args()
+
+    if args.pairs:
+        print(json.dumps(calibrate(args.pairs, args.thresholds), indent=2))
+        raise SystemExit
+    print(json.dumps(run_benchmark(args.num_queries, args.num_intents, args.thresholds, args.answer_gap,
+                                   args.sizes, args.dim), indent=2))
@@ -0,0 +1,145 @@
+"""
+Load test of the HTTP serving mode (server.py) against the local fake OpenAI server, which answers both the chat
+completions and the embeddings of the pipeline with a fixed latency, over a synthetic corpus.
+
+Clients send --requests requests, --concurrency at a time, drawn from --distinct_questions questions, so that
+identical requests overlap and are coalesced. Reports requests/sec, latency percentiles of the answered requests,
+status counts (503 = rejected by admission control), the server's counters and the number of LLM calls made.
+The LLM response cache is disabled so that every computation reaches the fake backend.
+
+Usage:
+    python -m benchmarks.bench_server --requests 200 --concurrency 32 --distinct_questions 20 --chat_latency_ms 300
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+import aiohttp
+import numpy as np
+from aiohttp import web
+
+from benchmarks.fake_openai_server import start_fake_server
+
+ROLES = ["pediatrician", "general practitioner", "researcher"]
+QUESTION_TERMS = ["etanercept", "adalimumab", "infliximab", "methotrexate", "tocilizumab", "uveitis", "synovitis",
+                  "asthma", "diabetes", "colitis", "remission", "inflammation", "arthritis", "juvenile"]
+
+
+def make_questions(count, seed=0):
+    """
+    Distinct (role, question) pairs whose longer words are corpus vocabulary, so topic filtering finds articles.
+    """
+    rng = random.Random(seed)
+    questions = set()
+    while len(questions) < count:
+        first, second = rng.sample(QUESTION_TERMS, 2)
+        questions.add((rng.choice(ROLES), f"What is the efficacy of {first} for {second} in children?"))
+    return sorted(questions)
+
+
+async def _client(session, url, requests, latencies, statuses):
+    for role, question in requests:
+        start = time.perf_counter()
+        async with session.post(url, json={"role": role, "question": question}) as response:
+            await response.read()
+        statuses[response.status] = statuses.get(response.status, 0) + 1
+        if response.status == 200:
+            latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def _load_test(corpus, num_requests, concurrency, questions, server_concurrency, max_queue, seed):
+    from server import create_app, SERVICE
+
+    app = create_app(corpus, max_concurrent=server_concurrency, max_queue=max_queue)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    rng = random.Random(seed)
+    requests = [rng.choice(questions) for _ in range(num_requests)]
+    latencies, statuses = [], {}
+    try:
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+            start = time.perf_counter()
+            await asyncio.gather(*[
+                _client(session, f"http://127.0.0.1:{port}/summarize", requests[i::concurrency], latencies, statuses)
+                for i in range(concurrency)
+            ])
+            elapsed = time.perf_counter() - start
+    finally:
+        await runner.cleanup()
+    return elapsed, latencies, statuses, app[SERVICE].stats()
+
+
+def run_benchmark(num_requests=200, concurrency=32, distinct_questions=20, num_abstracts=20000,
+                  chat_latency_ms=300.0, embedding_latency_ms=50.0, server_concurrency=4, max_queue=32, seed=0):
+    """
+    Returns throughput, latency percentiles, status counts and server/backend counters of one load test.
+    """
+    backend = start_fake_server(latency_ms=embedding_latency_ms, chat_latency_ms=chat_latency_ms)
+    workdir = tempfile.TemporaryDirectory()
+    # The configuration (API base URL, caches) is read when the app modules are first imported, so they are
+    # imported only now.
+    os.environ.update({
+        "OPENAI_BASE_URL": backend.base_url,
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY") or "fake",
+        "LLM_CACHE_PATH": "",
+        "QUERY_CACHE_PATH": "",
+        "EMBEDDING_CACHE_DIR": os.path.join(workdir.name, "embedding_cache"),
+        "VECTOR_INDEX_DIR": os.path.join(workdir.name, "vector_index"),
+    })
+    from app.data_loader import index_corpus
+    from benchmarks.bench_topic_filter import make_articles
+
+    try:
+        corpus = index_corpus(make_articles(num_abstracts, seed=seed), [])
+        elapsed, latencies, statuses, service_stats = asyncio.run(_load_test(
+            corpus, num_requests, concurrency, make_questions(distinct_questions, seed), server_concurrency,
+            max_queue, seed
+        ))
+    finally:
+        backend.shutdown()
+        workdir.cleanup()
+
+    latencies = np.asarray(latencies or [0.0])
+    return {
+        "requests": num_requests,
+        "concurrency": concurrency,
+        "distinct_questions": distinct_questions,
+        "seconds": round(elapsed, 2),
+        "requests_per_sec": round(num_requests / elapsed, 2),
+        "answered_per_sec": round(statuses.get(200, 0) / elapsed, 2),
+        "latency_ms": {f"p{q}": round(float(np.percentile(latencies, q)), 1) for q in (50, 95, 99)},
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "server": service_stats,
+        "llm_calls": backend.chat_requests,
+        "embedding_requests": backend.requests,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the HTTP serving mode against a fake LLM backend.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent clients")
+    parser.add_argument("--distinct_questions", type=int, default=20)
+    parser.add_argument("--num_abstracts", type=int, default=20000, help="Size of the synthetic corpus")
+    parser.add_argument("--chat_latency_ms", type=float, default=300.0, help="Fake latency of each LLM call")
+    parser.add_argument("--embedding_latency_ms", type=float, default=50.0,
+                        help="Fake latency of each embeddings request")
+    parser.add_argument("--server_concurrency", type=int, default=4, help="Summaries computed concurrently")
+    parser.add_argument("--max_queue", type=int, default=32, help="Distinct requests allowed to wait for a slot")
+    args = parser.parse_args()
+
+    print(json.dumps(run_benchmark(args.requests, args.concurrency, args.distinct_questions, args.num_abstracts,
+                                   args.chat_latency_ms, args.embedding_latency_ms, args.server_concurrency,
+                                   args.max_queue), indent=2))
+
+
+if __name__ == "__main__":
+    main()
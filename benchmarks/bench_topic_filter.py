@@ -0,0 +1,90 @@
+"""
+Compares the brute-force topic filters with the precomputed TopicIndex on a synthetic corpus.
+
+Usage:
+    python -m benchmarks.bench_topic_filter --num_abstracts 1000000
+"""
+import argparse
+import json
+import random
+import time
+
+from app.data_loader import filter_pubmed_articles_by_topics
+from app.topic_index import TopicIndex
+
+VOCABULARY = [
+    "patients", "treatment", "therapy", "juvenile", "idiopathic", "arthritis", "rheumatoid", "psoriatic",
+    "etanercept", "adalimumab", "infliximab", "methotrexate", "tocilizumab", "biologic", "inflammation",
+    "autoimmune", "disease", "children", "adolescents", "efficacy", "safety", "randomized", "trial", "cohort",
+    "outcomes", "remission", "synovitis", "uveitis", "cytokine", "interleukin", "tumor", "necrosis", "factor",
+    "inhibitor", "crohn's", "colitis", "asthma", "airway", "respiratory", "diabetes", "insulin", "cardiac",
+    "we", "the", "of", "and", "in", "with", "was", "were", "results", "methods", "conclusion", "background",
+]
+MESH_TERMS = [
+    "Arthritis, Juvenile", "Arthritis, Rheumatoid", "Antirheumatic Agents", "Tumor Necrosis Factor Inhibitors",
+    "Crohn Disease", "Asthma", "Diabetes Mellitus, Type 1", "Child", "Humans", "Treatment Outcome",
+]
+TOPICS = [
+    "juvenile idiopathic arthritis", "etanercept", "adalimumab", "biologic therapies", "autoimmune diseases",
+    "inflammatory arthritis", "rheumatic diseases", "pediatric rheumatology", "TNF inhibitors", "methotrexate",
+    "Crohn's disease", "uveitis", "connective tissue diseases", "immunosuppressive agents", "musculoskeletal",
+]
+
+
+def make_articles(num_abstracts, words_per_abstract=180, seed=0):
+    """
+    Generates synthetic PubMed-style article dicts: mostly filler words, with biomedical terms sprinkled in rarely
+    enough that topics are selective.
+    """
+    rng = random.Random(seed)
+    syllables = ["ab", "ca", "de", "fi", "go", "hu", "ki", "lo", "mi", "no", "pa", "qu", "ra", "si", "tu", "ve"]
+    filler = ["".join(rng.choices(syllables, k=rng.randint(2, 4))) for _ in range(20000)]
+
+    articles = []
+    for i in range(num_abstracts):
+        words = rng.choices(filler, k=words_per_abstract)
+        for position in rng.sample(range(words_per_abstract), k=rng.randint(0, 3)):
+            words[position] = rng.choice(VOCABULARY)
+        articles.append({
+            "pmid": str(i),
+            "title": " ".join(rng.choices(filler, k=10) + [rng.choice(VOCABULARY)]).capitalize(),
+            "abstract": " ".join(words),
+            "mesh_terms": rng.sample(MESH_TERMS, k=2) if i % 10 == 0 else None,
+            "publication_year": 2000 + i % 25,
+        })
+    return articles
+
+
+def run_benchmark(num_abstracts, topics=TOPICS, skip_brute_force=False):
+    """
+    Times the brute-force filter, the index build and an index query over the same articles.
+    """
+    articles = make_articles(num_abstracts)
+    result = {"num_abstracts": num_abstracts, "num_topics": len(topics)}
+
+    start = time.perf_counter()
+    index = TopicIndex.from_pubmed_articles(articles)
+    result["index_build_seconds"] = round(time.perf_counter() - start, 3)
+
+    start = time.perf_counter()
+    indexed = index.filter(articles, topics)
+    result["index_query_seconds"] = round(time.perf_counter() - start, 4)
+    result["matched"] = len(indexed)
+
+    if not skip_brute_force:
+        start = time.perf_counter()
+        brute_force = filter_pubmed_articles_by_topics(articles, topics)
+        result["brute_force_seconds"] = round(time.perf_counter() - start, 3)
+        result["identical"] = [a["pmid"] for a in brute_force] == [a["pmid"] for a in indexed]
+        result["query_speedup"] = round(result["brute_force_seconds"] / max(result["index_query_seconds"], 1e-9), 1)
+
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark topic filtering (brute force vs. TopicIndex).")
+    parser.add_argument("--num_abstracts", type=int, default=1_000_000)
+    parser.add_argument("--skip_brute_force", action="store_true", help="Only time the index")
+    args = parser.parse_args()
+
+    print(json.dumps(run_benchmark(args.num_abstracts, skip_brute_force=args.skip_brute_force), indent=2))
@@ -0,0 +1,101 @@
+"""
+Compares the per-query FAISS path (embed the topic-filtered documents, build, search, discard) with a prebuilt
+corpus index loaded once and searched with ID-selector filters, for flat, IVF and HNSW indexes.
+
+Embeddings come from a local hash-based stand-in; pass --embed_latency_ms to model the API round-trip per
+1,000-text request that the per-query path pays on every question.
+
+Usage:
+    python -m benchmarks.bench_vector_index --num_abstracts 50000 --num_queries 20
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+from app.data_loader import prepare_pubmed_documents
+from app.topic_index import TopicIndex
+from app.vector_index import build_corpus_vector_index, load_corpus_vector_index, filtered_article_keys
+from benchmarks.bench_topic_filter import make_articles, VOCABULARY
+from benchmarks.fake_embeddings import HashEmbeddings
+
+
+def _percentile_ms(samples, q):
+    return round(float(np.percentile(samples, q)) * 1000, 2)
+
+
+def run_benchmark(num_abstracts, num_queries, index_types, embed_latency_ms=0.0, seed=0):
+    """
+    Returns build/load/query timings for each index type and per-query latency of the rebuild path.
+    """
+    rng = random.Random(seed)
+    articles = make_articles(num_abstracts)
+    documents = prepare_pubmed_documents(articles)
+    topic_index = TopicIndex.from_pubmed_articles(articles)
+    queries = []
+    for _ in range(num_queries):
+        topics = rng.sample(VOCABULARY[:42], k=2)
+        queries.append((" ".join(rng.sample(VOCABULARY, k=6)), topics))
+
+    results = {"num_documents": len(documents), "num_queries": num_queries, "embed_latency_ms": embed_latency_ms}
+
+    embeddings = HashEmbeddings(latency_ms=embed_latency_ms)
+    latencies = []
+    embedded = 0
+    for query_text, topics in queries:
+        start = time.perf_counter()
+        subset = [documents[i] for i in topic_index.match(topics)]
+        embedded += len(subset)
+        vectorstore = FAISS.from_documents(subset, embeddings)
+        vectorstore.similarity_search(query_text, k=7)
+        latencies.append(time.perf_counter() - start)
+    results["per_query_rebuild"] = {
+        "p50_ms": _percentile_ms(latencies, 50),
+        "p95_ms": _percentile_ms(latencies, 95),
+        "avg_documents_embedded": round(embedded / num_queries, 1),
+    }
+
+    for index_type in index_types:
+        with tempfile.TemporaryDirectory() as index_dir:
+            start = time.perf_counter()
+            build_corpus_vector_index(documents, HashEmbeddings(latency_ms=embed_latency_ms), index_dir,
+                                      index_type=index_type)
+            build_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            index = load_corpus_vector_index(index_dir)
+            load_seconds = time.perf_counter() - start
+
+            embeddings = HashEmbeddings(latency_ms=embed_latency_ms)
+            latencies = []
+            for query_text, topics in queries:
+                start = time.perf_counter()
+                keys = filtered_article_keys([articles[i] for i in topic_index.match(topics)], [])
+                index.similarity_search(query_text, embeddings, k=7, article_keys=keys)
+                latencies.append(time.perf_counter() - start)
+
+        results[index_type] = {
+            "build_seconds": round(build_seconds, 3),
+            "load_seconds": round(load_seconds, 4),
+            "p50_ms": _percentile_ms(latencies, 50),
+            "p95_ms": _percentile_ms(latencies, 95),
+        }
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark persisted corpus FAISS index vs. per-query rebuild.")
+    parser.add_argument("--num_abstracts", type=int, default=50000)
+    parser.add_argument("--num_queries", type=int, default=20)
+    parser.add_argument("--index_types", nargs="+", default=["flat", "ivf", "hnsw"])
+    parser.add_argument("--embed_latency_ms", type=float, default=0.0,
+                        help="Simulated latency per embedding request of up to 1,000 texts")
+    args = parser.parse_args()
+
+    print(json.dumps(run_benchmark(args.num_abstracts, args.num_queries, args.index_types,
+                                   embed_latency_ms=args.embed_latency_ms), indent=2))
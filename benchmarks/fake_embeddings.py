@@ -0,0 +1,39 @@
+"""
+Deterministic offline stand-in for OpenAI embeddings used by the benchmarks.
+"""
+import hashlib
+import re
+import time
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+WORD_RE = re.compile(r"\w+")
+
+
+class HashEmbeddings(Embeddings):
+    """
+    Bag-of-words vectors hashed into `dim` buckets and L2-normalized, so similar texts get similar vectors.
+    An optional latency per request (of up to `batch_size` texts) imitates a remote embedding API.
+    """
+
+    def __init__(self, dim=256, latency_ms=0.0, batch_size=1000):
+        self.dim = dim
+        self.latency_ms = latency_ms
+        self.batch_size = batch_size
+        self.num_texts = 0
+
+    def _embed(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in WORD_RE.findall(text.lower()):
+            vector[int(hashlib.md5(word.encode("utf-8")).hexdigest()[:8], 16) % self.dim] += 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_documents(self, texts):
+        self.num_texts += len(texts)
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000 * -(-len(texts) // self.batch_size))
+        return [self._embed(text).tolist() for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
@@ -0,0 +1,238 @@
+"""
+Local stand-in for the OpenAI HTTP API used by the benchmarks, built on the standard library only.
+
+Serves POST /v1/embeddings with deterministic vectors for string or token-array inputs, and POST
+/v1/chat/completions with canned answers in the formats the pipeline parses (step-back topics, expanded topics, a
+summary citing the articles of the prompt, an evaluation report), streamed as server-sent events when requested.
+Latency per request is configurable separately for embeddings and chat, with optional rate limiting of embeddings
+(HTTP 429 with Retry-After) once more than `max_concurrent` requests are in flight.
+
+Usage:
+    python -m benchmarks.fake_openai_server --port 8765 --latency_ms 50
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 python main.py ...
+"""
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import numpy as np
+
+from benchmarks.fake_embeddings import HashEmbeddings
+
+
+def _token_vector(tokens, dim):
+    vector = np.zeros(dim, dtype=np.float32)
+    np.add.at(vector, np.asarray(tokens, dtype=np.int64) % dim, 1.0)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+EVALUATION_CRITERIA = ["relevance_to_question", "clarity_and_structure", "faithfulness_to_source",
+                       "citation_accuracy", "role_awareness"]
+WORD_RE = re.compile(r"[a-z][a-z-]{4,}")
+
+
+def chat_reply(messages):
+    """
+    Deterministic answer to a chat completion request, shaped like what the pipeline expects at each call site.
+    """
+    prompt = messages[-1]["content"]
+    if "Step-Back Summary:" in prompt:
+        question = prompt.rsplit("User Question:", 1)[-1].split("Step-Back Summary:", 1)[0]
+        topics = list(dict.fromkeys(WORD_RE.findall(question.lower())))[:6]
+        return f"Step-Back Summary: This question concerns {', '.join(topics)}.\nTopics: {json.dumps(topics)}"
+    if "valid Python list of strings" in prompt:
+        return json.dumps(["clinical medicine", "disease management"])
+    if any(message["role"] == "system" and "evaluator" in message["content"] for message in messages):
+        return json.dumps({name: {"score": 4, "reason": "Adequate."} for name in EVALUATION_CRITERIA})
+    citations = list(dict.fromkeys(re.findall(r"\[(PM(?:C|ID)\d+)\]", prompt)))[:3]
+    return "Treatment options are summarized in the retrieved articles " + " ".join(f"[{c}]" for c in citations)
+
+
+def chat_usage(messages, content):
+    """
+    Token usage of a chat completion, approximated by whitespace-separated words.
+    """
+    prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in messages)
+    completion_tokens = len(content.split())
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, dim=256, latency_ms=0.0, max_concurrent=None, retry_after=0.05,
+                 chat_latency_ms=0.0):
+        super().__init__(address, FakeOpenAIHandler)
+        self.embeddings = HashEmbeddings(dim=dim)
+        self.dim = dim
+        self.latency_ms = latency_ms
+        self.chat_latency_ms = chat_latency_ms
+        self.max_concurrent = max_concurrent
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.requests = 0
+        self.chat_requests = 0
+        self.rate_limited = 0
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def embed(self, inputs):
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        return [
+            self.embeddings._embed(item) if isinstance(item, str) else _token_vector(item, self.dim)
+            for item in inputs
+        ]
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path.endswith("/chat/completions"):
+            self._chat_completion(request)
+            return
+        if not self.path.endswith("/embeddings"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+            return
+
+        with server.lock:
+            if server.max_concurrent is not None and server.in_flight >= server.max_concurrent:
+                server.rate_limited += 1
+                limited = True
+            else:
+                server.in_flight += 1
+                server.requests += 1
+                limited = False
+        if limited:
+            self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+                            headers={"Retry-After": str(server.retry_after)})
+            return
+
+        try:
+            if server.latency_ms:
+                time.sleep(server.latency_ms / 1000)
+            vectors = server.embed(request.get("input", []))
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+        self._send_json(200, {
+            "object": "list",
+            "model": request.get("model"),
+            "data": [{"object": "embedding", "index": i, "embedding": vector.tolist()}
+                     for i, vector in enumerate(vectors)],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        })
+
+    def _chat_completion(self, request):
+        server = self.server
+        with server.lock:
+            server.chat_requests += 1
+        content = chat_reply(request.get("messages", []))
+        if request.get("stream"):
+            self._stream_chat_completion(request, content)
+            return
+        if server.chat_latency_ms:
+            time.sleep(server.chat_latency_ms / 1000)
+        self._send_json(200, {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                         "finish_reason": "stop"}],
+            "usage": chat_usage(request.get("messages", []), content),
+        })
+
+    def _stream_chat_completion(self, request, content):
+        """
+        Sends content as server-sent events, one word per chunk, spreading the chat latency evenly over the words.
+        With stream_options.include_usage, a last chunk without choices carries the token usage, as OpenAI does.
+        """
+        pieces = re.findall(r"\S+\s*", content) or [content]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for piece in pieces:
+            if self.server.chat_latency_ms:
+                time.sleep(self.server.chat_latency_ms / 1000 / len(pieces))
+            self._send_event({"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                              "model": request.get("model"),
+                              "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]})
+        self._send_event({"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                          "model": request.get("model"),
+                          "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if (request.get("stream_options") or {}).get("include_usage"):
+            self._send_event({"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                              "model": request.get("model"), "choices": [],
+                              "usage": chat_usage(request.get("messages", []), content)})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _send_event(self, payload):
+        self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+
+def start_fake_server(host="127.0.0.1", port=0, **kwargs):
+    """
+    Starts a FakeOpenAIServer on a background thread and returns it; call server.shutdown() when done.
+    """
+    server = FakeOpenAIServer((host, port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def fingerprint(vectors):
+    """
+    Short digest of a list of vectors, handy for checking that two runs returned the same embeddings.
+    """
+    return hashlib.sha256(np.asarray(vectors, dtype=np.float32).tobytes()).hexdigest()[:16]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local fake OpenAI API server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--latency_ms", type=float, default=0.0, help="Latency of each embeddings request")
+    parser.add_argument("--chat_latency_ms", type=float, default=0.0, help="Latency of each chat completion")
+    parser.add_argument("--max_concurrent", type=int, default=None,
+                        help="Answer HTTP 429 once this many requests are in flight")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer((args.host, args.port), dim=args.dim, latency_ms=args.latency_ms,
+                              max_concurrent=args.max_concurrent, chat_latency_ms=args.chat_latency_ms)
+    print(f"Serving fake OpenAI API at {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""
+Offline benchmark suite: runs every stage of the pipeline on a synthetic XML corpus against the local fake OpenAI
+server, and saves the results as a JSON baseline that later runs (e.g. on another commit) are compared with.
+
+Stages and their headline metrics:
+- parse: PubMed baseline files (streaming parser) and the PMC folder with bodies, articles/sec and MB/sec;
+- filter: topic index build, then brute-force and indexed topic filtering, ms per topic set;
+- chunk: prepare_chunk_store over all parsed articles, chunks/sec;
+- embed: BatchedOpenAIEmbeddings against the fake server (--embedding_latency_ms per request), chunks/sec;
+- index: build_corpus_vector_index from the embedded vectors (FAISS, chunk table, BM25), seconds;
+- search: similarity_search on the built index, hybrid and vector-only, latency percentiles;
+- end_to_end: main.generate_summary over distinct questions (--chat_latency_ms per LLM call, LLM response cache
+  disabled, fresh embedding cache), questions/sec and latency percentiles.
+
+Timed stages other than embed and end_to_end take the best of --repeat runs. Metrics ending in _per_sec are better
+when higher, those ending in _ms or _seconds when lower; --compare flags each that is worse than the baseline by
+more than --tolerance and exits with status 1 if any is.
+
+Usage:
+    python -m benchmarks.suite --num_abstracts 20000 --num_pmc 500 --output benchmarks/baselines/main.json
+    python -m benchmarks.suite --num_abstracts 20000 --num_pmc 500 --compare benchmarks/baselines/main.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from benchmarks.bench_server import make_questions
+from benchmarks.fake_openai_server import start_fake_server
+
+BASELINE_DIR = os.path.join("benchmarks", "baselines")
+STAGES = ["parse", "filter", "chunk", "embed", "index", "search", "end_to_end"]
+
+
+class VectorLookup(Embeddings):
+    """
+    Serves vectors computed earlier, so that index build and search are timed without embedding requests.
+    """
+
+    def __init__(self, texts, vectors):
+        self.vectors = dict(zip(texts, vectors))
+
+    def embed_documents(self, texts):
+        return [self.vectors[text] for text in texts]
+
+    def embed_query(self, text):
+        return self.vectors[text]
+
+
+def _dir_size(path):
+    """
+    Total size in bytes of the files under path.
+    """
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def _best_of(repeat, fn):
+    """
+    Runs fn() `repeat` times and returns its last result with the shortest run time in seconds.
+    """
+    best = None
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def _percentiles_ms(seconds):
+    return {f"p{q}_ms": round(float(np.percentile(seconds, q)) * 1000, 2) for q in (50, 95)}
+
+
+def _topic_sets(topics, count, seed):
+    rng = random.Random(seed)
+    return [rng.sample(topics, k=5) for _ in range(count)]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(num_abstracts=20000, num_pmc=500, pubmed_files=2, queries=20, questions=10, repeat=3,
+              embedding_latency_ms=20.0, chat_latency_ms=100.0, index_type="flat", stages=None, seed=0):
+    """
+    Runs the benchmark stages (all by default, or the names in `stages` plus the stages they depend on) and returns
+    {"environment", "parameters", "stages"}.
+    """
+    stages = set(stages or STAGES)
+    parameters = dict(locals(), stages=sorted(stages))
+    backend = start_fake_server(latency_ms=embedding_latency_ms, chat_latency_ms=chat_latency_ms)
+    workdir = tempfile.TemporaryDirectory()
+    index_dir = os.path.join(workdir.name, "vector_index")
+    # The configuration (API base URL, caches, index location) is read when the app modules are first imported,
+    # so they, and the benchmark modules importing them, are imported only now.
+    os.environ.update({
+        "OPENAI_BASE_URL": backend.base_url,
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY") or "fake",
+        "LLM_CACHE_PATH": "",
+        "QUERY_CACHE_PATH": "",
+        "EMBEDDING_CACHE_DIR": os.path.join(workdir.name, "embedding_cache"),
+        "VECTOR_INDEX_DIR": index_dir,
+    })
+    from app.data_loader import (parse_pubmed_files, parse_folder_pmc, filter_pubmed_articles_by_topics,
+                                 filter_pmc_articles_by_topics, index_corpus, filter_corpus_by_topics,
+                                 prepare_chunk_store)
+    from app.embedding_batcher import BatchedOpenAIEmbeddings
+    from app.vector_index import build_corpus_vector_index, index_files_dir
+    from benchmarks.bench_topic_filter import TOPICS
+    from benchmarks.synthetic_corpus import generate_corpus
+
+    results = {}
+    try:
+        data_dir = os.path.join(workdir.name, "data")
+        pubmed_paths, pmc_folder, size_mb = generate_corpus(data_dir, num_abstracts, num_pmc, pubmed_files,
+                                                            seed=seed)
+        pubmed_mb = sum(os.path.getsize(path) for path in pubmed_paths) / 2 ** 20
+
+        articles_pubmed, pubmed_seconds = _best_of(repeat, lambda: parse_pubmed_files(pubmed_paths))
+        articles_pmc, pmc_seconds = _best_of(repeat, lambda: parse_folder_pmc(pmc_folder, include_body=True))
+        if "parse" in stages:
+            results["parse"] = {
+                "corpus_mb": round(size_mb, 1),
+                "pubmed_articles": len(articles_pubmed),
+                "pubmed_articles_per_sec": round(len(articles_pubmed) / pubmed_seconds, 1),
+                "pubmed_mb_per_sec": round(pubmed_mb / pubmed_seconds, 2),
+                "pmc_articles": len(articles_pmc),
+                "pmc_articles_per_sec": round(len(articles_pmc) / pmc_seconds, 1),
+                "pmc_mb_per_sec": round((size_mb - pubmed_mb) / pmc_seconds, 2),
+            }
+
+        corpus, index_seconds = _best_of(repeat, lambda: index_corpus(articles_pubmed, articles_pmc))
+        topic_sets = _topic_sets(TOPICS, queries, seed)
+        if "filter" in stages:
+            _, brute_seconds = _best_of(repeat, lambda: [
+                (filter_pubmed_articles_by_topics(articles_pubmed, topics),
+                 filter_pmc_articles_by_topics(articles_pmc, topics)) for topics in topic_sets
+            ])
+            matched, indexed_seconds = _best_of(repeat, lambda: [
+                filter_corpus_by_topics(corpus, topics) for topics in topic_sets
+            ])
+            results["filter"] = {
+                "topic_sets": len(topic_sets),
+                "avg_matched": round(float(np.mean([len(a) + len(b) for a, b in matched])), 1),
+                "topic_index_build_seconds": round(index_seconds, 3),
+                "brute_force_ms": round(brute_seconds / len(topic_sets) * 1000, 2),
+                "topic_index_ms": round(indexed_seconds / len(topic_sets) * 1000, 3),
+            }
+
+        if stages & {"chunk", "embed", "index", "search", "end_to_end"}:
+            chunks, chunk_seconds = _best_of(repeat, lambda: prepare_chunk_store(articles_pubmed, articles_pmc))
+            results["chunk"] = {
+                "chunks": len(chunks),
+                "chunks_per_sec": round(len(chunks) / chunk_seconds, 1),
+            }
+
+        if stages & {"embed", "index", "search", "end_to_end"}:
+            embeddings = BatchedOpenAIEmbeddings(client_kwargs={"base_url": backend.base_url})
+            query_texts = [f"{question} {' '.join(topics)}" for (_, question), topics
+                           in zip(make_questions(queries, seed), topic_sets)]
+            texts = chunks.texts()
+            start = time.perf_counter()
+            vectors = embeddings.embed_documents(list(texts))
+            embed_seconds = time.perf_counter() - start
+            results["embed"] = {
+                "chunks": len(texts),
+                "requests": embeddings.requests,
+                "tokens": embeddings.tokens,
+                "chunks_per_sec": round(len(texts) / embed_seconds, 1),
+            }
+            query_vectors = embeddings.embed_documents(query_texts)
+            lookup = VectorLookup(list(texts) + query_texts, list(vectors) + list(query_vectors))
+
+        if stages & {"index", "search", "end_to_end"}:
+            vector_index, build_seconds = _best_of(repeat, lambda: build_corpus_vector_index(
+                chunks, lookup, index_dir, index_type=index_type
+            ))
+            results["index"] = {
+                "index_type": index_type,
+                "vectors": len(vector_index),
+                "build_seconds": round(build_seconds, 3),
+                "index_mb": round(_dir_size(index_files_dir(index_dir)) / 2 ** 20, 1),
+            }
+
+        if "search" in stages:
+            results["search"] = {"queries": len(query_texts)}
+            for name, candidates in (("hybrid", 300), ("vector", 0)):
+                latencies = []
+                for query_text in query_texts:
+                    start = time.perf_counter()
+                    vector_index.similarity_search(query_text, lookup, k=7, candidates=candidates)
+                    latencies.append(time.perf_counter() - start)
+                results["search"][name] = {
+                    "queries_per_sec": round(len(latencies) / sum(latencies), 1),
+                    **_percentiles_ms(latencies),
+                }
+
+        if "end_to_end" in stages:
+            from main import generate_summary
+
+            chat_before, latencies = backend.chat_requests, []
+            start = time.perf_counter()
+            for role, question in make_questions(questions, seed):
+                question_start = time.perf_counter()
+                generate_summary(role, question, corpus=corpus)
+                latencies.append(time.perf_counter() - question_start)
+            elapsed = time.perf_counter() - start
+            results["end_to_end"] = {
+                "questions": len(latencies),
+                "questions_per_sec": round(len(latencies) / elapsed, 3),
+                **_percentiles_ms(latencies),
+                "llm_calls": backend.chat_requests - chat_before,
+            }
+    finally:
+        backend.shutdown()
+        workdir.cleanup()
+
+    return {
+        "environment": {
+            "commit": git_commit(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "parameters": parameters,
+        "stages": results,
+    }
+
+
+def _flatten(metrics, prefix=""):
+    flat = {}
+    for key, value in metrics.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def _direction(metric):
+    """
+    1 when a higher value is better, -1 when a lower one is, 0 for metrics that are not compared (counts, sizes).
+    """
+    if metric.endswith("_per_sec"):
+        return 1
+    if metric.endswith(("_ms", "_seconds")):
+        return -1
+    return 0
+
+
+def compare(results, baseline, tolerance=0.1):
+    """
+    Compares the timed metrics of two suite results. Returns one row per metric present in both, with the relative
+    change (positive = better) and whether it is a regression beyond the tolerance.
+    """
+    current, previous = _flatten(results["stages"]), _flatten(baseline["stages"])
+    rows = []
+    for metric, value in current.items():
+        direction = _direction(metric)
+        if not direction or metric not in previous or not previous[metric]:
+            continue
+        change = direction * (value - previous[metric]) / previous[metric]
+        rows.append({"metric": metric, "baseline": previous[metric], "current": value,
+                     "change": round(change, 4), "regression": change < -tolerance})
+    return rows
+
+
+def format_comparison(rows, tolerance):
+    lines = [f"{'metric':<40}{'baseline':>12}{'current':>12}{'change':>9}"]
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        lines.append(f"{row['metric']:<40}{row['baseline']:>12g}{row['current']:>12g}{row['change']:>+9.1%}{flag}")
+    regressions = sum(row["regression"] for row in rows)
+    lines.append(f"{regressions} of {len(rows)} metrics regressed by more than {tolerance:.0%}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite and save or compare a baseline.")
+    parser.add_argument("--num_abstracts", type=int, default=20000, help="PubMed articles in the synthetic corpus")
+    parser.add_argument("--num_pmc", type=int, default=500, help="PMC full-text articles in the synthetic corpus")
+    parser.add_argument("--pubmed_files", type=int, default=2)
+    parser.add_argument("--queries", type=int, default=20, help="Topic sets and search queries")
+    parser.add_argument("--questions", type=int, default=10, help="Questions answered end to end")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per timed stage (the best is kept)")
+    parser.add_argument("--embedding_latency_ms", type=float, default=20.0, help="Fake embeddings request latency")
+    parser.add_argument("--chat_latency_ms", type=float, default=100.0, help="Fake LLM call latency")
+    parser.add_argument("--index_type", choices=["flat", "ivf", "hnsw"], default="flat")
+    parser.add_argument("--stages", nargs="+", default=None,
+                        choices=STAGES,
+                        help="Stages to report (default: all)")
+    parser.add_argument("--output", default=None,
+                        help=f"Where to save the results (default: {BASELINE_DIR}/<commit>.json)")
+    parser.add_argument("--compare", default=None, help="Baseline JSON file to compare the results with")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Relative slowdown tolerated before a metric counts as a regression")
+    args = parser.parse_args()
+
+    results = run_suite(args.num_abstracts, args.num_pmc, args.pubmed_files, args.queries, args.questions,
+                        args.repeat, args.embedding_latency_ms, args.chat_latency_ms, args.index_type, args.stages)
+    output = args.output or os.path.join(BASELINE_DIR, f"{results['environment']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results["stages"], indent=2))
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        differing = {key: value for key, value in baseline["parameters"].items()
+                     if key != "stages" and results["parameters"].get(key) != value}
+        if differing:
+            print(f"\nWarning: the baseline was run with different parameters: {differing}")
+        rows = compare(results, baseline, args.tolerance)
+        print()
+        print(format_comparison(rows, args.tolerance))
+        if any(row["regression"] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Writes a synthetic corpus in the layout download_and_unzip_pubmed.py produces: PubMed baseline files
+(pubmed25nNNNN.xml, <PubmedArticleSet> documents) and a folder of PMC JATS articles with full-text bodies.
+
+Article text comes from benchmarks.bench_topic_filter.make_articles (filler words with biomedical vocabulary
+sprinkled in), so topic filters are selective. A small share of the articles are letters or comments, which the
+parsers drop, and some PubMed dates only have a MedlineDate, as in the real baseline.
+
+Usage:
+    python -m benchmarks.synthetic_corpus data_synthetic --num_abstracts 100000 --num_pmc 2000
+    python ingest.py --data_dir data_synthetic --db data_synthetic/corpus.sqlite
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+from xml.sax.saxutils import escape
+
+from benchmarks.bench_chunk_store import make_pmc_articles
+from benchmarks.bench_topic_filter import make_articles
+
+PUBMED_FILE_PATTERN = "pubmed25n{:04d}.xml"
+PMC_FOLDER = "PMC000xxxxxx"
+NON_RESEARCH_TYPES = ["Letter", "Comment"]
+
+
+def pubmed_article_xml(article, publication_type="Journal Article", medline_date=False):
+    """
+    One <PubmedArticle> element for an article dict of make_articles.
+    """
+    year = article["publication_year"]
+    pub_date = f"<MedlineDate>{year} Jan-Feb</MedlineDate>" if medline_date else f"<Year>{year}</Year>"
+    mesh = "".join(
+        f'<MeshHeading><DescriptorName MajorTopicYN="N">{escape(term)}</DescriptorName></MeshHeading>'
+        for term in article["mesh_terms"] or []
+    )
+    return (
+        "<PubmedArticle><MedlineCitation Status=\"MEDLINE\" Owner=\"NLM\">"
+        f"<PMID Version=\"1\">{article['pmid']}</PMID>"
+        "<Article PubModel=\"Print\"><Journal><JournalIssue CitedMedium=\"Print\">"
+        f"<PubDate>{pub_date}</PubDate></JournalIssue><Title>Journal of Synthetic Medicine</Title></Journal>"
+        f"<ArticleTitle>{escape(article['title'])}</ArticleTitle>"
+        f"<Abstract><AbstractText>{escape(article['abstract'])}</AbstractText></Abstract>"
+        f"<PublicationTypeList><PublicationType UI=\"D016428\">{publication_type}</PublicationType>"
+        "</PublicationTypeList></Article>"
+        f"{f'<MeshHeadingList>{mesh}</MeshHeadingList>' if mesh else ''}"
+        "</MedlineCitation></PubmedArticle>\n"
+    )
+
+
+def pmc_article_xml(article, article_type="research-article"):
+    """
+    A JATS document for an article dict of bench_chunk_store.make_pmc_articles, one <p> per body paragraph.
+    """
+    paragraphs = "".join(f"<p>{escape(paragraph)}</p>" for paragraph in article["body"].split("\n\n"))
+    return (
+        '<?xml version="1.0" ?>\n'
+        '<article xmlns:xlink="http://www.w3.org/1999/xlink" xmlns:mml="http://www.w3.org/1998/Math/MathML" '
+        f'article-type="{article_type}"><front><article-meta>'
+        f'<article-id pub-id-type="pmc">{article["pmcid"]}</article-id>'
+        f"<title-group><article-title>{escape(article['title'])}</article-title></title-group>"
+        f'<pub-date pub-type="epub"><year>{article["publication_year"]}</year></pub-date>'
+        f"<abstract><p>{escape(article['abstract'])}</p></abstract>"
+        "<kwd-group><kwd>pediatrics</kwd></kwd-group>"
+        "</article-meta></front>"
+        f'<body><sec><title>Results</title>{paragraphs}</sec></body></article>\n'
+    )
+
+
+def write_pubmed_baseline(data_dir, num_abstracts, num_files=1, non_research_ratio=0.02, seed=0):
+    """
+    Writes num_abstracts PubMed articles spread over num_files baseline files; returns the file paths.
+    """
+    rng = random.Random(seed)
+    articles = make_articles(num_abstracts, seed=seed)
+    per_file = -(-num_abstracts // num_files) if num_abstracts else 0
+    paths = []
+    for number in range(num_files):
+        path = os.path.join(data_dir, PUBMED_FILE_PATTERN.format(number + 1))
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('<?xml version="1.0" encoding="utf-8"?>\n<PubmedArticleSet>\n')
+            for article in articles[number * per_file:(number + 1) * per_file]:
+                publication_type = (rng.choice(NON_RESEARCH_TYPES) if rng.random() < non_research_ratio
+                                    else "Journal Article")
+                f.write(pubmed_article_xml(article, publication_type, medline_date=rng.random() < 0.05))
+            f.write("</PubmedArticleSet>\n")
+        paths.append(path)
+    return paths
+
+
+def write_pubmed_update(path, revised_articles, deleted_pmids):
+    """
+    Writes a PubMed update file (gzipped when path ends in .gz): a <PubmedArticle> per revised article dict and a
+    <DeleteCitation> block listing deleted_pmids.
+    """
+    deletions = "".join(f'<PMID Version="1">{pmid}</PMID>' for pmid in deleted_pmids)
+    with (gzip.open if path.endswith(".gz") else open)(path, "wt", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="utf-8"?>\n<PubmedArticleSet>\n')
+        for article in revised_articles:
+            f.write(pubmed_article_xml(article))
+        if deletions:
+            f.write(f"<DeleteCitation>{deletions}</DeleteCitation>\n")
+        f.write("</PubmedArticleSet>\n")
+    return path
+
+
+def write_pmc_folder(folder, num_articles, paragraphs_per_body=12, non_research_ratio=0.02, seed=1):
+    """
+    Writes num_articles PMC articles, one PMC<id>.xml file each, into folder; returns the folder.
+    """
+    rng = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    for article in make_pmc_articles(num_articles, paragraphs_per_body=paragraphs_per_body, seed=seed):
+        article_type = "letter" if rng.random() < non_research_ratio else "research-article"
+        with open(os.path.join(folder, f"{article['pmcid']}.xml"), "w", encoding="utf-8") as f:
+            f.write(pmc_article_xml(article, article_type))
+    return folder
+
+
+def generate_corpus(data_dir, num_abstracts=20000, num_pmc=500, pubmed_files=2, paragraphs_per_body=12, seed=0):
+    """
+    Writes a synthetic PubMed baseline and PMC folder into data_dir. Returns (pubmed_paths, pmc_folder, size in MB).
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    pubmed_paths = write_pubmed_baseline(data_dir, num_abstracts, num_files=pubmed_files, seed=seed)
+    pmc_folder = write_pmc_folder(os.path.join(data_dir, PMC_FOLDER), num_pmc,
+                                  paragraphs_per_body=paragraphs_per_body, seed=seed + 1)
+    size = sum(os.path.getsize(path) for path in pubmed_paths)
+    size += sum(entry.stat().st_size for entry in os.scandir(pmc_folder))
+    return pubmed_paths, pmc_folder, size / 2 ** 20
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic PubMed/PMC XML corpus.")
+    parser.add_argument("data_dir", help="Output folder (laid out like data/)")
+    parser.add_argument("--num_abstracts", type=int, default=20000, help="Number of PubMed articles")
+    parser.add_argument("--num_pmc", type=int, default=500, help="Number of PMC full-text articles")
+    parser.add_argument("--pubmed_files", type=int, default=2, help="Number of PubMed baseline files")
+    parser.add_argument("--paragraphs_per_body", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    pubmed_paths, pmc_folder, size_mb = generate_corpus(args.data_dir, args.num_abstracts, args.num_pmc,
+                                                        args.pubmed_files, args.paragraphs_per_body, args.seed)
+    print(json.dumps({"pubmed_files": pubmed_paths, "pmc_folder": pmc_folder, "size_mb": round(size_mb, 1)},
+                     indent=2))
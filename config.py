@@ -6,4 +6,82 @@ from openai import OpenAI
 
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY)
\ No newline at end of file
+# Points the OpenAI clients at a compatible server (e.g. benchmarks/fake_openai_server.py) instead of the API.
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+_client = None
+
+
+def get_client():
+    """
+    Returns the shared OpenAI client, created on first use so that importing the configuration needs no API key.
+    """
+    global _client
+    if _client is None:
+        _client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
+    return _client
+
+
+CORPUS_DB_PATH = os.getenv("CORPUS_DB_PATH", os.path.join("data", "corpus.sqlite"))
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+# Model whose embeddings the semantic_similarity_to_query KPI compares; independent of the retrieval model.
+KPI_EMBEDDING_MODEL = os.getenv("KPI_EMBEDDING_MODEL", "text-embedding-3-small")
+# Set EMBEDDING_CACHE_DIR to an empty string to disable the on-disk embedding cache.
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join("data", "embedding_cache"))
+EMBEDDING_CACHE_MAX_ROWS = int(os.getenv("EMBEDDING_CACHE_MAX_ROWS", "1000000"))
+# Maximum number of embedding requests sent to the API concurrently.
+EMBEDDING_MAX_IN_FLIGHT = int(os.getenv("EMBEDDING_MAX_IN_FLIGHT", "8"))
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", os.path.join("data", "vector_index"))
+# ingest.py --updates compacts the vector index once its delta and tombstones reach this share of the main index.
+VECTOR_INDEX_COMPACT_RATIO = float(os.getenv("VECTOR_INDEX_COMPACT_RATIO", "0.1"))
+# Number of BM25 candidates fused with vector hits at retrieval time; 0 disables hybrid retrieval.
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "300"))
+
+# PMC bodies are split into chunks of at most CHUNK_TOKENS tokens (embedding model encoding) at sentence boundaries.
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "256"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+# Body chunks whose estimated Jaccard similarity to an earlier chunk reaches this are dropped; 0 disables.
+CHUNK_DEDUP_THRESHOLD = float(os.getenv("CHUNK_DEDUP_THRESHOLD", "0.8"))
+# Chunks the near-duplicate filter remembers (least recently used ones are forgotten), about 1.7 KB each.
+CHUNK_DEDUP_MAX_CHUNKS = int(os.getenv("CHUNK_DEDUP_MAX_CHUNKS", "50000"))
+
+# Deterministic (temperature 0) LLM responses are cached in SQLite; set LLM_CACHE_PATH to an empty string to disable.
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join("data", "llm_cache.sqlite"))
+# Cached responses older than this many seconds are refetched; 0 keeps them forever.
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "100000"))
+LLM_CACHE_MAX_MB = int(os.getenv("LLM_CACHE_MAX_MB", "512"))
+# Set LLM_CACHE_BYPASS=1 to skip cache lookups (fresh responses still refresh the cache).
+LLM_CACHE_BYPASS = os.getenv("LLM_CACHE_BYPASS", "0") == "1"
+
+# Answered questions can be cached (opt-in: set QUERY_CACHE_PATH, e.g. to data/query_cache.sqlite), per role,
+# restrictions and corpus version. By default only exact duplicates (same words, ignoring case and punctuation) get
+# the cached answer. Matching by embedding similarity is off (0): questions that differ only in the drug, dose or
+# patient group embed above 0.9 with text-embedding-ada-002, so only set QUERY_CACHE_THRESHOLD (cached answer) or
+# QUERY_CACHE_CONTEXT_THRESHOLD (cached topics and documents) to values calibrated on labelled question pairs with
+# the embedding model in use (python -m benchmarks.bench_query_cache --pairs ...).
+QUERY_CACHE_PATH = os.getenv("QUERY_CACHE_PATH", "")
+QUERY_CACHE_THRESHOLD = float(os.getenv("QUERY_CACHE_THRESHOLD", "0"))
+QUERY_CACHE_CONTEXT_THRESHOLD = float(os.getenv("QUERY_CACHE_CONTEXT_THRESHOLD", "0"))
+QUERY_CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "10000"))
+
+# Batch evaluation (evaluate_batch.py) checks citations and n-gram support of each summary against its documents
+# before the LLM rubric. A sentence is supported when EVAL_PRECHECK_SENTENCE_SUPPORT of its word n-grams (of
+# EVAL_PRECHECK_NGRAM words) appear in the documents it cites; summaries with at least EVAL_PRECHECK_PASS_SUPPORT of
+# their sentences supported and only valid citations pass, those under EVAL_PRECHECK_FAIL_SUPPORT (or citing nothing,
+# or mostly unknown documents) fail, and both skip the LLM call.
+EVAL_PRECHECK_NGRAM = int(os.getenv("EVAL_PRECHECK_NGRAM", "2"))
+EVAL_PRECHECK_SENTENCE_SUPPORT = float(os.getenv("EVAL_PRECHECK_SENTENCE_SUPPORT", "0.5"))
+EVAL_PRECHECK_PASS_SUPPORT = float(os.getenv("EVAL_PRECHECK_PASS_SUPPORT", "0.8"))
+EVAL_PRECHECK_FAIL_SUPPORT = float(os.getenv("EVAL_PRECHECK_FAIL_SUPPORT", "0.2"))
+# Maximum number of evaluation calls in flight, and per minute (0: no limit), in batch evaluation.
+EVAL_MAX_IN_FLIGHT = int(os.getenv("EVAL_MAX_IN_FLIGHT", "8"))
+EVAL_REQUESTS_PER_MINUTE = float(os.getenv("EVAL_REQUESTS_PER_MINUTE", "500"))
+
+# The summary prompt is packed with up to CONTEXT_TOKEN_BUDGET tokens (gpt-4 encoding) of context, chosen by MMR
+# among CONTEXT_CANDIDATES retrieved chunks; set CONTEXT_TOKEN_BUDGET to 0 for the fixed 7 best chunks.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", "30"))
+# Trade-off between relevance to the query (1.0) and diversity among selected chunks (0.0).
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.5"))
@@ -1,102 +1,396 @@
-# PubMed & PMC Dataset Disclaimer:
-# This project uses data from the U.S. National Library of Medicine (NLM),
-# specifically the PubMed Baseline dataset and the PubMed Central (PMC) Open Access Subset.
-# Both datasets are publicly available and may be freely used and redistributed under the terms below.
-#
-# Important Notes:
-# - Use of this data does NOT imply endorsement by the NLM or the National Institutes of Health (NIH).
-# - Do NOT use NIH or NLM logos, branding, or trademarks in your application or interface.
-# - If your application modifies, summarizes, or generates outputs based on this data,
-#   you must clearly state that the outputs are system-generated and NOT authored or approved by the NLM or NIH.
-# - Articles in the PMC Open Access Subset are available under specific open-access licenses (e.g., CC BY, CC0),
-#   and it is your responsibility to comply with the terms of each article’s license.
-#
-# License Terms:
-# - PubMed Baseline: https://www.nlm.nih.gov/databases/download/terms_and_conditions.html
-# - PMC OA License Info: https://www.ncbi.nlm.nih.gov/pmc/tools/openftlist/
-
-
-import re
-import urllib.request
-import gzip
-import tarfile
-import shutil
-import os
-
-from html.parser import HTMLParser
-
-
-# Configuration
-PUBMED_BASE_URL = "https://ftp.ncbi.nlm.nih.gov/pubmed/baseline/"
-PMC_OA_BASE_URL = "https://ftp.ncbi.nlm.nih.gov/pub/pmc/oa_bulk/"
-DOWNLOAD_COUNT = 5  # Set to None to download all
-OUTPUT_DIR = "data"
-
-def download_file(url, output_path):
-    print(f"\nDownloading: {url}")
-    urllib.request.urlretrieve(url, output_path)
-
-def extract_gzip(gz_path, out_path):
-    print(f"Extracting GZip: {gz_path}")
-    with gzip.open(gz_path, 'rb') as f_in, open(out_path, 'wb') as f_out:
-        shutil.copyfileobj(f_in, f_out)
-    os.remove(gz_path)
-
-def extract_tar(tar_path, extract_dir):
-    print(f"Extracting TAR: {tar_path}")
-    with tarfile.open(tar_path, 'r:gz') as tar:
-        tar.extractall(path=extract_dir)
-    os.remove(tar_path)
-
-def download_pubmed_baseline(file_list_path):
-    with open(file_list_path) as f:
-        files = [line.strip() for line in f.readlines()]
-
-    to_download = files if DOWNLOAD_COUNT is None else files[:DOWNLOAD_COUNT]
-    print(f"\nDownloading {len(to_download)} PubMed baseline files...")
-    for fname in to_download:
-        gz_path = os.path.join(OUTPUT_DIR, fname)
-        xml_path = os.path.join(OUTPUT_DIR, fname[:-3])
-        download_file(PUBMED_BASE_URL + fname, gz_path)
-        extract_gzip(gz_path, xml_path)
-
-
-class TarballParser(HTMLParser):
-    def __init__(self):
-        super().__init__()
-        self.tarballs = []
-
-    def handle_starttag(self, tag, attrs):
-        if tag == "a":
-            href = dict(attrs).get("href", "")
-            if href.endswith(".tar.gz"):
-                self.tarballs.append(href)
-
-def download_pmc_oa_bulk():
-    subdir = "oa_comm/xml/"
-    index_url = PMC_OA_BASE_URL + subdir
-    print(f"Fetching index from {index_url}")
-    html = urllib.request.urlopen(index_url).read().decode()
-    files = re.findall(r'href="([^"]+?\.tar\.gz)"', html)
-    if not files:
-        print("No .tar.gz files found in", subdir)
-        return
-    to_download = files if DOWNLOAD_COUNT is None else files[:DOWNLOAD_COUNT]
-    for fname in to_download:
-        url = index_url + fname
-        download_file(url, os.path.join(OUTPUT_DIR, fname))
-        extract_tar(os.path.join(OUTPUT_DIR, fname), OUTPUT_DIR)
-
-def main():
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-    print("=== PubMed Baseline ===")
-    download_pubmed_baseline("data/filelist.txt")
-
-    print("\n=== PMC Open Access Subset ===")
-    download_pmc_oa_bulk()
-
-    print("\n✅ All done!")
-
-if __name__ == "__main__":
-    main()
+# PubMed & PMC Dataset Disclaimer:
+# This project uses data from the U.S. National Library of Medicine (NLM),
+# specifically the PubMed Baseline dataset and the PubMed Central (PMC) Open Access Subset.
+# Both datasets are publicly available and may be freely used and redistributed under the terms below.
+#
+# Important Notes:
+# - Use of this data does NOT imply endorsement by the NLM or the National Institutes of Health (NIH).
+# - Do NOT use NIH or NLM logos, branding, or trademarks in your application or interface.
+# - If your application modifies, summarizes, or generates outputs based on this data,
+#   you must clearly state that the outputs are system-generated and NOT authored or approved by the NLM or NIH.
+# - Articles in the PMC Open Access Subset are available under specific open-access licenses (e.g., CC BY, CC0),
+#   and it is your responsibility to comply with the terms of each article’s license.
+#
+# License Terms:
+# - PubMed Baseline: https://www.nlm.nih.gov/databases/download/terms_and_conditions.html
+# - PMC OA License Info: https://www.ncbi.nlm.nih.gov/pmc/tools/openftlist/
+
+
+import argparse
+import gzip
+import hashlib
+import http.client
+import json
+import os
+import re
+import shutil
+import sys
+import tarfile
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+# Configuration
+PUBMED_BASE_URL = "https://ftp.ncbi.nlm.nih.gov/pubmed/baseline/"
+PUBMED_UPDATES_URL = "https://ftp.ncbi.nlm.nih.gov/pubmed/updatefiles/"
+UPDATES_SUBDIR = "updatefiles"
+PMC_OA_BASE_URL = "https://ftp.ncbi.nlm.nih.gov/pub/pmc/oa_bulk/"
+PMC_SUBDIR = "oa_comm/xml/"
+DOWNLOAD_COUNT = 5  # Set to None to download all
+OUTPUT_DIR = "data"
+MANIFEST_NAME = "download_manifest.json"
+CONNECTIONS = 4
+RETRIES = 5
+CHUNK_SIZE = 1 << 20
+CONTENT_RANGE_RE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+MD5_RE = re.compile(r"\b([0-9a-fA-F]{32})\b")
+
+
+class DownloadError(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    Keep-alive HTTP(S) connections, one per host and thread, so each download worker reuses its connection for
+    the archive, its .md5 sidecar and the next file. Redirects are followed.
+    """
+
+    def __init__(self, timeout=60):
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self, scheme, netloc):
+        connections = self._local.__dict__.setdefault("connections", {})
+        if (scheme, netloc) not in connections:
+            cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            connections[(scheme, netloc)] = cls(netloc, timeout=self.timeout)
+        return connections[(scheme, netloc)]
+
+    def discard(self, url):
+        """
+        Closes this thread's connection to the host of url (after an error left it in an unknown state).
+        """
+        parts = urllib.parse.urlsplit(url)
+        connection = self._local.__dict__.get("connections", {}).pop((parts.scheme, parts.netloc), None)
+        if connection is not None:
+            connection.close()
+
+    def request(self, url, headers=None, max_redirects=5):
+        """
+        Sends a GET request and returns the response, which must be read completely before the next request.
+        """
+        for _ in range(max_redirects + 1):
+            parts = urllib.parse.urlsplit(url)
+            path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+            try:
+                connection = self._connection(parts.scheme, parts.netloc)
+                connection.request("GET", path, headers=headers or {})
+                response = connection.getresponse()
+            except (http.client.HTTPException, OSError):
+                # The server may have closed an idle keep-alive connection; retry once on a fresh one.
+                self.discard(url)
+                connection = self._connection(parts.scheme, parts.netloc)
+                connection.request("GET", path, headers=headers or {})
+                response = connection.getresponse()
+            location = response.getheader("Location")
+            if response.status in (301, 302, 303, 307, 308) and location:
+                response.read()
+                url = urllib.parse.urljoin(url, location)
+                continue
+            return response
+        raise DownloadError(f"Too many redirects for {url}")
+
+    def read_text(self, url):
+        """
+        Body of url as text, or None when the server answers 404.
+        """
+        response = self.request(url)
+        body = response.read()
+        if response.status == 404:
+            return None
+        if response.status != 200:
+            raise DownloadError(f"HTTP {response.status} for {url}")
+        return body.decode("utf-8", errors="replace")
+
+
+class DownloadManifest:
+    """
+    JSON record of completed downloads (size, MD5, extracted outputs), rewritten atomically after every file, so
+    re-runs skip files whose outputs are still on disk.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.files = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.files = json.load(f).get("files", {})
+
+    def is_complete(self, name):
+        entry = self.files.get(name)
+        return entry is not None and all(os.path.exists(path) for path in entry["outputs"])
+
+    def record(self, name, **entry):
+        with self.lock:
+            self.files[name] = dict(entry, completed_at=time.strftime("%Y-%m-%dT%H:%M:%S%z"))
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"files": self.files}, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+
+def file_md5(path):
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fetch_md5(pool, url):
+    """
+    The checksum NCBI publishes next to url ("MD5(name)= <hex>"), or None if there is no .md5 sidecar.
+    """
+    text = pool.read_text(url + ".md5")
+    match = MD5_RE.search(text.rsplit("=", 1)[-1]) if text else None
+    return match.group(1).lower() if match else None
+
+
+def _expected_size(response, offset):
+    if response.status == 206:
+        match = CONTENT_RANGE_RE.match(response.getheader("Content-Range", ""))
+        if match is None or int(match.group(1)) != offset:
+            raise DownloadError(f"Unexpected Content-Range {response.getheader('Content-Range')!r}")
+        return int(match.group(3)) if match.group(3) != "*" else None
+    length = response.getheader("Content-Length")
+    return int(length) if length is not None else None
+
+
+def download_file(url, output_path, pool, expected_md5=None, retries=RETRIES, backoff=1.0, stats=None):
+    """
+    Downloads url to output_path through a "<output_path>.part" file. After an interrupted attempt (in this run or
+    an earlier one) the download resumes from the end of the partial file with an HTTP Range request; servers that
+    ignore Range send the whole file again. With expected_md5 the finished file is verified, and a mismatch restarts
+    the download from scratch.
+    """
+    stats = stats if stats is not None else {}
+    part_path = output_path + ".part"
+    for attempt in range(retries + 1):
+        try:
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            response = pool.request(url, {"Range": f"bytes={offset}-"} if offset else None)
+            if response.status == 416:
+                # The partial file already holds the whole archive.
+                response.read()
+            elif response.status in (200, 206):
+                expected_size = _expected_size(response, offset)
+                if response.status == 206:
+                    stats["resumed_bytes"] = stats.get("resumed_bytes", 0) + offset
+                with open(part_path, "ab" if response.status == 206 else "wb") as f:
+                    for block in iter(lambda: response.read(CHUNK_SIZE), b""):
+                        f.write(block)
+                        stats["bytes"] = stats.get("bytes", 0) + len(block)
+                if expected_size is not None and os.path.getsize(part_path) != expected_size:
+                    raise DownloadError(f"Connection closed after {os.path.getsize(part_path)} of "
+                                        f"{expected_size} bytes")
+            else:
+                response.read()
+                raise DownloadError(f"HTTP {response.status} for {url}")
+
+            if expected_md5 is not None and file_md5(part_path) != expected_md5:
+                os.remove(part_path)
+                raise DownloadError(f"MD5 mismatch for {url}")
+            os.replace(part_path, output_path)
+            return output_path
+        except (DownloadError, http.client.HTTPException, OSError) as e:
+            pool.discard(url)
+            if attempt == retries:
+                raise DownloadError(f"Giving up on {url}: {e}") from e
+            stats["retries"] = stats.get("retries", 0) + 1
+            print(f"Retrying {url} ({e})")
+            time.sleep(backoff * 2 ** attempt)
+
+
+def extract_gzip(gz_path, out_path):
+    print(f"Extracting GZip: {gz_path}")
+    tmp_path = f"{out_path}.tmp"
+    with gzip.open(gz_path, 'rb') as f_in, open(tmp_path, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out, CHUNK_SIZE)
+    os.replace(tmp_path, out_path)
+    os.remove(gz_path)
+    return [out_path]
+
+
+def extract_tar(tar_path, extract_dir):
+    print(f"Extracting TAR: {tar_path}")
+    with tarfile.open(tar_path, 'r:gz') as tar:
+        top_level = sorted({member.name.split("/", 1)[0] for member in tar.getmembers()})
+        tar.extractall(path=extract_dir)
+    os.remove(tar_path)
+    return [os.path.join(extract_dir, name) for name in top_level]
+
+
+def download_and_extract(url, archive_path, extract, pool, manifest, require_md5=False, retries=RETRIES,
+                         backoff=1.0, stats=None):
+    """
+    Downloads one archive (verifying its .md5 sidecar when there is one), extracts it and records it in the
+    manifest. Returns the extracted paths.
+    """
+    name = os.path.basename(archive_path)
+    expected_md5 = fetch_md5(pool, url)
+    if expected_md5 is None and require_md5:
+        raise DownloadError(f"No checksum published for {url}")
+    print(f"\nDownloading: {url}")
+    download_file(url, archive_path, pool, expected_md5=expected_md5, retries=retries, backoff=backoff, stats=stats)
+    size = os.path.getsize(archive_path)
+    outputs = extract(archive_path)
+    manifest.record(name, url=url, size=size, md5=expected_md5, outputs=outputs)
+    return outputs
+
+
+def download_all(jobs, output_dir=OUTPUT_DIR, connections=CONNECTIONS, retries=RETRIES, backoff=1.0, pool=None,
+                 manifest=None):
+    """
+    Runs (url, archive_name, extract, require_md5) jobs on `connections` worker threads, skipping archives the
+    manifest lists as complete. Returns statistics: files downloaded and skipped, failures, bytes, resumed bytes,
+    retries and elapsed seconds.
+    """
+    pool = pool or ConnectionPool()
+    manifest = manifest or DownloadManifest(os.path.join(output_dir, MANIFEST_NAME))
+    stats = {"downloaded": 0, "skipped": 0, "failed": {}, "bytes": 0, "resumed_bytes": 0, "retries": 0}
+    file_stats = []
+    pending = []
+    for url, name, extract, require_md5 in jobs:
+        if manifest.is_complete(name):
+            stats["skipped"] += 1
+        else:
+            pending.append((url, name, extract, require_md5))
+    if stats["skipped"]:
+        print(f"Skipping {stats['skipped']} file(s) already listed in {manifest.path}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=connections) as executor:
+        futures = {}
+        for url, name, extract, require_md5 in pending:
+            file_stats.append({})
+            futures[executor.submit(download_and_extract, url, os.path.join(output_dir, name), extract, pool,
+                                    manifest, require_md5, retries, backoff, file_stats[-1])] = name
+        for future in as_completed(futures):
+            try:
+                future.result()
+                stats["downloaded"] += 1
+            except (DownloadError, OSError, tarfile.TarError, EOFError) as e:
+                stats["failed"][futures[future]] = str(e)
+                print(f"Failed: {futures[future]} ({e})")
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    for key in ("bytes", "resumed_bytes", "retries"):
+        stats[key] = sum(entry.get(key, 0) for entry in file_stats)
+    return stats
+
+
+def keep_archive(archive_path):
+    return [archive_path]
+
+
+def pubmed_jobs(pool, file_list_path=None, base_url=PUBMED_BASE_URL, count=DOWNLOAD_COUNT, keep_compressed=False):
+    """
+    Download jobs of the PubMed baseline files named in file_list_path (or listed on the baseline index page).
+    With keep_compressed the .xml.gz files are left as downloaded; the ingest reads them directly.
+    """
+    if file_list_path and os.path.exists(file_list_path):
+        with open(file_list_path) as f:
+            files = [line.strip() for line in f if line.strip()]
+    else:
+        files = sorted(set(re.findall(r'href="(pubmed[^"/]*?\.xml\.gz)"', pool.read_text(base_url) or "")))
+    to_download = files if count is None else files[:count]
+
+    def extract(gz_path):
+        return extract_gzip(gz_path, gz_path[:-3])
+
+    return [(base_url + fname, fname, keep_archive if keep_compressed else extract, True) for fname in to_download]
+
+
+def pubmed_update_jobs(pool, base_url=PUBMED_UPDATES_URL):
+    """
+    Download jobs of every daily PubMed update file, into the updatefiles/ subfolder. They are kept compressed:
+    ingest.py --updates applies them in order, straight from the .xml.gz files.
+    """
+    files = sorted(set(re.findall(r'href="(pubmed[^"/]*?\.xml\.gz)"', pool.read_text(base_url) or "")))
+    return [(base_url + fname, f"{UPDATES_SUBDIR}/{fname}", keep_archive, True) for fname in files]
+
+
+def pmc_jobs(pool, base_url=PMC_OA_BASE_URL, subdir=PMC_SUBDIR, count=DOWNLOAD_COUNT, output_dir=OUTPUT_DIR,
+             keep_compressed=False):
+    """
+    Download jobs of the PMC Open Access bulk tarballs listed on the index page of subdir, kept as .tar.gz with
+    keep_compressed.
+    """
+    index_url = base_url + subdir
+    print(f"Fetching index from {index_url}")
+    files = list(dict.fromkeys(re.findall(r'href="([^"]+?\.tar\.gz)"', pool.read_text(index_url) or "")))
+    if not files:
+        print("No .tar.gz files found in", subdir)
+        return []
+    to_download = files if count is None else files[:count]
+
+    def extract(tar_path):
+        return extract_tar(tar_path, output_dir)
+
+    return [(index_url + fname, fname, keep_archive if keep_compressed else extract, False) for fname in to_download]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download and extract the PubMed baseline and PMC OA bulk files.")
+    parser.add_argument("--filelist", default=os.path.join(OUTPUT_DIR, "filelist.txt"),
+                        help="File with one PubMed baseline file name per line (default: list the baseline index)")
+    parser.add_argument("--output_dir", default=OUTPUT_DIR)
+    parser.add_argument("--count", type=int, default=DOWNLOAD_COUNT,
+                        help="Files to download per source (0 for all)")
+    parser.add_argument("--connections", type=int, default=CONNECTIONS, help="Concurrent downloads")
+    parser.add_argument("--retries", type=int, default=RETRIES, help="Attempts per file after the first")
+    parser.add_argument("--pubmed_base_url", default=PUBMED_BASE_URL)
+    parser.add_argument("--pmc_base_url", default=PMC_OA_BASE_URL)
+    parser.add_argument("--skip_pubmed", action="store_true")
+    parser.add_argument("--skip_pmc", action="store_true")
+    parser.add_argument("--updates", action="store_true",
+                        help=f"Also download all PubMed daily update files into <output_dir>/{UPDATES_SUBDIR}")
+    parser.add_argument("--pubmed_updates_url", default=PUBMED_UPDATES_URL)
+    parser.add_argument("--keep_compressed", action="store_true",
+                        help="Keep the .xml.gz and .tar.gz archives instead of extracting them (ingest.py and "
+                             "main.py read them directly)")
+    args = parser.parse_args()
+
+    count = args.count or None
+    os.makedirs(args.output_dir, exist_ok=True)
+    pool = ConnectionPool()
+    jobs = []
+    if not args.skip_pubmed:
+        print("=== PubMed Baseline ===")
+        jobs += pubmed_jobs(pool, args.filelist, base_url=args.pubmed_base_url, count=count,
+                            keep_compressed=args.keep_compressed)
+    if not args.skip_pmc:
+        print("\n=== PMC Open Access Subset ===")
+        jobs += pmc_jobs(pool, base_url=args.pmc_base_url, count=count, output_dir=args.output_dir,
+                         keep_compressed=args.keep_compressed)
+
+    if args.updates:
+        print("\n=== PubMed Update Files ===")
+        os.makedirs(os.path.join(args.output_dir, UPDATES_SUBDIR), exist_ok=True)
+        jobs += pubmed_update_jobs(pool, base_url=args.pubmed_updates_url)
+
+    print(f"\nDownloading {len(jobs)} files over {args.connections} connections...")
+    stats = download_all(jobs, output_dir=args.output_dir, connections=args.connections, retries=args.retries,
+                         pool=pool)
+    print(f"\n{stats['downloaded']} downloaded, {stats['skipped']} skipped, {len(stats['failed'])} failed "
+          f"({stats['bytes'] / 2 ** 20:.1f} MB in {stats['seconds']:.1f} s, "
+          f"{stats['resumed_bytes'] / 2 ** 20:.1f} MB resumed, {stats['retries']} retries)")
+    if stats["failed"]:
+        sys.exit(1)
+    print("\n✅ All done!")
+
+if __name__ == "__main__":
+    main()
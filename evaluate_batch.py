@@ -0,0 +1,65 @@
+import argparse
+import asyncio
+import json
+import time
+
+from langchain.schema import Document
+
+from app.batch_evaluator import evaluate_batch, summarize_evaluations, SKIP_VERDICTS
+from batch import completed_request_ids
+from config import EVAL_MAX_IN_FLIGHT, EVAL_REQUESTS_PER_MINUTE
+
+
+def read_summaries(path):
+    """
+    Reads the successful results of a batch.py run (or any JSONL with request_id, role, question, summary and
+    optionally documents as page_content/metadata objects).
+    """
+    records = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "error" in record:
+                continue
+            record.setdefault("request_id", f"line-{line_number}")
+            record["documents"] = [Document(page_content=doc["page_content"], metadata=doc["metadata"])
+                                   for doc in record.get("documents") or []]
+            records.append(record)
+    return records
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate a JSONL file of archived summaries concurrently, with a "
+                                                 "local citation and faithfulness pre-check.")
+    parser.add_argument("input", help="JSONL with request_id, role, question, summary and documents per line "
+                                      "(e.g. the output of batch.py --save_documents)")
+    parser.add_argument("--output", default="evaluations.jsonl",
+                        help="JSONL evaluations file; summaries already evaluated in it are skipped")
+    parser.add_argument("--max_in_flight", type=int, default=EVAL_MAX_IN_FLIGHT,
+                        help="Maximum number of LLM evaluation calls in flight")
+    parser.add_argument("--requests_per_minute", type=float, default=EVAL_REQUESTS_PER_MINUTE,
+                        help="Maximum number of LLM evaluation calls started per minute (0: no limit)")
+    parser.add_argument("--llm_for", nargs="*", choices=list(SKIP_VERDICTS), default=[],
+                        help="Pre-check verdicts that still get the LLM rubric (by default clear passes and "
+                             "failures skip it)")
+    args = parser.parse_args()
+
+    done = completed_request_ids(args.output)
+    pending = [record for record in read_summaries(args.input) if record["request_id"] not in done]
+    print(f"{len(done)} summaries already evaluated, {len(pending)} to go")
+
+    if pending:
+        with open(args.output, "a") as out:
+            def write(result):
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+
+            start = time.perf_counter()
+            results = asyncio.run(evaluate_batch(
+                pending, on_result=write, max_in_flight=args.max_in_flight,
+                requests_per_minute=args.requests_per_minute,
+                skip_verdicts=[verdict for verdict in SKIP_VERDICTS if verdict not in args.llm_for]
+            ))
+        print(json.dumps(summarize_evaluations(results, time.perf_counter() - start), indent=2))
@@ -0,0 +1,81 @@
+import argparse
+import os
+from app.corpus_store import CorpusStore
+from app.data_loader import (ingest_corpus, ingest_pubmed_updates, load_corpus, prepare_chunk_store,
+                             parse_pubmed_update_file, merge_pubmed_update, load_pmc_body, UPDATES_SUBDIR)
+from app.retrieval import get_embedding_model
+from app.chunker import TokenChunker
+from app.vector_index import (build_corpus_vector_index, load_corpus_vector_index, update_corpus_vector_index,
+                              compact_corpus_vector_index, index_exists, article_key,
+                              article_topic_texts)
+from config import (CORPUS_DB_PATH, VECTOR_INDEX_DIR, VECTOR_INDEX_COMPACT_RATIO, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS,
+                    CHUNK_DEDUP_THRESHOLD)
+
+
+def update_index(index_dir, update_paths, compact=False):
+    """
+    Brings the vector index up to date with the update files applied to the corpus store: files the index does not
+    include yet are re-parsed, their chunks tombstoned and re-embedded into the delta, and the index is compacted
+    when its delta grows past VECTOR_INDEX_COMPACT_RATIO (or when compact is set).
+    """
+    index = load_corpus_vector_index(index_dir)
+    applied = set(index.applied_updates())
+    pending = sorted((path for path in update_paths if os.path.basename(path) not in applied and os.path.exists(path)),
+                     key=os.path.basename)
+    if pending:
+        changes = {}
+        for path in pending:
+            merge_pubmed_update(changes, parse_pubmed_update_file(path))
+        revised = [article for article in changes.values() if article is not None]
+        chunks = prepare_chunk_store(revised, [])
+        index = update_corpus_vector_index(index_dir, chunks, {article_key("PubMed", pmid) for pmid in changes},
+                                           get_embedding_model(),
+                                           updates=[os.path.basename(path) for path in pending],
+                                           topics=article_topic_texts(revised, []))
+        print(f"Updated index with {len(pending)} update files: {len(chunks)} chunks added, "
+              f"{len(index.tombstones)} tombstoned in total (delta ratio {index.delta_ratio():.3f})")
+
+    if compact or index.delta_ratio() >= VECTOR_INDEX_COMPACT_RATIO > 0:
+        index = compact_corpus_vector_index(index_dir)
+        print(f"Compacted index to {len(index)} vectors")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse PubMed/PMC XML files once into the on-disk corpus store.")
+    parser.add_argument("--data_dir", default="data", help="Directory containing pubmed*.xml files and PMC folders")
+    parser.add_argument("--db", default=CORPUS_DB_PATH, help="Path of the SQLite corpus store")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of worker processes for XML parsing (default: sequential)")
+    parser.add_argument("--build_index", action="store_true",
+                        help="Also embed the whole corpus into a persisted FAISS index used by main.py")
+    parser.add_argument("--index_dir", default=VECTOR_INDEX_DIR, help="Directory of the persisted FAISS index")
+    parser.add_argument("--index_type", choices=["flat", "ivf", "hnsw"], default="flat", help="FAISS index type")
+    parser.add_argument("--updates", action="store_true",
+                        help=f"Apply the PubMed update files in <data_dir>/{UPDATES_SUBDIR} to the store and, when it "
+                             f"exists, to the vector index")
+    parser.add_argument("--compact", action="store_true",
+                        help="Fold the vector index's update delta into the main index now")
+
+    args = parser.parse_args()
+
+    with CorpusStore(args.db) as store:
+        ingest_corpus(store, data_dir=args.data_dir, workers=args.workers, verbose=True)
+        if args.updates:
+            ingest_pubmed_updates(store, os.path.join(args.data_dir, UPDATES_SUBDIR), workers=args.workers,
+                                  verbose=True)
+        update_paths = [path for path, (kind, _, _) in store.file_states().items() if kind == "pubmed_update"]
+
+    if args.build_index:
+        articles_pubmed, articles_pmc = load_corpus(store_path=args.db, lazy_body=True)
+        chunker = TokenChunker(CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS, CHUNK_DEDUP_THRESHOLD)
+        chunks = prepare_chunk_store(articles_pubmed, articles_pmc, chunker=chunker)
+        print(f"Chunked PMC bodies: {chunker.summary()}")
+        index = build_corpus_vector_index(chunks, get_embedding_model(), args.index_dir,
+                                          index_type=args.index_type,
+                                          updates=[os.path.basename(path) for path in update_paths],
+                                          topics=article_topic_texts(articles_pubmed, articles_pmc,
+                                                                     body_loader=load_pmc_body),
+                                          verbose=True)
+        print(f"Built {args.index_type} index with {len(index)} vectors in {args.index_dir}")
+    elif (args.updates or args.compact) and index_exists(args.index_dir):
+        update_index(args.index_dir, update_paths, compact=args.compact)
@@ -1,21 +1,23 @@
 import argparse
+import asyncio
 import json
-from app.data_loader import load_and_prepare_documents
 from app.retrieval import (
     step_back_and_extract_topics,
     softly_expand_topics,
-    build_faiss_vectorstore,
+    retrieve_context,
 )
 from app.summarizer import generate_summary_from_documents
 from app.evaluator import evaluate_summary
-from app.kpis import (compute_avg_llm_score,
-                      count_citations,
-                      count_tokens,
-                      count_source_documents,
-                      compute_semantic_similarity_to_query)
+from app.kpis import compute_kpis
+from app.pipeline import generate_summary_async
+from app.query_cache import lookup_query
+from app.tracing import traced, tracer
 
 
-def generate_summary(user_role: str, user_question: str,pmc_limit: int = None):
+@traced("generate_summary")
+def generate_summary(user_role: str, user_question: str,pmc_limit: int = None, workers: int = None,
+                     corpus: dict = None, lazy_body: bool = False, sources: list = None, min_year: int = None,
+                     max_year: int = None):
     """
         Main pipeline to generate a biomedical summary based on user role and question.
 
@@ -23,31 +25,45 @@ def generate_summary(user_role: str, user_question: str,pmc_limit: int = None):
         - Extracts topics from the question
         - Expands topics for better filtering
         - Loads and prepares articles from PubMed/PMC
-        - Retrieves relevant documents using FAISS
+        - Retrieves relevant documents using FAISS (the prebuilt corpus index when available) and packs them into
+          the context token budget
         - Generates a summary and evaluates it using LLM
-        - Computes relevant KPIs
+        - Computes relevant KPIs locally (the query vector comes from the embedding cache)
+
+        A corpus preloaded with load_indexed_corpus can be passed to skip loading and use the topic indexes.
+
+        Questions are first looked up in the query cache (when enabled): a duplicate of an answered question
+        returns the cached answer, and with semantic matching configured a close paraphrase may reuse its topics
+        and retrieved documents. Served or reused results are marked under kpis["query_cache"].
     """
 
-    step_back_summary, topics = step_back_and_extract_topics(user_question)
-    expand_topics = softly_expand_topics(topics)
+    cached = lookup_query(user_role, user_question, sources=sources, min_year=min_year, max_year=max_year,
+                          pmc_limit=pmc_limit)
+    if cached.kind == "answer":
+        return cached.result["summary"], cached.result["evaluation_report"], cached.kpis()
 
-    all_docs = load_and_prepare_documents(expand_topics,pmc_limit=pmc_limit)
-    vectorstore = build_faiss_vectorstore(all_docs)
+    if cached.kind == "context":
+        step_back_summary, expand_topics = cached.result["step_back_summary"], cached.result["topics"]
+    else:
+        step_back_summary, topics = step_back_and_extract_topics(user_question)
+        expand_topics = softly_expand_topics(topics)
 
     query_text = f"""Question: {user_question}
     General Context: {step_back_summary}""".strip()
-    similar_docs = vectorstore.similarity_search(query_text, k=7)
+    if cached.kind == "context":
+        similar_docs = cached.documents()
+    else:
+        similar_docs = retrieve_context(query_text, expand_topics, k=7, sources=sources, min_year=min_year,
+                                        max_year=max_year, pmc_limit=pmc_limit, workers=workers, corpus=corpus,
+                                        lazy_body=lazy_body)
 
     summary = generate_summary_from_documents(user_role, user_question, similar_docs)
     evaluation_report = evaluate_summary(user_role, user_question, summary)
 
-    kpis = {
-        "avg_llm_score": compute_avg_llm_score(evaluation_report),
-        "num_citations": count_citations(summary),
-        "num_tokens": count_tokens(summary),
-        "num_source_documents": count_source_documents(similar_docs),
-        "semantic_similarity_to_query": compute_semantic_similarity_to_query(summary, query_text)
-    }
+    kpis = compute_kpis(summary, query_text, evaluation_report, similar_docs)
+    cached.store(step_back_summary, expand_topics, similar_docs, summary, evaluation_report, kpis)
+    if cached.kind is not None:
+        kpis["query_cache"] = cached.info()
     return summary, evaluation_report, kpis
 
 
@@ -56,16 +72,64 @@ if __name__ == "__main__":
     parser.add_argument("--role", required=True, help="User role, e.g., 'pediatrician'")
     parser.add_argument("--question", required=True, help="Research question to answer")
     parser.add_argument("--pmc_limit", type=int, default=None, help="Optional limit on number of PMC files to load")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of worker processes for XML parsing (default: sequential)")
+    parser.add_argument("--lazy_body", action="store_true",
+                        help="Keep PMC bodies on disk and load them only for articles that pass the topic filter")
+    parser.add_argument("--sources", nargs="+", choices=["PubMed", "PMC"], default=None,
+                        help="Restrict retrieval to these sources")
+    parser.add_argument("--min_year", type=int, default=None, help="Only retrieve articles published in or after")
+    parser.add_argument("--max_year", type=int, default=None, help="Only retrieve articles published in or before")
+    parser.add_argument("--async_pipeline", action="store_true",
+                        help="Overlap independent stages (corpus loading, LLM calls, evaluation and KPIs) and "
+                             "print per-stage timings")
+    parser.add_argument("--stream", action="store_true",
+                        help="Print the summary as it is generated and report the time to first token "
+                             "(uses the async pipeline)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Trace every stage (wall and CPU time, peak memory growth, items, tokens, cache hits), "
+                             "print a per-stage table and write <profile_output>.json and <profile_output>.prom")
+    parser.add_argument("--profile_output", default="profile",
+                        help="Path prefix of the trace (JSON) and Prometheus metrics files written by --profile")
 
     args = parser.parse_args()
 
-    summary_result, evaluation_report_result, kpis_result  = generate_summary(user_role=args.role,
-                                                                              user_question=args.question,
-                                                                              pmc_limit=args.pmc_limit)
+    pipeline_kwargs = dict(user_role=args.role, user_question=args.question, pmc_limit=args.pmc_limit,
+                           workers=args.workers, lazy_body=args.lazy_body, sources=args.sources,
+                           min_year=args.min_year, max_year=args.max_year)
+    if args.profile:
+        tracer.enable()
+    timings = None
+    if args.stream:
+        print('summary: ', end='', flush=True)
+        summary_result, evaluation_report_result, kpis_result, timings = asyncio.run(
+            generate_summary_async(**pipeline_kwargs, on_token=lambda piece: print(piece, end='', flush=True))
+        )
+        print()
+    elif args.async_pipeline:
+        summary_result, evaluation_report_result, kpis_result, timings = asyncio.run(
+            generate_summary_async(**pipeline_kwargs)
+        )
+    else:
+        summary_result, evaluation_report_result, kpis_result = generate_summary(**pipeline_kwargs)
 
-    print('summary:',summary_result)
+    if kpis_result.get("query_cache", {}).get("match") == "answer":
+        print(f"(cached answer to: {kpis_result['query_cache']['cached_question']})")
+    if not args.stream:
+        print('summary:',summary_result)
     print('\n\n')
     print("Evaluation Report:")
     print(json.dumps(evaluation_report_result, indent=2, ensure_ascii=False))
     print("\nKPIs:")
     print(json.dumps(kpis_result, indent=2, ensure_ascii=False))
+    if timings is not None:
+        print("\nTimings:")
+        print(json.dumps(timings, indent=2))
+    if args.profile:
+        with open(f"{args.profile_output}.json", "w", encoding="utf-8") as f:
+            f.write(tracer.to_json())
+        with open(f"{args.profile_output}.prom", "w", encoding="utf-8") as f:
+            f.write(tracer.to_prometheus())
+        print("\nProfile:")
+        print(tracer.report())
+        print(f"\nTrace written to {args.profile_output}.json, metrics to {args.profile_output}.prom")
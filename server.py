@@ -0,0 +1,160 @@
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+from app.llm_cache import get_llm_cache
+from app.pipeline import generate_summary_async, warm_up
+from app.query_cache import get_query_cache
+
+
+class ServerOverloaded(Exception):
+    """
+    Raised when a request cannot be admitted because the computation queue is full.
+    """
+
+
+class SummaryService:
+    """
+    Answers summary requests against a warm corpus (loaded with pmc_limit, which also scopes the query cache).
+    Identical concurrent requests share one in-flight computation;
+    at most max_concurrent computations run at once and at most max_queue more wait for a slot, beyond which new
+    requests are rejected with ServerOverloaded.
+    """
+
+    def __init__(self, corpus, max_concurrent=4, max_queue=32, pmc_limit=None):
+        self.corpus = corpus
+        self.pmc_limit = pmc_limit
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.in_flight = {}
+        self.running = 0
+        self.counters = {"requests": 0, "computed": 0, "coalesced": 0, "rejected": 0, "failed": 0}
+
+    async def _compute(self, role, question, sources, min_year, max_year):
+        async with self.semaphore:
+            self.running += 1
+            try:
+                summary, evaluation_report, kpis, timings = await generate_summary_async(
+                    role, question, corpus=self.corpus, pmc_limit=self.pmc_limit, sources=sources,
+                    min_year=min_year, max_year=max_year
+                )
+            except Exception:
+                self.counters["failed"] += 1
+                raise
+            finally:
+                self.running -= 1
+            self.counters["computed"] += 1
+            return {"summary": summary, "evaluation_report": evaluation_report, "kpis": kpis, "timings": timings}
+
+    async def summarize(self, role, question, sources=None, min_year=None, max_year=None):
+        """
+        Returns (result, coalesced), coalesced telling whether the request joined an identical one in flight.
+        """
+        self.counters["requests"] += 1
+        key = (role, question, tuple(sorted(sources)) if sources else None, min_year, max_year)
+        task = self.in_flight.get(key)
+        coalesced = task is not None
+        if coalesced:
+            self.counters["coalesced"] += 1
+        else:
+            if len(self.in_flight) >= self.max_concurrent + self.max_queue:
+                self.counters["rejected"] += 1
+                raise ServerOverloaded()
+            task = asyncio.create_task(self._compute(role, question, sources, min_year, max_year))
+            self.in_flight[key] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        # Shielded so that a client disconnecting does not cancel a computation other requests may be waiting on.
+        return await asyncio.shield(task), coalesced
+
+    def stats(self):
+        """
+        Request counters plus the number of computations running and queued.
+        """
+        return dict(self.counters, running=self.running, queued=len(self.in_flight) - self.running)
+
+
+SERVICE = web.AppKey("service", SummaryService)
+
+
+async def handle_summarize(request):
+    service = request.app[SERVICE]
+    try:
+        payload = await request.json()
+    except ValueError:
+        return web.json_response({"error": "Request body must be JSON"}, status=400)
+    if not isinstance(payload, dict) or not payload.get("role") or not payload.get("question"):
+        return web.json_response({"error": "'role' and 'question' are required"}, status=400)
+
+    start = time.perf_counter()
+    try:
+        result, coalesced = await service.summarize(
+            payload["role"], payload["question"], sources=payload.get("sources"),
+            min_year=payload.get("min_year"), max_year=payload.get("max_year")
+        )
+    except ServerOverloaded:
+        return web.json_response({"error": "Server overloaded, retry later"}, status=503,
+                                 headers={"Retry-After": "1"})
+    except Exception as e:
+        return web.json_response({"error": f"{type(e).__name__}: {e}"}, status=500)
+    return web.json_response(dict(result, coalesced=coalesced,
+                                  latency_ms=round((time.perf_counter() - start) * 1000, 1)))
+
+
+async def handle_health(request):
+    return web.json_response({"status": "ok"})
+
+
+async def handle_stats(request):
+    stats = {"service": request.app[SERVICE].stats()}
+    llm_cache = get_llm_cache()
+    if llm_cache is not None:
+        stats["llm_cache"] = llm_cache.stats()
+    query_cache = get_query_cache()
+    if query_cache is not None:
+        stats["query_cache"] = query_cache.stats()
+    return web.json_response(stats)
+
+
+def create_app(corpus, max_concurrent=4, max_queue=32, pmc_limit=None):
+    """
+    aiohttp application serving POST /summarize, GET /stats and GET /healthz against a preloaded corpus (loaded
+    with pmc_limit).
+    """
+    app = web.Application()
+    app[SERVICE] = SummaryService(corpus, max_concurrent=max_concurrent, max_queue=max_queue, pmc_limit=pmc_limit)
+
+    async def on_startup(app):
+        # Each computation runs up to three blocking stages at a time on the loop's thread pool.
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=max(4, 3 * max_concurrent)))
+
+    app.on_startup.append(on_startup)
+    app.router.add_post("/summarize", handle_summarize)
+    app.router.add_get("/stats", handle_stats)
+    app.router.add_get("/healthz", handle_health)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve summary generation over HTTP with a warm corpus.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--concurrency", type=int, default=4, help="Number of summaries computed concurrently")
+    parser.add_argument("--max_queue", type=int, default=32,
+                        help="Number of distinct requests allowed to wait for a slot; more are answered with 503")
+    parser.add_argument("--pmc_limit", type=int, default=None, help="Optional limit on number of PMC files to load")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of worker processes for XML parsing (default: sequential)")
+    parser.add_argument("--lazy_body", action="store_true",
+                        help="Keep PMC bodies on disk and load them only for articles that pass the topic filter")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    corpus = warm_up(pmc_limit=args.pmc_limit, workers=args.workers, lazy_body=args.lazy_body)
+    print(f"Warm-up: {time.perf_counter() - start:.1f} s")
+    web.run_app(create_app(corpus, max_concurrent=args.concurrency, max_queue=args.max_queue,
+                           pmc_limit=args.pmc_limit),
+                host=args.host, port=args.port)
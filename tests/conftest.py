@@ -0,0 +1,53 @@
+"""
+Shared fixtures. The app reads its configuration at import time, so the fake OpenAI server is started and the cache,
+index and corpus paths are pointed at a temporary directory before any test module imports the app.
+"""
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from benchmarks.fake_openai_server import start_fake_server
+
+WORKDIR = tempfile.mkdtemp(prefix="summarization-tests-")
+BACKEND = start_fake_server()
+
+os.environ.update({
+    "OPENAI_BASE_URL": BACKEND.base_url,
+    "OPENAI_API_KEY": "fake",
+    "LLM_CACHE_PATH": os.path.join(WORKDIR, "llm_cache.sqlite"),
+    "QUERY_CACHE_PATH": "",
+    "EMBEDDING_CACHE_DIR": os.path.join(WORKDIR, "embeddings"),
+    "VECTOR_INDEX_DIR": os.path.join(WORKDIR, "vector_index"),
+    "CORPUS_DB_PATH": os.path.join(WORKDIR, "corpus.sqlite"),
+})
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _cleanup():
+    yield
+    BACKEND.shutdown()
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def backend():
+    return BACKEND
+
+
+@pytest.fixture(scope="session")
+def corpus():
+    from app.data_loader import index_corpus, parse_folder_pmc, parse_pubmed_files
+    from benchmarks.synthetic_corpus import generate_corpus
+
+    pubmed_paths, pmc_folder, _ = generate_corpus(os.path.join(WORKDIR, "data"), num_abstracts=300, num_pmc=20,
+                                                  pubmed_files=1)
+    return index_corpus(parse_pubmed_files(pubmed_paths), parse_folder_pmc(pmc_folder, include_body=True))
+
+
+@pytest.fixture(scope="session")
+def questions():
+    from benchmarks.bench_server import make_questions
+
+    return make_questions(4)
@@ -0,0 +1,151 @@
+import hashlib
+import os
+import threading
+
+import pytest
+
+import download_and_unzip_pubmed as downloader
+from benchmarks.bench_downloader import FixtureHandler, FixtureServer, make_fixture_files
+
+
+class CorruptFirstTransferHandler(FixtureHandler):
+    """
+    Flips the first byte of each file's first complete transfer, so only its MD5 check can catch it.
+    """
+
+    def _write_throttled(self, data):
+        name = self.path.rsplit("/", 1)[-1]
+        with self.server.lock:
+            corrupt = name in self.server.files and name not in self.server.dropped and not self.headers.get("Range")
+            if corrupt:
+                self.server.dropped.add(name)
+        super()._write_throttled(bytes([data[0] ^ 0xFF]) + data[1:] if corrupt else data)
+
+
+@pytest.fixture(scope="module")
+def fixtures():
+    return make_fixture_files(num_files=3, num_abstracts=20)
+
+
+@pytest.fixture
+def serve(fixtures):
+    servers = []
+
+    def start(handler=FixtureHandler, drop_ratio=0.0):
+        server = FixtureServer(("127.0.0.1", 0), fixtures[0], drop_ratio=drop_ratio)
+        server.RequestHandlerClass = handler
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _first_archive(fixtures):
+    name = sorted(fixtures[0])[0]
+    return name, fixtures[0][name]
+
+
+def test_resumes_partial_file_with_range_request(serve, fixtures, tmp_path):
+    server = serve()
+    name, data = _first_archive(fixtures)
+    output_path = str(tmp_path / name)
+    with open(output_path + ".part", "wb") as f:
+        f.write(data[:len(data) // 2])
+
+    stats = {}
+    downloader.download_file(server.base_url + name, output_path, downloader.ConnectionPool(),
+                             expected_md5=hashlib.md5(data).hexdigest(), retries=0, stats=stats)
+
+    assert open(output_path, "rb").read() == data
+    assert not os.path.exists(output_path + ".part")
+    assert server.range_requests == 1
+    assert stats["resumed_bytes"] == len(data) // 2
+    assert stats["bytes"] == len(data) - len(data) // 2
+
+
+def test_resumes_after_dropped_connection(serve, fixtures, tmp_path):
+    server = serve(drop_ratio=0.5)
+    name, data = _first_archive(fixtures)
+    output_path = str(tmp_path / name)
+
+    stats = {}
+    downloader.download_file(server.base_url + name, output_path, downloader.ConnectionPool(),
+                             expected_md5=hashlib.md5(data).hexdigest(), retries=2, backoff=0, stats=stats)
+
+    assert open(output_path, "rb").read() == data
+    assert stats["retries"] == 1
+    assert stats["resumed_bytes"] == int(len(data) * 0.5)
+    assert server.range_requests == 1
+
+
+def test_complete_partial_file_is_not_downloaded_again(serve, fixtures, tmp_path):
+    server = serve()
+    name, data = _first_archive(fixtures)
+    output_path = str(tmp_path / name)
+    with open(output_path + ".part", "wb") as f:
+        f.write(data)
+
+    stats = {}
+    downloader.download_file(server.base_url + name, output_path, downloader.ConnectionPool(),
+                             expected_md5=hashlib.md5(data).hexdigest(), retries=0, stats=stats)
+
+    assert open(output_path, "rb").read() == data
+    assert stats.get("bytes", 0) == 0
+
+
+def test_md5_mismatch_restarts_download(serve, fixtures, tmp_path):
+    server = serve(handler=CorruptFirstTransferHandler)
+    name, data = _first_archive(fixtures)
+    output_path = str(tmp_path / name)
+
+    stats = {}
+    downloader.download_file(server.base_url + name, output_path, downloader.ConnectionPool(),
+                             expected_md5=hashlib.md5(data).hexdigest(), retries=1, backoff=0, stats=stats)
+
+    assert open(output_path, "rb").read() == data
+    assert stats["retries"] == 1
+    assert stats["bytes"] == 2 * len(data)
+    assert server.range_requests == 0
+
+
+def test_md5_mismatch_gives_up_after_retries(serve, fixtures, tmp_path):
+    server = serve()
+    name, _ = _first_archive(fixtures)
+    output_path = str(tmp_path / name)
+
+    with pytest.raises(downloader.DownloadError, match="MD5 mismatch"):
+        downloader.download_file(server.base_url + name, output_path, downloader.ConnectionPool(),
+                                 expected_md5="0" * 32, retries=1, backoff=0)
+
+    assert not os.path.exists(output_path)
+    assert not os.path.exists(output_path + ".part")
+
+
+def test_download_all_skips_completed_files(serve, fixtures, tmp_path):
+    server = serve()
+    archives, xml = fixtures
+    pool = downloader.ConnectionPool()
+    jobs = downloader.pubmed_jobs(pool, None, base_url=server.base_url, count=None)
+
+    stats = downloader.download_all(jobs, output_dir=str(tmp_path), connections=2, retries=0, pool=pool)
+    assert stats["downloaded"] == len(archives)
+    assert stats["skipped"] == 0
+    assert not stats["failed"]
+    for name, data in xml.items():
+        assert (tmp_path / name).read_bytes() == data
+
+    stats = downloader.download_all(jobs, output_dir=str(tmp_path), connections=2, retries=0, pool=pool)
+    assert stats["downloaded"] == 0
+    assert stats["skipped"] == len(archives)
+    assert stats["bytes"] == 0
+
+    removed = sorted(xml)[0]
+    os.remove(tmp_path / removed)
+    stats = downloader.download_all(jobs, output_dir=str(tmp_path), connections=2, retries=0, pool=pool)
+    assert stats["downloaded"] == 1
+    assert stats["skipped"] == len(archives) - 1
+    assert (tmp_path / removed).read_bytes() == xml[removed]
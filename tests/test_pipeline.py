@@ -0,0 +1,95 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+from app.llm_cache import get_llm_cache
+from app.pipeline import generate_summary_async
+from benchmarks.suite import compare
+from main import generate_summary
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CALL_SITES = ["step_back", "expand_topics", "summarize", "evaluate"]
+
+
+def _call_site_counts():
+    stats = get_llm_cache().stats()["call_sites"]
+    return {name: (stats.get(name, {}).get("hits", 0), stats.get(name, {}).get("misses", 0)) for name in CALL_SITES}
+
+
+def test_generate_summary(corpus, questions):
+    role, question = questions[0]
+    summary, evaluation_report, kpis = generate_summary(role, question, corpus=corpus)
+
+    assert summary.startswith("Treatment options are summarized")
+    assert "[PMC" in summary
+    assert evaluation_report
+    assert kpis["avg_llm_score"] == 4.0
+    assert kpis["num_citations"] > 0
+    assert kpis["num_source_documents"] > 0
+
+
+def test_llm_cache_miss_then_hit(backend, corpus, questions):
+    role, question = questions[1]
+    before = _call_site_counts()
+    chat_before = backend.chat_requests
+
+    summary, _, _ = generate_summary(role, question, corpus=corpus)
+    after_miss = _call_site_counts()
+    assert backend.chat_requests - chat_before == len(CALL_SITES)
+    for name in CALL_SITES:
+        assert after_miss[name] == (before[name][0], before[name][1] + 1)
+
+    repeated, _, _ = generate_summary(role, question, corpus=corpus)
+    after_hit = _call_site_counts()
+    assert repeated == summary
+    assert backend.chat_requests - chat_before == len(CALL_SITES)
+    for name in CALL_SITES:
+        assert after_hit[name] == (after_miss[name][0] + 1, after_miss[name][1])
+
+
+def test_streaming_marks_first_token(backend, corpus, questions):
+    role, question = questions[2]
+    pieces = []
+    summary, _, _, timings = asyncio.run(generate_summary_async(role, question, corpus=corpus,
+                                                                on_token=pieces.append))
+
+    assert len(pieces) > 1
+    assert "".join(pieces) == summary
+    summarize = timings["stages"]["summarize"]
+    assert summarize["start_ms"] <= timings["marks_ms"]["first_token"] <= summarize["end_ms"]
+
+    chat_before, pieces = backend.chat_requests, []
+    cached, _, _, timings = asyncio.run(generate_summary_async(role, question, corpus=corpus,
+                                                               on_token=pieces.append))
+    assert cached == summary
+    assert pieces == [summary]
+    assert "first_token" in timings["marks_ms"]
+    assert backend.chat_requests == chat_before
+
+
+def test_compare_flags_regressions():
+    baseline = {"stages": {"search": {"queries_per_sec": 100.0, "p50_ms": 10.0}, "index": {"index_mb": 1.0}}}
+    results = {"stages": {"search": {"queries_per_sec": 80.0, "p50_ms": 10.5}, "index": {"index_mb": 2.0}}}
+
+    rows = {row["metric"]: row for row in compare(results, baseline, tolerance=0.1)}
+
+    assert set(rows) == {"search.queries_per_sec", "search.p50_ms"}
+    assert rows["search.queries_per_sec"]["regression"]
+    assert not rows["search.p50_ms"]["regression"]
+
+
+def test_suite(tmp_path):
+    output = tmp_path / "baseline.json"
+    args = [sys.executable, "-m", "benchmarks.suite", "--num_abstracts", "200", "--num_pmc", "10",
+            "--pubmed_files", "1", "--queries", "2", "--questions", "1", "--repeat", "1",
+            "--embedding_latency_ms", "0", "--chat_latency_ms", "0", "--output", str(output)]
+    subprocess.run(args, cwd=ROOT, check=True, capture_output=True)
+
+    results = json.loads(output.read_text())
+    stages = results["stages"]
+    assert {"parse", "filter", "chunk", "embed", "index", "search", "end_to_end"} <= set(stages)
+    assert stages["index"]["index_mb"] > 0
+    assert stages["end_to_end"]["questions"] == 1
+    assert stages["end_to_end"]["llm_calls"] == len(CALL_SITES)